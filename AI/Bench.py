@@ -0,0 +1,80 @@
+"""
+Search benchmark: searches a fixed set of positions to a fixed depth with each selective search technique
+switched off in turn, and reports how many nodes each one saves.
+
+    python -m AI.Bench [--depth N]
+"""
+import argparse
+import sys
+import time
+
+from Board.Bitboard import BitBoard
+from AI.Search import Search
+
+# (name, FEN)
+BENCH = [
+    ("start position", "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"),
+    ("italian", "r1bqk1nr/pppp1ppp/2n5/2b1p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4"),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"),
+    ("middlegame", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10"),
+    ("queens off", "r2q1rk1/pp2bppp/2n1pn2/3p4/3P4/2NBPN2/PP3PPP/R2Q1RK1 b - - 0 10"),
+    ("rook endgame", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1"),
+    ("pawn endgame", "8/5k2/3p4/1p1Pp2p/pP2Pp1P/P4P1K/8/8 b - - 0 1"),
+]
+
+# Search switches for the selective search techniques
+TECHNIQUES = ('null_move', 'late_move_reductions', 'futility_pruning')
+
+
+def run_bench(depth=4, positions=BENCH, **switches):
+    """
+    Searches each position to depth with a new Search (and transposition table)
+    :param depth: depth of every search
+    :param positions: List of (name, FEN)
+    :param switches: Search keyword arguments, e.g. null_move=False
+    :return: (List of (name, best move, value, nodes) per position, total nodes, seconds,
+              pruning counters added up over the positions)
+    """
+    results = []
+    total_nodes = 0
+    counters = {}
+    start = time.perf_counter()
+    for name, fen in positions:
+        search = Search(BitBoard.from_fen(fen), **switches)
+        move, value, _ = search.iterative_deepening(depth)
+        nodes = search.nodes + search.qnodes
+        total_nodes += nodes
+        results.append((name, move, value, nodes))
+        for counter, count in search.pruning_stats().items():
+            counters[counter] = counters.get(counter, 0) + count
+    return results, total_nodes, time.perf_counter() - start, counters
+
+
+def compare_techniques(depth=4, positions=BENCH, out=sys.stdout):
+    """
+    Runs the bench with every technique on, then with each one off, then with all of them off
+    :return: dictionary of technique -> nodes it saves (nodes with it off - nodes with everything on)
+    """
+    _, all_on, elapsed, counters = run_bench(depth, positions)
+    out.write(f"{'all on':28} {all_on:>10} nodes  {elapsed:7.2f}s  "
+              + '  '.join(f"{counter} {count}" for counter, count in counters.items()) + "\n")
+    saved = {}
+    for technique in TECHNIQUES:
+        _, nodes, elapsed, _ = run_bench(depth, positions, **{technique: False})
+        saved[technique] = nodes - all_on
+        out.write(f"{technique + ' off':28} {nodes:>10} nodes  {elapsed:7.2f}s  saves {saved[technique]} nodes\n")
+    _, all_off, elapsed, _ = run_bench(depth, positions, **{technique: False for technique in TECHNIQUES})
+    out.write(f"{'all off':28} {all_off:>10} nodes  {elapsed:7.2f}s  saves {all_off - all_on} nodes together\n")
+    return saved
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Selective search benchmark")
+    parser.add_argument('--depth', type=int, default=4, help="depth of every search (default 4)")
+    args = parser.parse_args(argv)
+    compare_techniques(args.depth)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,511 @@
+"""
+Endgame bitbases: win / draw / loss for the team to move in every position of an ending with 3 or 4
+pieces (kings included), worked out by retrograde analysis and probed by the search once the material on
+the board is down to an ending that has one.
+
+A table is named by its material, strongest side first, e.g. KQvK or KRvKP, and holds every placement of
+its pieces with either team to move. The index of a position is
+
+    ((((white king * 64 + black king) * 64 + first piece) * 64 + ...) * 2 + (1 if white is to move)
+
+with the other pieces in table order (white's strongest first, then black's), and each position takes 2
+bits of the file: DRAW (also illegal positions), WIN or LOSS. A probe is one index computation and a bit
+lookup. An ending with the colours the other way round is looked up in the same table with the board
+mirrored. Castling and en passant aren't in the tables, so positions with either aren't probed.
+
+    python -m AI.Bitbases [--pieces 3 | --pieces 4 | --tables KQvK KRvK ...] [--workers N] [--dir AI/bitbases]
+
+Generation:
+  1. every position of the table is classified in a process pool (one task per white king square, leaving
+     out the squares a symmetry of the board takes to one that's been done): illegal,
+     mate, stalemate, a win by a capture or promotion into a smaller table (which must exist already), or
+     otherwise the number of moves that don't lose for sure - moves within the table plus captures and
+     promotions into drawn positions
+  2. from every won or lost position, the moves leading to it are taken back (retrograde moves): a position
+     with a move into a loss is a win, and one whose last undecided move leads into a win is a loss
+  3. whatever is still undecided is a draw
+4 piece tables have 64 times the positions of 3 piece ones and take hours in Python, so only the 3 piece
+tables are built by default.
+"""
+import argparse
+import os
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from Board.Bitboard import (BitBoard, WHITE, BLACK, EMPTY, FEN_PIECES, KING_ATTACKS, KNIGHT_ATTACKS,
+                            rook_attacks, bishop_attacks, squares, pop_count)
+
+DRAW = 0
+WIN = 1
+LOSS = 2
+# only used while generating, written to the file as DRAW
+ILLEGAL = 3
+
+KING = 5
+# piece letters strongest first, the order pieces are listed in table names and indexed in
+TABLE_ORDER = 'QRBNP'
+THREE_PIECE_TABLES = ('KQvK', 'KRvK', 'KBvK', 'KNvK', 'KPvK')
+FOUR_PIECE_TABLES = ('KQvKQ', 'KQvKR', 'KQvKB', 'KQvKN', 'KQvKP', 'KRvKR', 'KRvKB', 'KRvKN', 'KRvKP',
+                     'KBvKB', 'KBvKN', 'KBvKP', 'KNvKN', 'KNvKP', 'KPvKP',
+                     'KQQvK', 'KQRvK', 'KQBvK', 'KQNvK', 'KQPvK', 'KRRvK', 'KRBvK', 'KRNvK', 'KRPvK',
+                     'KBBvK', 'KBNvK', 'KBPvK', 'KNNvK', 'KNPvK', 'KPPvK')
+MAX_PIECES = 4
+DEFAULT_BITBASE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bitbases')
+FILE_EXTENSION = '.bb'
+
+
+def table_name(white, black):
+    """
+    :param white: white's piece letters other than the king, e.g. 'Q'
+    :param black: black's piece letters other than the king
+    :return: name of the table for the material with the pieces in table order, e.g. 'KQvK'
+    """
+    return ('K' + ''.join(sorted(white, key=TABLE_ORDER.index)) + 'vK'
+            + ''.join(sorted(black, key=TABLE_ORDER.index)))
+
+
+def table_sides(name):
+    """
+    :return: (white's piece letters, black's piece letters) of a table name, kings left out
+    """
+    white, black = name.upper().split('V')
+    if not white.startswith('K') or not black.startswith('K'):
+        raise ValueError(f"bad table name {name!r}")
+    return white[1:], black[1:]
+
+
+def canonical_name(white, black):
+    """
+    :return: name of the table the material is stored in - the side with more (then stronger) pieces as white
+    """
+    def strength(side):
+        return len(side), sorted((len(TABLE_ORDER) - TABLE_ORDER.index(letter) for letter in side), reverse=True)
+
+    if strength(white) < strength(black):
+        white, black = black, white
+    return table_name(white, black)
+
+
+def piece_codes(name):
+    """
+    :return: List of the piece codes (color * 6 + piece type) in the order a table indexes them
+    """
+    white, black = table_sides(name)
+    codes = [WHITE * 6 + KING, BLACK * 6 + KING]
+    codes += [WHITE * 6 + FEN_PIECES.index(letter.lower()) for letter in sorted(white, key=TABLE_ORDER.index)]
+    codes += [BLACK * 6 + FEN_PIECES.index(letter.lower()) for letter in sorted(black, key=TABLE_ORDER.index)]
+    return codes
+
+
+def table_size(name):
+    """
+    :return: number of positions in a table
+    """
+    return 64 ** len(piece_codes(name)) * 2
+
+
+def table_path(directory, name):
+    return os.path.join(directory, name + FILE_EXTENSION)
+
+
+def subtables(name):
+    """
+    :return: names of the tables a table's captures and promotions lead into (an ending with kings only
+             is always a draw and has no table)
+    """
+    white, black = table_sides(name)
+    found = []
+
+    def add(w, b):
+        if w or b:
+            sub = canonical_name(w, b)
+            if sub not in found:
+                found.append(sub)
+
+    for index in range(len(white)):
+        add(white[:index] + white[index + 1:], black)
+    for index in range(len(black)):
+        add(white, black[:index] + black[index + 1:])
+    for promotion in TABLE_ORDER[:-1]:
+        if 'P' in white:
+            add(white.replace('P', promotion, 1), black)
+        if 'P' in black:
+            add(white, black.replace('P', promotion, 1))
+    return found
+
+
+class Bitbases:
+
+    def __init__(self, directory=DEFAULT_BITBASE_DIRECTORY):
+        """
+        The bitbase files of a directory, each read the first time a position of its ending is probed
+        :param directory: where the .bb files are
+        """
+        self.directory = directory
+        # table name -> file contents, None when there's no file
+        self.tables = {}
+        self.max_pieces = MAX_PIECES
+        self.codes = {}
+
+    def table(self, name):
+        if name not in self.tables:
+            path = table_path(self.directory, name)
+            if os.path.exists(path):
+                with open(path, 'rb') as file:
+                    self.tables[name] = file.read()
+                self.codes[name] = piece_codes(name)
+            else:
+                self.tables[name] = None
+        return self.tables[name]
+
+    def available(self):
+        """
+        :return: names of the tables in the directory
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(file[:-len(FILE_EXTENSION)] for file in os.listdir(self.directory)
+                      if file.endswith(FILE_EXTENSION))
+
+    def probe(self, position):
+        """
+        :param position: BitBoard
+        :return: WIN, DRAW or LOSS for the team to move, None when no table covers the position (too many
+                 pieces, no file for the ending, castling rights or an en passant capture)
+        """
+        occupied = position.occupied
+        if pop_count(occupied) > self.max_pieces or position.castling or position.ep_square != -1:
+            return None
+        white = black = ''
+        mailbox = position.mailbox
+        for sq in squares(occupied):
+            code = mailbox[sq]
+            if code % 6 != KING:
+                if code // 6 == WHITE:
+                    white += FEN_PIECES[code % 6].upper()
+                else:
+                    black += FEN_PIECES[code % 6].upper()
+        if not white and not black:
+            return DRAW
+        name = table_name(white, black)
+        data = self.table(name)
+        if data is not None:
+            return probe_table(data, self.codes[name], position.pieces, position.turn, 0)
+        # the same ending with the colours swapped: black's pieces are looked up as white's, mirrored
+        name = table_name(black, white)
+        data = self.table(name)
+        if data is not None:
+            return probe_table(data, self.codes[name], position.pieces, position.turn ^ 1, 56)
+        return None
+
+
+def probe_table(data, codes, pieces, turn, mirror):
+    """
+    :param data: table file contents
+    :param codes: the table's piece codes in index order
+    :param pieces: BitBoard.pieces of the position
+    :param turn: team to move as the table sees it
+    :param mirror: 56 to look the position up with the colours swapped (rows flipped), 0 otherwise
+    :return: WIN, DRAW or LOSS
+    """
+    index = 0
+    used = {}
+    for code in codes:
+        if mirror:
+            code = (code + 6) % 12
+        # two pieces of the same kind take their squares in turn
+        bb = pieces[code] & ~used.get(code, 0)
+        bit = bb & -bb
+        used[code] = used.get(code, 0) | bit
+        index = index * 64 + ((bit.bit_length() - 1) ^ mirror)
+    index = index * 2 + turn
+    return data[index >> 2] >> ((index & 3) << 1) & 3
+
+
+def decode(index, count):
+    """
+    :return: (List of the squares of a table's count pieces, team to move) of a position index
+    """
+    turn = index & 1
+    index >>= 1
+    sqs = [0] * count
+    for piece in range(count - 1, -1, -1):
+        sqs[piece] = index & 63
+        index >>= 6
+    return sqs, turn
+
+
+def encode(sqs, turn):
+    index = 0
+    for sq in sqs:
+        index = index * 64 + sq
+    return index * 2 + turn
+
+
+def _classify_chunk(name, directory, white_king):
+    """
+    Worker task, step 1 of generation for the positions with the white king on one square
+    :return: (results, counts) as bytes - per position ILLEGAL, WIN, LOSS or DRAW (undecided), and an
+             array('H') of the moves still to be refuted before an undecided position is lost
+    """
+    codes = piece_codes(name)
+    count = len(codes)
+    bitbases = Bitbases(directory)
+    chunk = 64 ** (count - 1) * 2
+    first = white_king * chunk
+    results = bytearray(chunk)
+    counts = array('H', bytes(2 * chunk))
+    for offset in range(chunk):
+        sqs, turn = decode(first + offset, count)
+        results[offset], counts[offset] = classify(codes, sqs, turn, bitbases)
+    return bytes(results), counts.tobytes()
+
+
+def classify(codes, sqs, turn, bitbases):
+    """
+    :return: (ILLEGAL, WIN, LOSS or DRAW, moves that don't lose for sure) of one position
+    """
+    if len(set(sqs)) < len(sqs) or KING_ATTACKS[sqs[0]] >> sqs[1] & 1:
+        return ILLEGAL, 0
+    position = BitBoard()
+    for code, sq in zip(codes, sqs):
+        # pawns can't be on the first or last row
+        if code % 6 == 0 and sq // 8 in (0, 7):
+            return ILLEGAL, 0
+        position.put_piece(code, sq)
+    position.turn = turn
+    if position.is_square_attacked(position.king_square(turn ^ 1), turn):
+        return ILLEGAL, 0
+    moves = position.legal_moves()
+    if not moves:
+        return (LOSS if position.in_check() else DRAW), 0
+    open_moves = 0
+    for move in moves:
+        if position.mailbox[(move >> 6) & 63] == EMPTY and not (move >> 12) & 7:
+            open_moves += 1
+            continue
+        # a capture or promotion leaves the table
+        undo = position.make_move(move)
+        result = bitbases.probe(position)
+        if result is None:
+            raise FileNotFoundError(f"bitbase {position_name(position)} is needed first")
+        position.unmake_move(undo)
+        if result == LOSS:
+            return WIN, 0
+        if result == DRAW:
+            open_moves += 1
+    if not open_moves:
+        return LOSS, 0
+    return DRAW, open_moves
+
+
+def position_name(position):
+    """
+    :return: canonical table name of the material of a BitBoard
+    """
+    white = black = ''
+    for sq in squares(position.occupied):
+        code = position.mailbox[sq]
+        if code % 6 != KING:
+            if code // 6 == WHITE:
+                white += FEN_PIECES[code % 6].upper()
+            else:
+                black += FEN_PIECES[code % 6].upper()
+    return canonical_name(white, black)
+
+
+def retrograde_moves(codes, index):
+    """
+    Positions a move within the table leads from to this one - the team not to move takes back one of its
+    moves that isn't a capture or promotion (a pawn steps back, two steps from its fourth row)
+    :param index: position index
+    :return: List of position indexes
+    """
+    count = len(codes)
+    sqs, turn = decode(index, count)
+    mover = turn ^ 1
+    occupied = 0
+    for sq in sqs:
+        occupied |= 1 << sq
+    empty = ~occupied
+    # the team to move changes, then each taken back move shifts one piece's square
+    base = index - turn + mover
+    found = []
+    for piece, code in enumerate(codes):
+        if code // 6 != mover:
+            continue
+        sq = sqs[piece]
+        weight = 2 << (6 * (count - 1 - piece))
+        piece_type = code % 6
+        if piece_type == 0:
+            # white pawns move towards row 0
+            back = 8 if mover == WHITE else -8
+            origin = sq + back
+            if 1 <= origin // 8 <= 6 and empty >> origin & 1:
+                found.append(base + back * weight)
+                start_row = 6 if mover == WHITE else 1
+                if origin // 8 + back // 8 == start_row and empty >> (origin + back) & 1:
+                    found.append(base + 2 * back * weight)
+            continue
+        if piece_type == KING:
+            targets = KING_ATTACKS[sq]
+        elif piece_type == 1:
+            targets = KNIGHT_ATTACKS[sq]
+        elif piece_type == 2:
+            targets = bishop_attacks(sq, occupied)
+        elif piece_type == 3:
+            targets = rook_attacks(sq, occupied)
+        else:
+            targets = rook_attacks(sq, occupied) | bishop_attacks(sq, occupied)
+        targets &= empty
+        while targets:
+            bit = targets & -targets
+            found.append(base + (bit.bit_length() - 1 - sq) * weight)
+            targets ^= bit
+    return found
+
+
+def symmetries(codes):
+    """
+    :return: List of square maps (lists of 64 squares) a table's results don't change under - the board
+             flipped left to right, and without pawns also top to bottom and along the diagonal
+    """
+    flips = (0, 7) if any(code % 6 == 0 for code in codes) else (0, 7, 56, 63)
+    transposes = (False,) if len(flips) == 2 else (False, True)
+    return [[((sq % 8) * 8 + sq // 8 if transpose else sq) ^ flip for sq in range(64)]
+            for transpose in transposes for flip in flips]
+
+
+def mirror_chunk(part, square_map, count):
+    """
+    :param part: (results, counts) of the positions with the white king on some square
+    :param square_map: symmetry taking the white king of the chunk wanted to that square
+    :return: (results, counts) of the chunk wanted, as _classify_chunk would give them
+    """
+    results, counts = part
+    counts = array('H', counts)
+    chunk = len(results)
+    mirrored = bytearray(chunk)
+    mirrored_counts = array('H', bytes(2 * chunk))
+    for offset in range(chunk):
+        # the index within a chunk is the index of the pieces other than the white king
+        sqs, turn = decode(offset, count - 1)
+        source = encode([square_map[sq] for sq in sqs], turn)
+        mirrored[offset] = results[source]
+        mirrored_counts[offset] = counts[source]
+    return bytes(mirrored), mirrored_counts.tobytes()
+
+
+def generate(name, directory=DEFAULT_BITBASE_DIRECTORY, workers=None):
+    """
+    Builds one table by retrograde analysis and writes it to directory. The tables its captures and
+    promotions lead into must be there already (generate_all builds them in order).
+    :param name: table name, e.g. 'KRvK'
+    :param workers: processes classifying positions (None for one per cpu, 0 to do it in this process)
+    :return: (wins, draws, losses) over the legal positions
+    """
+    codes = piece_codes(name)
+    count = len(codes)
+    # only the white king squares the others can be mirrored to are classified
+    maps = symmetries(codes)
+    kings = {}
+    for white_king in range(64):
+        square_map = min(maps, key=lambda square_map: square_map[white_king])
+        kings[white_king] = (square_map[white_king], square_map)
+    classified = sorted(set(king for king, _ in kings.values()))
+    chunks = [(name, directory, white_king) for white_king in classified]
+    if workers == 0:
+        found = [_classify_chunk(*chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            found = list(pool.map(_classify_chunk, *zip(*chunks)))
+    found = dict(zip(classified, found))
+    parts = [found[king] if king == white_king else mirror_chunk(found[king], square_map, count)
+             for white_king, (king, square_map) in kings.items()]
+    results = bytearray(b''.join(part[0] for part in parts))
+    counts = array('H')
+    for _, part in parts:
+        counts.frombytes(part)
+
+    decided = [index for index, result in enumerate(results) if result == WIN or result == LOSS]
+    for index in decided:
+        lost = results[index] == LOSS
+        for previous in retrograde_moves(codes, index):
+            if results[previous] != DRAW:
+                continue
+            if lost:
+                # a move into a loss for the other team wins
+                results[previous] = WIN
+                decided.append(previous)
+            else:
+                counts[previous] -= 1
+                if not counts[previous]:
+                    # every move leads into a win for the other team
+                    results[previous] = LOSS
+                    decided.append(previous)
+
+    write_table(results, table_path(directory, name))
+    return results.count(WIN), results.count(DRAW), results.count(LOSS)
+
+
+def write_table(results, path):
+    """
+    Packs one result per 2 bits (4 positions a byte, the first in the low bits), illegal positions as DRAW
+    """
+    values = results.translate(bytes([DRAW, WIN, LOSS, DRAW]) + bytes(252))
+    packed = bytes(a | b << 2 | c << 4 | d << 6
+                   for a, b, c, d in zip(values[0::4], values[1::4], values[2::4], values[3::4]))
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'wb') as file:
+        file.write(packed)
+
+
+def generate_all(names, directory=DEFAULT_BITBASE_DIRECTORY, workers=None, out=None):
+    """
+    Builds the tables in names and every table they need that isn't in directory yet, smallest first
+    :param out: where progress is written (None for nowhere)
+    :return: names of the tables built
+    """
+    order = []
+
+    def visit(name):
+        if name in order or os.path.exists(table_path(directory, name)):
+            return
+        for sub in subtables(name):
+            visit(sub)
+        order.append(name)
+
+    for name in names:
+        white, black = table_sides(name)
+        if len(white) + len(black) + 2 > MAX_PIECES:
+            raise ValueError(f"{name} has more than {MAX_PIECES} pieces")
+        visit(canonical_name(white, black))
+    for name in order:
+        wins, draws, losses = generate(name, directory, workers)
+        if out is not None:
+            out.write(f"{name}: {wins} wins, {draws} draws (or illegal), {losses} losses\n")
+            out.flush()
+    return order
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Builds endgame bitbases by retrograde analysis")
+    tables = parser.add_mutually_exclusive_group()
+    tables.add_argument('--pieces', type=int, choices=(3, 4), default=3,
+                        help="build every table with up to this many pieces (default 3)")
+    tables.add_argument('--tables', nargs='+', metavar='TABLE', help="tables to build, e.g. KQvK KRvKP")
+    parser.add_argument('--workers', type=int, help="processes (default one per cpu)")
+    parser.add_argument('--dir', default=DEFAULT_BITBASE_DIRECTORY, help="where the tables go (default AI/bitbases)")
+    args = parser.parse_args(argv)
+    if args.tables:
+        names = args.tables
+    else:
+        names = THREE_PIECE_TABLES + (FOUR_PIECE_TABLES if args.pieces == 4 else ())
+    built = generate_all(names, args.dir, args.workers, sys.stdout)
+    print(f"{len(built)} tables written to {args.dir}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,186 @@
+import multiprocessing
+import os
+from multiprocessing import shared_memory
+
+from Board.Bitboard import BitBoard
+from AI.Search import Search
+from AI.TranspositionTable import TranspositionTable, table_bytes
+from AI.Bitbases import Bitbases
+
+SHARED_TRANSPOSITION_TABLE_MB = 16
+# helpers are spawned rather than forked, since a fork from a threaded host (the UCI engine's search thread, the
+# gui's AISearchThread) copies locks other threads are holding, e.g. stdin's while the main thread reads it
+START_METHOD = 'spawn'
+# helpers keep deepening until the main search stops them
+HELPER_MAX_DEPTH = 64
+# seconds close() waits for each helper to exit
+HELPER_JOIN_TIMEOUT = 5
+
+
+class _Stopped:
+
+    def __init__(self, generation, job):
+        """
+        Search.stop_event of a helper: set once the main search has moved on from the helper's job
+        :param generation: multiprocessing.Value the main search increments to start and stop jobs
+        :param job: generation the job was started at
+        """
+        self.generation = generation
+        self.job = job
+
+    def is_set(self):
+        return self.generation.value != self.job
+
+
+def _helper(memory_name, tt_mb, index, jobs, generation, helper_nodes, bitbase_directory=None):
+    """
+    Helper process, started once and kept for every search: takes (job, state, history) jobs off its
+    queue and runs the same iterative deepening search as the main search on the shared transposition
+    table until generation moves on from job. Odd helpers start a ply deeper, so the helpers aren't all
+    searching the same depth at the same time and fill the table with results the main search can use.
+    Exits on a None job.
+    :param memory_name: name of the shared_memory block holding the transposition table
+    :param tt_mb: size of the transposition table
+    :param index: helper number, 0 up
+    :param jobs: queue of (job, BitBoard.serialize() of the position, zobrist keys already seen in the game)
+    :param generation: multiprocessing.Value, a job is only searched while generation is still job
+    :param helper_nodes: multiprocessing.Value the helper's node count is added to after every iteration
+    :param bitbase_directory: directory of the endgame bitbases the helper probes (None for no probing)
+    """
+    memory = shared_memory.SharedMemory(name=memory_name)
+    tt = TranspositionTable(tt_mb, memory.buf)
+    bitbases = Bitbases(bitbase_directory) if bitbase_directory is not None else None
+    try:
+        while True:
+            task = jobs.get()
+            if task is None:
+                break
+            job, state, history = task
+            # a job the main search has already finished isn't started
+            if generation.value != job:
+                continue
+            search = Search(BitBoard.deserialize(state), history, tt, bitbases=bitbases)
+            search.stop_event = _Stopped(generation, job)
+            counted = [0]
+
+            def count(*_):
+                nodes = search.nodes + search.qnodes
+                with helper_nodes.get_lock():
+                    helper_nodes.value += nodes - counted[0]
+                counted[0] = nodes
+
+            search.on_iteration = count
+            search.iterative_deepening(HELPER_MAX_DEPTH, start_depth=1 + index % 2)
+            count()
+    finally:
+        tt.release()
+        memory.close()
+
+
+class LazySMP:
+
+    def __init__(self, position=None, history=(), helpers=None, tt_mb=SHARED_TRANSPOSITION_TABLE_MB, context=None,
+                 bitbases=None):
+        """
+        Lazy SMP search: the main search and helpers in other processes all run the same iterative
+        deepening search on one transposition table kept in a multiprocessing.shared_memory block, so
+        nothing but the starting position is pickled. The helpers only help by filling the table, the
+        main search's result is the one returned. The helpers and the table are made once and kept for
+        every search (set_position() before each one), so keep one LazySMP for a whole game and use it as
+        a context manager (or call close()) so the processes and the shared memory are freed.
+        :param position: BitBoard to search, None to give it to set_position later
+        :param history: zobrist keys of positions already seen in the game (scored as draws)
+        :param helpers: number of helper processes (None for one less than the number of cpus)
+        :param tt_mb: size of the shared transposition table
+        :param context: multiprocessing context the helpers are started from (None for a START_METHOD one)
+        :param bitbases: AI.Bitbases.Bitbases the searches probe (each helper loads its own from the same
+                         directory), None for no probing
+        """
+        self.context = context if context is not None else multiprocessing.get_context(START_METHOD)
+        self.helpers = helpers if helpers is not None else max(1, (os.cpu_count() or 1) - 1)
+        self.tt_mb = tt_mb
+        self.bitbases = bitbases
+        self.memory = shared_memory.SharedMemory(create=True, size=table_bytes(tt_mb))
+        self.tt = TranspositionTable(tt_mb, self.memory.buf)
+        self.helper_nodes = self.context.Value('q', 0)
+        # helper node count when the current search started
+        self.helper_nodes_start = 0
+        self.generation = self.context.Value('q', 0)
+        self.jobs = [self.context.SimpleQueue() for _ in range(self.helpers)]
+        # started now, so a search doesn't wait for them - they join in once they're up
+        self.processes = [self.context.Process(target=_helper, daemon=True,
+                                               args=(self.memory.name, tt_mb, index, self.jobs[index],
+                                                     self.generation, self.helper_nodes,
+                                                     bitbases.directory if bitbases is not None else None))
+                          for index in range(self.helpers)]
+        for process in self.processes:
+            process.start()
+        self.position = None
+        self.history = ()
+        self.search = None
+        if position is not None:
+            self.set_position(position, history)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Stops the helper processes and frees the shared memory, can be called more than once
+        """
+        if self.memory is None:
+            return
+        with self.generation.get_lock():
+            self.generation.value += 1
+        for jobs in self.jobs:
+            jobs.put(None)
+        for process in self.processes:
+            process.join(HELPER_JOIN_TIMEOUT)
+            if process.is_alive():
+                process.terminate()
+        self.tt.release()
+        self.memory.close()
+        self.memory.unlink()
+        self.memory = None
+
+    def set_position(self, position, history=()):
+        """
+        Sets up the next search
+        :param position: BitBoard to search
+        :param history: zobrist keys of positions already seen in the game (scored as draws)
+        :return: the main Search (self.search), e.g. to set its stop_event or on_iteration
+        """
+        self.position = position
+        self.history = tuple(history)
+        self.search = Search(position, self.history, self.tt, bitbases=self.bitbases)
+        return self.search
+
+    @property
+    def nodes(self):
+        """
+        :return: nodes searched by the main search and the helpers in the current (or last) search
+        """
+        return self.search.nodes + self.search.qnodes + self.helper_nodes.value - self.helper_nodes_start
+
+    def iterative_deepening(self, max_depth=4, movetime_ms=None, max_nodes=None):
+        """
+        Same as Search.iterative_deepening, with the helpers running alongside the main search. The
+        helpers are told to stop when it returns, without waiting for them.
+        :param max_nodes: node budget of the main search (None for no limit)
+        :return: (best move, value for the team to move, depth completed) from the main search
+        """
+        state = self.position.serialize()
+        self.helper_nodes_start = self.helper_nodes.value
+        with self.generation.get_lock():
+            self.generation.value += 1
+            job = self.generation.value
+        for jobs in self.jobs:
+            jobs.put((job, state, self.history))
+        try:
+            return self.search.iterative_deepening(max_depth, movetime_ms, max_nodes)
+        finally:
+            with self.generation.get_lock():
+                self.generation.value += 1
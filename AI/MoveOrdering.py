@@ -0,0 +1,134 @@
+from Board.Bitboard import EMPTY, PAWN, EN_PASSANT, PIECE_VALUES
+
+# ordering scores, highest first: hash move, captures (most valuable victim / least valuable attacker),
+# killer moves, then quiet moves by history
+HASH_MOVE_SCORE = 1 << 30
+CAPTURE_SCORE = 1 << 28
+PROMOTION_SCORE = CAPTURE_SCORE
+KILLER_SCORES = (1 << 27, (1 << 27) - 1)
+# captures that lose material by static exchange evaluation go after the quiet moves
+LOSING_CAPTURE_SCORE = -(1 << 20)
+# history scores are halved if they get this big, so they stay below the killer scores
+HISTORY_LIMIT = 1 << 26
+MAX_PLY = 128
+
+
+class MoveOrderer:
+
+    def __init__(self):
+        """
+        Orders moves for the alpha beta search so the moves most likely to cause a cutoff are
+        searched first: the transposition table's move, then captures by most valuable victim /
+        least valuable attacker (PIECE_VALUES, the same values as Board.score), then the two killer
+        moves of the ply (quiet moves that caused a cutoff at the same ply elsewhere in the tree), then
+        the rest by the history heuristic (how often and how deep a move caused cutoffs), then captures
+        that lose material (BitBoard.see). Also counts how often the first move searched causes the cutoff,
+        to see whether the ordering works.
+        """
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]
+        # history[color * 4096 + from * 64 + to]
+        self.history = [0] * (2 * 64 * 64)
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.losing_captures_pruned = 0
+
+    def new_search(self):
+        """
+        Called at the start of each search - killers are forgotten and history is aged
+        """
+        for killers in self.killers:
+            killers[0] = killers[1] = 0
+        self.history = [h >> 1 for h in self.history]
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.losing_captures_pruned = 0
+
+    def order(self, position, moves, hash_move=0, ply=0, prune_losing=False):
+        """
+        Generator of moves in the order they should be searched
+        :param position: BitBoard the moves are for
+        :param moves: list of move ints
+        :param hash_move: best move from the transposition table (0 for none)
+        :param ply: plies from the root
+        :param prune_losing: True to leave out captures that lose material instead of ordering them last
+        """
+        mailbox = position.mailbox
+        history = self.history
+        history_base = position.turn * 4096
+        killer_1, killer_2 = self.killers[ply] if ply < MAX_PLY else (0, 0)
+        scored = []
+        for move in moves:
+            to_sq = (move >> 6) & 63
+            victim = mailbox[to_sq]
+            if move == hash_move:
+                score = HASH_MOVE_SCORE
+            elif victim != EMPTY:
+                victim_value = PIECE_VALUES[victim % 6]
+                attacker_value = PIECE_VALUES[mailbox[move & 63] % 6]
+                # taking something worth at least the attacker can't lose material, only look at the others
+                see = position.see(move) if attacker_value > victim_value else 0
+                if see >= 0:
+                    score = CAPTURE_SCORE + victim_value * 128 - attacker_value
+                elif prune_losing:
+                    self.losing_captures_pruned += 1
+                    continue
+                else:
+                    score = LOSING_CAPTURE_SCORE + see
+            elif move >> 15 == EN_PASSANT:
+                score = CAPTURE_SCORE + PIECE_VALUES[PAWN] * 128 - PIECE_VALUES[PAWN]
+            elif (move >> 12) & 7:
+                score = PROMOTION_SCORE + PIECE_VALUES[(move >> 12) & 7]
+            elif move == killer_1:
+                score = KILLER_SCORES[0]
+            elif move == killer_2:
+                score = KILLER_SCORES[1]
+            else:
+                score = history[history_base + (move & 4095)]
+            scored.append((score, move))
+        scored.sort(reverse=True)
+        for _, move in scored:
+            yield move
+
+    def is_quiet(self, position, move):
+        """
+        :return: True if move isn't a capture or promotion
+        """
+        return position.mailbox[(move >> 6) & 63] == EMPTY and move >> 15 != EN_PASSANT and not (move >> 12) & 7
+
+    def record_cutoff(self, position, move, index, ply, depth):
+        """
+        Records that move (the index'th move searched) caused a beta cutoff. Quiet moves become
+        killers for the ply and get depth * depth added to their history score.
+        :param position: BitBoard the move was made from (with the move unmade)
+        :param move: move int
+        :param index: how many moves were searched before it
+        :param ply: plies from the root
+        :param depth: depth left at the node
+        """
+        self.cutoffs += 1
+        if index == 0:
+            self.first_move_cutoffs += 1
+        if not self.is_quiet(position, move):
+            return
+
+        if ply < MAX_PLY:
+            killers = self.killers[ply]
+            if killers[0] != move:
+                killers[1] = killers[0]
+                killers[0] = move
+
+        index = position.turn * 4096 + (move & 4095)
+        self.history[index] += depth * depth
+        if self.history[index] >= HISTORY_LIMIT:
+            self.history = [h >> 1 for h in self.history]
+
+    def first_move_cutoff_rate(self):
+        """
+        :return: fraction of cutoffs caused by the first move searched
+        """
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    def stats(self):
+        return {'cutoffs': self.cutoffs, 'first_move_cutoffs': self.first_move_cutoffs,
+                'first_move_cutoff_rate': self.first_move_cutoff_rate(),
+                'losing_captures_pruned': self.losing_captures_pruned}
@@ -0,0 +1,245 @@
+"""
+Opening book: a binary file of 16 byte entries sorted by zobrist key, like a Polyglot book
+
+    key (8 bytes) | move (2 bytes) | weight (2 bytes) | learn (4 bytes, unused)    big endian
+
+The keys are Board.Zobrist keys (the same for Board and BitBoard), not Polyglot's, and the move is
+from_sq | to_sq << 6 | promotion << 12 in BitBoard squares (castling being the king's move to its g / c
+square). The file is opened with mmap and binary searched, so a book of any size isn't read into memory.
+
+    python -m AI.OpeningBook --pgn games.pgn [--out AI/book.bin] [--max-ply 16]
+    python -m AI.OpeningBook --self-play 200 [--depth 3] [--out AI/book.bin]
+"""
+import argparse
+import mmap
+import os
+import random
+import struct
+import sys
+
+from Board.Bitboard import BitBoard
+from AI.Search import Search
+
+ENTRY = struct.Struct('>QHHI')
+ENTRY_BYTES = ENTRY.size
+# moves further into a game than this aren't put in the book
+DEFAULT_MAX_PLY = 16
+MAX_WEIGHT = 0xFFFF
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+DEFAULT_BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'book.bin')
+
+
+def book_move(move):
+    """
+    :param move: BitBoard move int
+    :return: the move as stored in the book (no flag bits)
+    """
+    return move & 0x7FFF
+
+
+class OpeningBook:
+
+    def __init__(self, path=DEFAULT_BOOK_PATH):
+        """
+        Opens a book file read only. Use as a context manager (or call close()) to unmap it.
+        :param path: book file
+        """
+        self.file = open(path, 'rb')
+        size = os.fstat(self.file.fileno()).st_size
+        self.entries = size // ENTRY_BYTES
+        # an empty file can't be mapped
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self.entries
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+        self.file.close()
+
+    def entry(self, index):
+        """
+        :return: (key, move, weight, learn) of the index'th entry
+        """
+        return ENTRY.unpack_from(self.map, index * ENTRY_BYTES)
+
+    def key_at(self, index):
+        return struct.unpack_from('>Q', self.map, index * ENTRY_BYTES)[0]
+
+    def lookup(self, key):
+        """
+        :param key: zobrist key of a position
+        :return: List of (book move, weight) stored for the key
+        """
+        low, high = 0, self.entries
+        # first entry with a key >= key
+        while low < high:
+            middle = (low + high) // 2
+            if self.key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        found = []
+        while low < self.entries:
+            entry_key, move, weight, _ = self.entry(low)
+            if entry_key != key:
+                break
+            found.append((move, weight))
+            low += 1
+        return found
+
+    def moves(self, position):
+        """
+        :param position: BitBoard
+        :return: List of (legal move int, weight) the book has for the position - book moves that aren't
+                 legal (a key collision) are left out
+        """
+        legal = {book_move(move): move for move in position.legal_moves()}
+        return [(legal[move], weight) for move, weight in self.lookup(position.zobrist_key)
+                if move in legal and weight]
+
+    def choose(self, position, rng=random):
+        """
+        :param position: BitBoard
+        :param rng: random.Random to pick with
+        :return: a book move picked at random in proportion to the weights, None when out of book
+        """
+        moves = self.moves(position)
+        if not moves:
+            return None
+        pick = rng.randrange(sum(weight for _, weight in moves))
+        for move, weight in moves:
+            pick -= weight
+            if pick < 0:
+                return move
+
+
+def write_book(counts, path):
+    """
+    :param counts: dictionary of (zobrist key, book move) -> weight
+    :param path: book file to write
+    :return: number of entries written
+    """
+    top = max(counts.values(), default=0)
+    # weights are scaled down to fit in 16 bits if they have to be
+    scale = MAX_WEIGHT / top if top > MAX_WEIGHT else 1
+    entries = sorted((key, move, max(1, int(weight * scale))) for (key, move), weight in counts.items() if weight)
+    with open(path, 'wb') as book:
+        for key, move, weight in entries:
+            book.write(ENTRY.pack(key, move, weight, 0))
+    return len(entries)
+
+
+def add_game(counts, position, moves, result, max_ply=DEFAULT_MAX_PLY):
+    """
+    Adds the first max_ply moves of a game to counts, each weighted by how the game went for the team that
+    played it: 2 for a win, 1 for a draw (or unknown result), nothing for a loss
+    :param counts: dictionary of (zobrist key, book move) -> weight
+    :param position: BitBoard the game starts from (changed in place)
+    :param moves: the game's BitBoard move ints
+    :param result: '1-0', '0-1', '1/2-1/2' or '*'
+    """
+    for move in moves[:max_ply]:
+        white = position.turn == 1
+        if result == '1-0':
+            weight = 2 if white else 0
+        elif result == '0-1':
+            weight = 0 if white else 2
+        else:
+            weight = 1
+        entry = (position.zobrist_key, book_move(move))
+        counts[entry] = counts.get(entry, 0) + weight
+        position.make_move(move)
+
+
+def build_from_pgn(source, path=DEFAULT_BOOK_PATH, max_ply=DEFAULT_MAX_PLY):
+    """
+    Builds a book from the games of a PGN file (games with a FEN header or an illegal move are skipped
+    from that point on)
+    :param source: PGN path or iterable of lines
+    :param path: book file to write
+    :return: number of entries written
+    """
+    # imported here since Board.Board imports this module
+    from Board.Pgn import read_games, parse_san, PgnError
+    from Board.Board import Board
+
+    counts = {}
+    for headers, sans, result in read_games(source):
+        if 'FEN' in headers:
+            continue
+        board = Board()
+        moves = []
+        try:
+            for san in sans[:max_ply]:
+                board_move = parse_san(board, san)
+                moves.append(BitBoard.from_board(board).move_from_board_move(board_move))
+                board.make_move(board_move)
+        except PgnError:
+            pass
+        add_game(counts, BitBoard.from_fen(START_FEN), moves, result, max_ply)
+    return write_book(counts, path)
+
+
+def self_play_game(max_ply=DEFAULT_MAX_PLY, depth=3, random_plies=2, rng=random):
+    """
+    Plays the opening of a game of the AI against itself. The first random_plies moves are random so the
+    games differ.
+    :return: (List of BitBoard move ints, result) - the result is '*' unless the game ended within max_ply
+    """
+    position = BitBoard.from_fen(START_FEN)
+    moves = []
+    history = []
+    for ply in range(max_ply):
+        legal = position.legal_moves()
+        if not legal:
+            return moves, ('0-1' if position.turn == 1 else '1-0') if position.in_check() else '1/2-1/2'
+        if ply < random_plies:
+            move = rng.choice(legal)
+        else:
+            move, _, _ = Search(position, history).iterative_deepening(depth)
+        moves.append(move)
+        history.append(position.zobrist_key)
+        position.make_move(move)
+    return moves, '*'
+
+
+def build_from_self_play(games, path=DEFAULT_BOOK_PATH, max_ply=DEFAULT_MAX_PLY, depth=3, rng=random):
+    """
+    Builds a book from the AI playing itself
+    :param games: number of games to play
+    :return: number of entries written
+    """
+    counts = {}
+    for _ in range(games):
+        moves, result = self_play_game(max_ply, depth, rng=rng)
+        add_game(counts, BitBoard.from_fen(START_FEN), moves, result, max_ply)
+    return write_book(counts, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Builds an opening book")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--pgn', help="PGN file of games to build the book from")
+    source.add_argument('--self-play', type=int, metavar='GAMES', help="number of self play games to build it from")
+    parser.add_argument('--out', default=DEFAULT_BOOK_PATH, help="book file to write (default AI/book.bin)")
+    parser.add_argument('--max-ply', type=int, default=DEFAULT_MAX_PLY, help="plies of each game to add")
+    parser.add_argument('--depth', type=int, default=3, help="search depth of self play games")
+    args = parser.parse_args(argv)
+    if args.pgn:
+        entries = build_from_pgn(args.pgn, args.out, args.max_ply)
+    else:
+        entries = build_from_self_play(args.self_play, args.out, args.max_ply, args.depth)
+    print(f"{entries} entries written to {args.out}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,169 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from Board.Bitboard import BitBoard
+from AI.Search import Search, SearchAborted, MATE_BOUND
+from AI.TranspositionTable import TranspositionTable
+from AI.LazySMP import START_METHOD
+from AI.Bitbases import Bitbases
+
+# transposition table size of each worker process
+WORKER_TRANSPOSITION_TABLE_MB = 16
+
+# set up in each worker process by _init_worker
+_shared_alpha = None
+_worker_tt = None
+_worker_bitbases = None
+
+
+def _init_worker(shared_alpha, tt_mb, bitbase_directory=None):
+    """
+    Runs once in each worker process
+    :param shared_alpha: multiprocessing.Value holding the best root value found so far in the iteration
+    :param tt_mb: size of the worker's transposition table, kept between the root moves it searches
+    :param bitbase_directory: directory of the endgame bitbases the worker probes (None for no probing)
+    """
+    global _shared_alpha, _worker_tt, _worker_bitbases
+    _shared_alpha = shared_alpha
+    _worker_tt = TranspositionTable(tt_mb)
+    _worker_bitbases = Bitbases(bitbase_directory) if bitbase_directory is not None else None
+
+
+def _search_move(state, history, move, depth, deadline):
+    """
+    Worker task: searches one root move with the best root value found so far (by any worker) as alpha,
+    and raises the shared alpha if this move does better.
+    :param state: BitBoard.serialize() of the root position
+    :param history: zobrist keys of positions already seen in the game
+    :param move: root move int
+    :param depth: depth of the root search
+    :param deadline: time.time() the search has to stop by (None for no limit)
+    :return: (move, value for the team to move at the root - None if time ran out, True if the value is exact
+             rather than an upper bound (it beat alpha), nodes searched)
+    """
+    if deadline is not None and time.time() >= deadline:
+        return move, None, False, 0
+
+    position = BitBoard.deserialize(state)
+    search = Search(position, history, _worker_tt, bitbases=_worker_bitbases)
+    search.probe_root_bitbase()
+    if deadline is not None:
+        search.deadline = time.perf_counter() + deadline - time.time()
+    # going back to the root position is a repetition too
+    search.path = [position.zobrist_key]
+    alpha = _shared_alpha.value
+    position.make_move(move)
+    try:
+        value = -search.alpha_beta(depth - 1, float('-inf'), -alpha, 1)
+    except SearchAborted:
+        value = None
+
+    if value is not None:
+        with _shared_alpha.get_lock():
+            if value > _shared_alpha.value:
+                _shared_alpha.value = value
+    return move, value, value is not None and value > alpha, search.nodes + search.qnodes
+
+
+class ParallelSearch:
+
+    def __init__(self, position=None, history=(), workers=None, tt_mb=WORKER_TRANSPOSITION_TABLE_MB, context=None,
+                 bitbases=None):
+        """
+        Root parallel version of Search.iterative_deepening. The root moves are handed out one at a time
+        to a pool of worker processes, each searching its move with the best root value found so far (shared
+        between the processes) as alpha, and the results are merged into one best move. The position is sent
+        to the workers as BitBoard.serialize() ints. Starting the pool takes a moment, so keep one
+        ParallelSearch for a whole game (set_position() before each search) and use it as a context manager
+        (or call close()) so the workers are stopped.
+        :param position: BitBoard to search, None to give it to set_position later
+        :param history: zobrist keys of positions already seen in the game (scored as draws)
+        :param workers: number of worker processes (None for one per cpu)
+        :param tt_mb: transposition table size of each worker
+        :param context: multiprocessing context the workers are started from (None for a START_METHOD one,
+                        see LazySMP)
+        :param bitbases: AI.Bitbases.Bitbases the workers probe (each loads its own from the same directory),
+                         None for no probing
+        """
+        self.position = position
+        self.history = tuple(history)
+        self.workers = workers or os.cpu_count() or 1
+        self.nodes = 0
+        self.context = context if context is not None else multiprocessing.get_context(START_METHOD)
+        self.alpha = self.context.Value('d', float('-inf'))
+        self.executor = ProcessPoolExecutor(self.workers, mp_context=self.context, initializer=_init_worker,
+                                            initargs=(self.alpha, tt_mb,
+                                                      bitbases.directory if bitbases is not None else None))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.executor.shutdown()
+
+    def set_position(self, position, history=()):
+        """
+        Sets up the next search
+        :param position: BitBoard to search
+        :param history: zobrist keys of positions already seen in the game (scored as draws)
+        """
+        self.position = position
+        self.history = tuple(history)
+
+    def iterative_deepening(self, max_depth=4, movetime_ms=None):
+        """
+        Same as Search.iterative_deepening (without a node budget), searching the root moves in parallel
+        :return: (best move, value for the team to move, depth completed)
+        """
+        deadline = time.time() + movetime_ms / 1000 if movetime_ms is not None else None
+        self.nodes = 0
+        moves = self.position.legal_moves()
+        if not moves:
+            return None, Search(self.position).terminal_value(0), 0
+
+        best_move, best, completed = moves[0], 0, 0
+        for depth in range(1, max_depth + 1):
+            try:
+                results = self.search_root(moves, depth, deadline)
+            except SearchAborted:
+                break
+            # exact values win ties with upper bounds, then max keeps the first (the best move of the last iteration)
+            best_move, best, _ = max(results, key=lambda result: (result[1], result[2]))
+            completed = depth
+            # next iteration searches the best moves first (sorted is stable, so ties keep their order)
+            moves = [move for move, _, _ in sorted(results, key=lambda result: -result[1])]
+            if abs(best) >= MATE_BOUND:
+                break
+        return best_move, best, completed
+
+    def search_root(self, moves, depth, deadline=None):
+        """
+        Searches every root move to depth. The first move is searched on its own so the others
+        start with its value as alpha, the rest are searched in parallel.
+        :param moves: root move ints, most promising first
+        :param depth: depth to search
+        :param deadline: time.time() the search has to stop by (None for no limit)
+        :return: List of (move, value, exact) in the order of moves. Values of moves that didn't beat the
+                 alpha they were searched with are upper bounds (exact is False).
+        """
+        state = self.position.serialize()
+        self.alpha.value = float('-inf')
+        first = self.executor.submit(_search_move, state, self.history, moves[0], depth, deadline)
+        results = [first.result()]
+        futures = [self.executor.submit(_search_move, state, self.history, move, depth, deadline)
+                   for move in moves[1:]]
+        results += [future.result() for future in futures]
+
+        aborted = False
+        for _, value, _, nodes in results:
+            self.nodes += nodes
+            if value is None:
+                aborted = True
+        if aborted:
+            raise SearchAborted()
+        return [(move, value, exact) for move, value, exact, _ in results]
@@ -0,0 +1,534 @@
+import time
+
+from AI.TranspositionTable import TranspositionTable, EXACT, LOWER, UPPER
+from AI.MoveOrdering import MoveOrderer, MAX_PLY
+from AI.Bitbases import WIN, DRAW, LOSS
+from Board.Bitboard import pop_count
+
+MATE = 1000000
+# scores further from 0 than this are mates, stored in the transposition table relative to the node
+MATE_BOUND = MATE - 1000
+# same draw rule as Board.move_piece
+DRAW_MOVES_SINCE_TAKEN = 50
+# how often (in nodes) the clock is looked at
+TIME_CHECK_NODES = 256
+# most captures in a row the quiescence search follows past the end of the main search
+MAX_QUIESCENCE_DEPTH = 8
+# aspiration windows: from this depth the root is searched with a window this wide around the last
+# iteration's value, ASPIRATION_GROWTH times wider on each fail, open once wider than ASPIRATION_MAX
+ASPIRATION_MIN_DEPTH = 4
+ASPIRATION_WINDOW = 50
+ASPIRATION_GROWTH = 4
+ASPIRATION_MAX = 1000
+
+# null move pruning: the null move is searched this many plies shallower (one more from NULL_MOVE_DEEP_DEPTH)
+NULL_MOVE_REDUCTION = 2
+NULL_MOVE_MIN_DEPTH = 3
+NULL_MOVE_DEEP_DEPTH = 7
+# late move reductions: quiet moves from this index on are searched a ply shallower (two from LMR_DEEP_INDEX)
+LMR_MIN_INDEX = 3
+LMR_DEEP_INDEX = 8
+LMR_MIN_DEPTH = 3
+# futility pruning: quiet moves at depth 1 / 2 are skipped if the static evaluation plus this margin can't reach alpha
+FUTILITY_MARGINS = (0, 200, 500)
+# value of a position an endgame bitbase says is won (plus the evaluation, so the search still makes progress),
+# below the mate scores so a mate the search finds is played instead
+KNOWN_WIN = 100000
+# mop up in a won bitbase ending: the losing king is driven to the edge and the winning king brought close
+MOP_UP_EDGE = 20
+MOP_UP_KING_DISTANCE = 5
+
+
+class SearchAborted(Exception):
+    """
+    Raised inside the search when its time or node budget runs out
+    """
+    pass
+
+
+class Search:
+
+    def __init__(self, position, history=(), transposition_table=None, quiescence_depth=MAX_QUIESCENCE_DEPTH,
+                 null_move=True, late_move_reductions=True, futility_pruning=True, bitbases=None):
+        """
+        Minimax search with alpha beta pruning that runs on a BitBoard, making
+        and unmaking moves in place. Scores are from the point of view of the team
+        to move inside the recursion (negamax), max_value / min_value turn them
+        back into the Board.max_value / Board.min_value point of view.
+        :param position: BitBoard to search, it is left as it was once the search returns
+        :param history: zobrist keys of positions already seen in the game, going back to one of them
+                        (or to a position earlier in the search line) is scored as a draw
+        :param transposition_table: TranspositionTable to use (kept between searches by the caller),
+                                    a new one is made when None
+        :param quiescence_depth: cap on the captures in a row searched at the leaves (0 turns quiescence off)
+        :param null_move: null move pruning - if passing the turn still scores beta or better after a shallower
+                          search, the node is cut off (not in check, nor when the team to move has only pawns)
+        :param late_move_reductions: quiet moves ordered late are searched shallower first, and again at full
+                                     depth only if they beat alpha
+        :param futility_pruning: quiet moves near the leaves are skipped when the static evaluation is too far
+                                 below alpha for them to matter
+        :param bitbases: AI.Bitbases.Bitbases probed once few enough pieces are left, None for no probing
+        """
+        self.position = position
+        self.history = set(history)
+        self.tt = transposition_table if transposition_table is not None else TranspositionTable()
+        self.ordering = MoveOrderer()
+        self.path = []
+        self.quiescence_depth = quiescence_depth
+        # main search and quiescence search nodes are counted separately
+        self.nodes = 0
+        self.qnodes = 0
+        self.leaves = 0
+        self.deadline = None
+        self.max_nodes = None
+        # set (e.g. a threading.Event or multiprocessing.Event) to stop the search from outside
+        self.stop_event = None
+        # called as on_iteration(depth, best move, value) after each iteration of iterative_deepening
+        self.on_iteration = None
+        self.null_move = null_move
+        self.late_move_reductions = late_move_reductions
+        self.futility_pruning = futility_pruning
+        self.bitbases = bitbases
+        # nodes answered by a bitbase
+        self.bitbase_hits = 0
+        # bitbase result of the root position (None if no table covers it) and the team it says wins
+        self.root_bitbase = None
+        self.bitbase_winner = None
+        # how often each selective search technique kicked in
+        self.null_move_cutoffs = 0
+        self.lmr_reductions = 0
+        self.lmr_researches = 0
+        self.futility_pruned = 0
+        self.pvs_researches = 0
+        self.aspiration_researches = 0
+        # pv_table[ply] - best line found from the node at ply, built up from the leaves (triangular PV table)
+        self.pv_table = [[] for _ in range(MAX_PLY + 1)]
+        # principal variation of the last completed iteration (or max_value / min_value search)
+        self.pv = []
+
+    def max_value(self, white, limit, alpha, beta):
+        """
+        Same as Board.max_value - the maximizing team (white True / False) is to move
+        :return: (best move int, value for the maximizing team, leaves searched, principal variation move ints)
+        """
+        self.leaves = 0
+        self.tt.new_search()
+        self.ordering.new_search()
+        best_move, v = self.search_root(limit, alpha, beta)
+        self.pv = self.root_pv(best_move)
+        return best_move, v, self.leaves, self.pv
+
+    def min_value(self, white, limit, alpha, beta):
+        """
+        Same as Board.min_value - the minimizing team (not white) is to move
+        :return: (best move int for the minimizing team, value for the maximizing team, leaves searched,
+                  principal variation move ints)
+        """
+        self.leaves = 0
+        self.tt.new_search()
+        self.ordering.new_search()
+        best_move, v = self.search_root(limit, -beta, -alpha)
+        self.pv = self.root_pv(best_move)
+        return best_move, -v, self.leaves, self.pv
+
+    def iterative_deepening(self, max_depth=4, movetime_ms=None, max_nodes=None, start_depth=1):
+        """
+        Searches depth 1, 2, 3, ... up to max_depth, stopping early once movetime_ms or max_nodes
+        runs out (or stop_event is set). Each iteration's best move goes into the transposition table,
+        so it's searched first (and cuts off more) in the next one. From ASPIRATION_MIN_DEPTH the root
+        is searched with a narrow window around the last iteration's value, widened if the value falls
+        outside it. The principal variation of the last completed iteration is left in self.pv.
+        :param max_depth: deepest iteration
+        :param movetime_ms: wall clock budget in milliseconds (None for no limit)
+        :param max_nodes: node budget (None for no limit)
+        :param start_depth: first iteration (Lazy SMP helpers start at different depths)
+        :return: (best move, value for the team to move, depth completed) from the last completed
+                 iteration. If not even depth 1 completed the first legal move is returned with depth 0.
+        """
+        self.deadline = time.perf_counter() + movetime_ms / 1000 if movetime_ms is not None else None
+        self.max_nodes = max_nodes
+        self.nodes = 0
+        self.qnodes = 0
+        self.leaves = 0
+        self.bitbase_hits = 0
+        self.reset_pruning_counters()
+        self.tt.new_search()
+        self.ordering.new_search()
+
+        moves = self.position.legal_moves()
+        best_move = moves[0] if moves else None
+        best = self.terminal_value(0) if not moves else 0
+        completed = 0
+        self.pv = []
+        for depth in range(start_depth, max_depth + 1):
+            if not moves:
+                break
+            self.path = []
+            delta = ASPIRATION_WINDOW
+            if depth >= ASPIRATION_MIN_DEPTH and completed and abs(best) < MATE_BOUND:
+                alpha, beta = best - delta, best + delta
+            else:
+                alpha, beta = float('-inf'), float('inf')
+            try:
+                while True:
+                    move, v = self.search_root(depth, alpha, beta)
+                    if alpha < v < beta:
+                        break
+                    # outside the window: the value is only a bound, search again with a wider window
+                    self.aspiration_researches += 1
+                    delta *= ASPIRATION_GROWTH
+                    if v <= alpha:
+                        alpha = v - delta if delta <= ASPIRATION_MAX else float('-inf')
+                    else:
+                        beta = v + delta if delta <= ASPIRATION_MAX else float('inf')
+            except SearchAborted:
+                break
+            best_move, best, completed = move, v, depth
+            self.pv = self.root_pv(move)
+            if self.on_iteration is not None:
+                self.on_iteration(depth, best_move, best)
+            # no point searching deeper once a forced mate is found
+            if abs(best) >= MATE_BOUND:
+                break
+        self.deadline = None
+        self.max_nodes = None
+        return best_move, best, completed
+
+    def check_budget(self):
+        """
+        Raises SearchAborted when the node budget or (every TIME_CHECK_NODES nodes) the time budget is used up
+        or stop_event has been set. Quiescence nodes count towards the budget.
+        """
+        nodes = self.nodes + self.qnodes
+        if self.max_nodes is not None and nodes >= self.max_nodes:
+            raise SearchAborted()
+        if nodes % TIME_CHECK_NODES == 0:
+            if self.deadline is not None and time.perf_counter() >= self.deadline:
+                raise SearchAborted()
+            if self.stop_event is not None and self.stop_event.is_set():
+                raise SearchAborted()
+
+    def search_root(self, depth, alpha, beta):
+        """
+        :return: (best move, value for the team to move), best move is None when there are no legal moves
+        """
+        position = self.position
+        key = position.zobrist_key
+        moves = position.legal_moves()
+        if not moves:
+            return None, self.terminal_value(0)
+
+        entry = self.tt.probe(key)
+        hash_move = entry[3] if entry is not None else 0
+
+        self.probe_root_bitbase()
+
+        alpha_orig = alpha
+        best_move = None
+        best = float('-inf')
+        self.pv_table[0] = []
+        self.path.append(key)
+        for index, move in enumerate(self.ordering.order(position, moves, hash_move, 0)):
+            undo = position.make_move(move)
+            try:
+                v = self.search_move(depth, alpha, beta, 0, index == 0)
+            finally:
+                position.unmake_move(undo)
+            if v > best:
+                best = v
+                best_move = move
+            if v > alpha:
+                alpha = v
+                self.pv_table[0] = [move] + self.pv_table[1]
+            if alpha >= beta:
+                self.ordering.record_cutoff(position, move, index, 0, depth)
+                break
+        self.path.pop()
+
+        self.tt.store(key, depth, self.bound(best, alpha_orig, beta), best, best_move)
+        return best_move, best
+
+    def probe_root_bitbase(self):
+        """
+        Sets root_bitbase and bitbase_winner from the bitbase result of the current position, the root
+        """
+        position = self.position
+        self.root_bitbase = self.bitbases.probe(position) if self.bitbases is not None else None
+        if self.root_bitbase == WIN or self.root_bitbase == LOSS:
+            self.bitbase_winner = position.turn if self.root_bitbase == WIN else position.turn ^ 1
+        else:
+            self.bitbase_winner = None
+
+    def alpha_beta(self, depth, alpha, beta, ply, allow_null=True):
+        """
+        :param depth: plies left to search
+        :param alpha: lower bound
+        :param beta: upper bound
+        :param ply: plies from the root
+        :param allow_null: False right after a null move, so there aren't two in a row
+        :return: value of the position for the team to move
+        """
+        position = self.position
+        self.nodes += 1
+        self.pv_table[ply] = []
+        self.check_budget()
+
+        key = position.zobrist_key
+        if position.moves_since_taken >= DRAW_MOVES_SINCE_TAKEN or key in self.history or key in self.path:
+            self.leaves += 1
+            return 0
+        # an ending the bitbases cover is known to be won, drawn or lost without searching it. Once the root is
+        # in one, only draws are cut short - the way to mate in a won ending still has to be searched for.
+        if self.bitbases is not None and pop_count(position.occupied) <= self.bitbases.max_pieces:
+            result = self.bitbases.probe(position)
+            if result is not None and (self.root_bitbase is None or result == DRAW):
+                self.bitbase_hits += 1
+                self.leaves += 1
+                return self.bitbase_value(result)
+        if depth <= 0:
+            self.leaves += 1
+            return self.quiescence(alpha, beta, ply, 0)
+
+        # a deep enough result from another move order can answer the node without searching it
+        hash_move = 0
+        entry = self.tt.probe(key)
+        if entry is not None:
+            tt_depth, bound, tt_score, hash_move = entry
+            if tt_depth >= depth:
+                tt_score = score_from_tt(tt_score, ply)
+                if bound == EXACT or (bound == LOWER and tt_score >= beta) or (bound == UPPER and tt_score <= alpha):
+                    return tt_score
+
+        in_check = position.in_check()
+        static_eval = None
+        # null move: if the other team can't get below beta even when given a free move, this node won't matter
+        if (self.null_move and allow_null and not in_check and depth >= NULL_MOVE_MIN_DEPTH
+                and abs(beta) < MATE_BOUND and position.has_non_pawn_material(position.turn)):
+            static_eval = self.evaluate()
+            if static_eval >= beta:
+                reduction = NULL_MOVE_REDUCTION + (1 if depth >= NULL_MOVE_DEEP_DEPTH else 0)
+                undo = position.make_null_move()
+                try:
+                    v = -self.alpha_beta(depth - 1 - reduction, -beta, -beta + 1, ply + 1, False)
+                finally:
+                    position.unmake_null_move(undo)
+                if v >= beta:
+                    self.null_move_cutoffs += 1
+                    return beta
+
+        moves = position.legal_moves()
+        if not moves:
+            self.leaves += 1
+            return self.terminal_value(ply)
+
+        # futility: near the leaves a quiet move can't make up a big gap to alpha
+        futile = False
+        if (self.futility_pruning and depth < len(FUTILITY_MARGINS) and not in_check
+                and abs(alpha) < MATE_BOUND):
+            if static_eval is None:
+                static_eval = self.evaluate()
+            futile = static_eval + FUTILITY_MARGINS[depth] <= alpha
+
+        alpha_orig = alpha
+        best_move = 0
+        best = float('-inf')
+        searched = 0
+        self.path.append(key)
+        for index, move in enumerate(self.ordering.order(position, moves, hash_move, ply)):
+            quiet = (futile or index >= LMR_MIN_INDEX) and move != hash_move and self.ordering.is_quiet(position, move)
+            undo = position.make_move(move)
+            try:
+                gives_check = quiet and position.in_check()
+                if futile and quiet and not gives_check and searched:
+                    self.futility_pruned += 1
+                    continue
+                searched += 1
+                v = None
+                if (self.late_move_reductions and quiet and not gives_check and not in_check
+                        and depth >= LMR_MIN_DEPTH and index >= LMR_MIN_INDEX and searched > 1):
+                    reduction = 2 if index >= LMR_DEEP_INDEX and depth > LMR_MIN_DEPTH else 1
+                    self.lmr_reductions += 1
+                    v = -self.alpha_beta(depth - 1 - reduction, -alpha - 1, -alpha, ply + 1)
+                    if v > alpha:
+                        self.lmr_researches += 1
+                        v = None
+                if v is None:
+                    v = self.search_move(depth, alpha, beta, ply, searched == 1)
+            finally:
+                position.unmake_move(undo)
+            if v > best:
+                best = v
+                best_move = move
+            if v > alpha:
+                alpha = v
+                self.pv_table[ply] = [move] + self.pv_table[ply + 1]
+            if alpha >= beta:
+                self.ordering.record_cutoff(position, move, index, ply, depth)
+                break
+        self.path.pop()
+
+        self.tt.store(key, depth, self.bound(best, alpha_orig, beta), score_to_tt(best, ply), best_move)
+        return best
+
+    def search_move(self, depth, alpha, beta, ply, first):
+        """
+        Principal variation search of a move just made at a node ply plies from the root: the first move
+        gets the full window, the rest are expected to fail low, which a null window (alpha, alpha + 1)
+        shows cheaply, and are only searched again with the full window if they turn out better than alpha
+        :param depth: plies left at the node the move was made from
+        :param first: True for the node's first move searched
+        :return: value of the move for the team that made it
+        """
+        if first:
+            return -self.alpha_beta(depth - 1, -beta, -alpha, ply + 1)
+        v = -self.alpha_beta(depth - 1, -alpha - 1, -alpha, ply + 1)
+        if alpha < v < beta:
+            self.pvs_researches += 1
+            v = -self.alpha_beta(depth - 1, -beta, -alpha, ply + 1)
+        return v
+
+    def quiescence(self, alpha, beta, ply, qdepth):
+        """
+        Search of just captures and promotions at the leaves of the main search, so leaves in the
+        middle of an exchange aren't scored by material alone. The team to move can always "stand pat"
+        (take the static evaluation) instead of capturing, unless it's in check, when every move is searched.
+        :param alpha: lower bound
+        :param beta: upper bound
+        :param ply: plies from the root
+        :param qdepth: plies into the quiescence search, it stops at self.quiescence_depth
+        :return: value of the position for the team to move
+        """
+        position = self.position
+        if qdepth:
+            self.qnodes += 1
+            self.check_budget()
+
+        in_check = qdepth < self.quiescence_depth and position.in_check()
+        if in_check:
+            best = float('-inf')
+            moves = position.legal_moves()
+            if not moves:
+                return -MATE + ply
+        else:
+            best = self.evaluate()
+            if best >= beta or qdepth >= self.quiescence_depth:
+                return best
+            if best > alpha:
+                alpha = best
+            moves = position.legal_moves(True)
+
+        # captures that lose material by static exchange evaluation are left out, they'd rarely beat standing pat
+        for move in self.ordering.order(position, moves, 0, ply, prune_losing=not in_check):
+            undo = position.make_move(move)
+            try:
+                v = -self.quiescence(-beta, -alpha, ply + 1, qdepth + 1)
+            finally:
+                position.unmake_move(undo)
+            if v > best:
+                best = v
+            if v > alpha:
+                alpha = v
+            if alpha >= beta:
+                break
+        return best
+
+    def root_pv(self, best_move):
+        """
+        :return: principal variation of the last root search, starting with best_move
+        """
+        pv = self.pv_table[0]
+        if pv and pv[0] == best_move:
+            return list(pv)
+        return [best_move] if best_move else []
+
+    def reset_pruning_counters(self):
+        self.null_move_cutoffs = 0
+        self.lmr_reductions = 0
+        self.lmr_researches = 0
+        self.futility_pruned = 0
+        self.pvs_researches = 0
+        self.aspiration_researches = 0
+
+    def pruning_stats(self):
+        """
+        :return: dictionary of how often each selective search technique kicked in
+        """
+        return {'null_move_cutoffs': self.null_move_cutoffs, 'lmr_reductions': self.lmr_reductions,
+                'lmr_researches': self.lmr_researches, 'futility_pruned': self.futility_pruned,
+                'pvs_researches': self.pvs_researches, 'aspiration_researches': self.aspiration_researches}
+
+    @staticmethod
+    def bound(score, alpha, beta):
+        """
+        :return: bound type of a score found searching with window (alpha, beta)
+        """
+        if score <= alpha:
+            return UPPER
+        if score >= beta:
+            return LOWER
+        return EXACT
+
+    def terminal_value(self, ply):
+        """
+        :return: value for the team to move when it has no legal moves - mated (sooner is worse) or stalemate
+        """
+        if self.position.in_check():
+            return -MATE + ply
+        return 0
+
+    def evaluate(self):
+        """
+        :return: static evaluation (BitBoard.evaluate - material and piece square tables) for the team to move,
+                 with the mop up bonus when the root is a won bitbase ending
+        """
+        if self.bitbase_winner is not None:
+            bonus = self.mop_up(self.bitbase_winner)
+            return self.position.evaluate() + (bonus if self.position.turn == self.bitbase_winner else -bonus)
+        return self.position.evaluate()
+
+    def mop_up(self, winner):
+        """
+        :return: bonus for the winning team of a bitbase ending - its king close to the losing king and the
+                 losing king near the edge, where it can be mated
+        """
+        position = self.position
+        king = position.king_square(winner)
+        row, col = divmod(position.king_square(winner ^ 1), 8)
+        edge = max(abs(2 * row - 7), abs(2 * col - 7)) // 2
+        distance = max(abs(row - king // 8), abs(col - king % 8))
+        return MOP_UP_EDGE * edge - MOP_UP_KING_DISTANCE * distance
+
+    def bitbase_value(self, result):
+        """
+        :param result: Bitbases.probe result for the position
+        :return: value for the team to move - KNOWN_WIN plus the evaluation and mop up bonus when it wins,
+                 the same from the other side when it loses, 0 for a draw
+        """
+        if result == DRAW:
+            return 0
+        position = self.position
+        winner = position.turn if result == WIN else position.turn ^ 1
+        bonus = KNOWN_WIN + self.mop_up(winner)
+        return position.evaluate() + (bonus if result == WIN else -bonus)
+
+
+def score_to_tt(score, ply):
+    """
+    :return: score to store for a node ply plies from the root - mate scores are stored as distance from the node
+    """
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def score_from_tt(score, ply):
+    """
+    :return: stored score turned back into a score for a node ply plies from the root
+    """
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
@@ -0,0 +1,186 @@
+# bound types, 0 is left for an empty entry
+EXACT, LOWER, UPPER = 1, 2, 3
+
+# an entry is two 64 bit words, the zobrist key and the packed data
+ENTRY_WORDS = 2
+ENTRY_BYTES = 16
+# entries per bucket, a key can go in either entry of its bucket
+BUCKET_ENTRIES = 2
+BUCKET_WORDS = ENTRY_WORDS * BUCKET_ENTRIES
+# clear() zeroes the table this many bytes at a time
+CLEAR_CHUNK_BYTES = 1 << 20
+
+# data word layout: move (18 bits) | score (24 bits, offset) | depth (8 bits) | bound (2 bits) | age (8 bits)
+MOVE_BITS = 18
+SCORE_SHIFT = 18
+SCORE_OFFSET = 1 << 23
+DEPTH_SHIFT = 42
+BOUND_SHIFT = 50
+AGE_SHIFT = 52
+
+
+def table_buckets(size_mb):
+    """
+    :return: number of buckets in a table of size_mb megabytes (a power of two)
+    """
+    buckets = max(1, (size_mb * 1024 * 1024) // (ENTRY_BYTES * BUCKET_ENTRIES))
+    return 1 << (buckets.bit_length() - 1)
+
+
+def table_bytes(size_mb):
+    """
+    :return: bytes a TranspositionTable(size_mb) needs, for allocating a buffer to share between processes
+    """
+    return table_buckets(size_mb) * BUCKET_WORDS * 8
+
+
+def pack(depth, bound, score, move, age):
+    return (move | (score + SCORE_OFFSET) << SCORE_SHIFT | depth << DEPTH_SHIFT | bound << BOUND_SHIFT |
+            age << AGE_SHIFT)
+
+
+def unpack(data):
+    """
+    :return: (depth, bound, score, move, age)
+    """
+    return ((data >> DEPTH_SHIFT) & 0xFF, (data >> BOUND_SHIFT) & 3,
+            ((data >> SCORE_SHIFT) & 0xFFFFFF) - SCORE_OFFSET, data & ((1 << MOVE_BITS) - 1),
+            (data >> AGE_SHIFT) & 0xFF)
+
+
+class TranspositionTable:
+
+    def __init__(self, size_mb=16, buffer=None):
+        """
+        Fixed size hash table of search results keyed by zobrist key. The whole
+        table is allocated up front as one buffer of 64 bit words, two entries
+        (key word, data word) per bucket. Each entry stores the depth searched,
+        the bound type (EXACT, LOWER or UPPER), the score and the best move.
+        The key word holds key ^ data, so an entry torn by two processes writing
+        it at once (see buffer) doesn't match any key and is just a miss.
+        :param size_mb: size of the table in megabytes (rounded down to a power of two number of buckets)
+        :param buffer: writable buffer of at least table_bytes(size_mb) bytes to keep the table in (e.g. a
+                       multiprocessing.shared_memory block's buf, to share the table), a new one when None.
+                       Call release() before closing it.
+        """
+        self.buckets = table_buckets(size_mb)
+        self.mask = self.buckets - 1
+        if buffer is None:
+            buffer = bytearray(table_bytes(size_mb))
+        self.table = memoryview(buffer)[:table_bytes(size_mb)].cast('Q')
+        self.age = 0
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+
+    def size_mb(self):
+        return self.buckets * BUCKET_ENTRIES * ENTRY_BYTES / (1024 * 1024)
+
+    def new_search(self):
+        """
+        Called at the start of each search so entries from older searches get replaced first
+        """
+        self.age = (self.age + 1) & 0xFF
+
+    def release(self):
+        """
+        Lets go of the buffer the table is kept in
+        """
+        self.table.release()
+
+    def clear(self):
+        """
+        Empties the table, CLEAR_CHUNK_BYTES at a time so a big table doesn't need a zeroed copy of itself
+        """
+        with self.table.cast('B') as raw:
+            zeros = bytes(min(CLEAR_CHUNK_BYTES, len(raw)))
+            for start in range(0, len(raw), len(zeros)):
+                end = min(start + len(zeros), len(raw))
+                raw[start:end] = zeros[:end - start]
+        self.age = 0
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+
+    def probe(self, key):
+        """
+        :param key: zobrist key of the position
+        :return: (depth, bound, score, move) stored for key, None if there isn't an entry for it. A miss
+                 on a bucket holding other positions is also counted as a collision.
+        """
+        table = self.table
+        base = (key & self.mask) * BUCKET_WORDS
+        for slot in range(base, base + BUCKET_WORDS, ENTRY_WORDS):
+            data = table[slot + 1]
+            if data and table[slot] ^ data == key:
+                self.hits += 1
+                return ((data >> DEPTH_SHIFT) & 0xFF, (data >> BOUND_SHIFT) & 3,
+                        ((data >> SCORE_SHIFT) & 0xFFFFFF) - SCORE_OFFSET, data & ((1 << MOVE_BITS) - 1))
+        self.misses += 1
+        if table[base + 1] or table[base + 3]:
+            self.collisions += 1
+        return None
+
+    def store(self, key, depth, bound, score, move):
+        """
+        Stores a search result. If key is already in its bucket that entry is updated (keeping the old
+        best move if move is 0), otherwise the entry from the oldest search, then the shallowest, is replaced.
+        :param key: zobrist key of the position
+        :param depth: depth searched
+        :param bound: EXACT, LOWER (score >= beta) or UPPER (score <= alpha)
+        :param score: score found
+        :param move: best move found (0 for none)
+        """
+        table = self.table
+        base = (key & self.mask) * BUCKET_WORDS
+        self.stores += 1
+
+        replace = None
+        replace_priority = None
+        for slot in range(base, base + BUCKET_WORDS, ENTRY_WORDS):
+            data = table[slot + 1]
+            if not data:
+                if replace_priority is None or replace_priority >= 0:
+                    replace, replace_priority = slot, -1
+                continue
+            if table[slot] ^ data == key:
+                if not move:
+                    move = data & ((1 << MOVE_BITS) - 1)
+                replace = slot
+                break
+            # keep entries from this search and deep entries
+            priority = (data >> DEPTH_SHIFT) & 0xFF
+            if (data >> AGE_SHIFT) & 0xFF == self.age:
+                priority += 256
+            if replace_priority is None or priority < replace_priority:
+                replace, replace_priority = slot, priority
+
+        data = pack(min(depth, 0xFF), bound, score, move, self.age)
+        table[replace] = key ^ data
+        table[replace + 1] = data
+
+    def hashfull(self, sample=1000):
+        """
+        :return: permille of the first sample entries used by the current search
+        """
+        table = self.table
+        entries = min(sample, self.buckets * BUCKET_ENTRIES)
+        used = 0
+        for entry in range(entries):
+            data = table[entry * ENTRY_WORDS + 1]
+            if data and (data >> AGE_SHIFT) & 0xFF == self.age:
+                used += 1
+        return used * 1000 // entries
+
+    def stats(self):
+        """
+        :return: dictionary of the hit / miss / collision / store counters
+        """
+        probes = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'collisions': self.collisions, 'stores': self.stores,
+                'hit_rate': self.hits / probes if probes else 0.0}
@@ -0,0 +1,950 @@
+from Pieces.Pawn import Pawn
+from Pieces.Rook import Rook
+from Pieces.Bishop import Bishop
+from Pieces.Knight import Knight
+from Pieces.Queen import Queen
+from Pieces.King import King
+from Pieces.Team import Team
+from Board.Zobrist import PIECE_KEYS, BLACK_TO_MOVE_KEY, CASTLING_KEYS, EP_KEYS
+from AI.Evaluation import MG, EG, PHASE, TOTAL_PHASE
+
+# squares are numbered row * 8 + col, so square 0 is black's queen side rook corner (row 0, col 0)
+# and white's pieces start on the high squares (rows 6 and 7), the same layout as Board.board
+BLACK = Team.BLACK.value
+WHITE = Team.WHITE.value
+
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+EMPTY = 12
+PIECE_CLASSES = (Pawn, Knight, Bishop, Rook, Queen, King)
+PIECE_TYPES = {cls: piece_type for piece_type, cls in enumerate(PIECE_CLASSES)}
+# same values as Board.score
+PIECE_VALUES = (1, 6, 6, 8, 20, 100)
+
+FULL = (1 << 64) - 1
+FILE_A = sum(1 << (row * 8) for row in range(8))
+FILE_H = FILE_A << 7
+ROW_MASKS = [0xFF << (row * 8) for row in range(8)]
+
+# FEN letters of the piece types
+FEN_PIECES = 'pnbrqk'
+
+# move flags, kept above the from / to / promotion bits of a move
+NORMAL, DOUBLE_PUSH, EN_PASSANT, CASTLE = range(4)
+
+# castling rights bits
+WHITE_KING_SIDE, WHITE_QUEEN_SIDE, BLACK_KING_SIDE, BLACK_QUEEN_SIDE = 1, 2, 4, 8
+# (king from, king to, rook from, rook to, squares that must be empty, squares the king can't be attacked on)
+CASTLES = {
+    WHITE_KING_SIDE: (60, 62, 63, 61, (61, 62), (60, 61, 62)),
+    WHITE_QUEEN_SIDE: (60, 58, 56, 59, (57, 58, 59), (60, 59, 58)),
+    BLACK_KING_SIDE: (4, 6, 7, 5, (5, 6), (4, 5, 6)),
+    BLACK_QUEEN_SIDE: (4, 2, 0, 3, (1, 2, 3), (4, 3, 2)),
+}
+CASTLE_ROOK_SQUARES = {castle[1]: (castle[2], castle[3]) for castle in CASTLES.values()}
+# rights that survive a move from / to a square
+CASTLE_MASK = [15] * 64
+CASTLE_MASK[60] &= ~(WHITE_KING_SIDE | WHITE_QUEEN_SIDE)
+CASTLE_MASK[63] &= ~WHITE_KING_SIDE
+CASTLE_MASK[56] &= ~WHITE_QUEEN_SIDE
+CASTLE_MASK[4] &= ~(BLACK_KING_SIDE | BLACK_QUEEN_SIDE)
+CASTLE_MASK[7] &= ~BLACK_KING_SIDE
+CASTLE_MASK[0] &= ~BLACK_QUEEN_SIDE
+
+
+def encode_move(from_sq, to_sq, promotion=0, flag=NORMAL):
+    """
+    :param from_sq: square the piece moves from
+    :param to_sq: square the piece moves to
+    :param promotion: piece type a pawn is promoted to (0 for no promotion)
+    :param flag: NORMAL, DOUBLE_PUSH, EN_PASSANT or CASTLE
+    :return: move packed into an int
+    """
+    return from_sq | to_sq << 6 | promotion << 12 | flag << 15
+
+
+def move_from(move):
+    return move & 63
+
+
+def move_to(move):
+    return (move >> 6) & 63
+
+
+def move_promotion(move):
+    return (move >> 12) & 7
+
+
+def move_flag(move):
+    return move >> 15
+
+
+def _step_attacks(steps):
+    table = []
+    for sq in range(64):
+        row, col = divmod(sq, 8)
+        attacks = 0
+        for d_row, d_col in steps:
+            if 0 <= row + d_row < 8 and 0 <= col + d_col < 8:
+                attacks |= 1 << ((row + d_row) * 8 + col + d_col)
+        table.append(attacks)
+    return table
+
+
+KNIGHT_ATTACKS = _step_attacks([(1, 2), (2, 1), (1, -2), (-2, 1), (-1, 2), (2, -1), (-1, -2), (-2, -1)])
+KING_ATTACKS = _step_attacks([(1, 1), (1, -1), (-1, 1), (-1, -1), (0, 1), (0, -1), (1, 0), (-1, 0)])
+# PAWN_ATTACKS[color][sq] - squares a pawn of color on sq attacks (white moves towards row 0)
+PAWN_ATTACKS = [_step_attacks([(1, -1), (1, 1)]), _step_attacks([(-1, -1), (-1, 1)])]
+
+# ray directions, the first four are rook directions and the last four bishop directions
+DIRECTIONS = [(-1, 0), (1, 0), (0, 1), (0, -1), (-1, 1), (-1, -1), (1, 1), (1, -1)]
+ROOK_DIRECTIONS = range(0, 4)
+BISHOP_DIRECTIONS = range(4, 8)
+# True when squares get bigger along the ray, so the nearest blocker is the lowest bit
+POSITIVE = [d_row * 8 + d_col > 0 for d_row, d_col in DIRECTIONS]
+
+
+def _ray(sq, d_row, d_col):
+    row, col = divmod(sq, 8)
+    ray = 0
+    row, col = row + d_row, col + d_col
+    while 0 <= row < 8 and 0 <= col < 8:
+        ray |= 1 << (row * 8 + col)
+        row, col = row + d_row, col + d_col
+    return ray
+
+
+# RAYS[direction][sq] - every square from sq (not included) to the edge of the board
+RAYS = [[_ray(sq, d_row, d_col) for sq in range(64)] for d_row, d_col in DIRECTIONS]
+
+
+def _between(from_sq, to_sq):
+    for direction, (d_row, d_col) in enumerate(DIRECTIONS):
+        if RAYS[direction][from_sq] >> to_sq & 1:
+            return RAYS[direction][from_sq] & ~RAYS[direction][to_sq] & ~(1 << to_sq)
+    return 0
+
+
+# BETWEEN[a][b] - squares strictly between a and b when they share a row, column or diagonal, otherwise 0
+BETWEEN = [[_between(a, b) for b in range(64)] for a in range(64)]
+
+
+def ray_attacks(sq, occupied, direction):
+    """
+    :return: squares attacked from sq along direction, up to and including the first blocker
+    """
+    ray = RAYS[direction][sq]
+    blockers = ray & occupied
+    if blockers:
+        if POSITIVE[direction]:
+            blocker = (blockers & -blockers).bit_length() - 1
+        else:
+            blocker = blockers.bit_length() - 1
+        ray ^= RAYS[direction][blocker]
+    return ray
+
+
+def rook_attacks(sq, occupied):
+    return (ray_attacks(sq, occupied, 0) | ray_attacks(sq, occupied, 1) |
+            ray_attacks(sq, occupied, 2) | ray_attacks(sq, occupied, 3))
+
+
+def bishop_attacks(sq, occupied):
+    return (ray_attacks(sq, occupied, 4) | ray_attacks(sq, occupied, 5) |
+            ray_attacks(sq, occupied, 6) | ray_attacks(sq, occupied, 7))
+
+
+def squares(bb):
+    """
+    Generator of the squares set in bitboard bb, lowest first
+    """
+    while bb:
+        bit = bb & -bb
+        yield bit.bit_length() - 1
+        bb ^= bit
+
+
+def pop_count(bb):
+    return bin(bb).count('1')
+
+
+class BitBoard:
+
+    def __init__(self):
+        """
+        Bitboard version of Board which the AI searches on. The position is held
+        in twelve 64 bit ints (self.pieces[color * 6 + piece type]) plus occupancy
+        masks, with a square -> piece lookup (self.mailbox) for captures. Moves are
+        ints (see encode_move) and are made / taken back in place with make_move
+        and unmake_move. Use BitBoard.from_board to build one from a Board. Instance
+        variables:
+            self.pieces - List of 12 bitboards
+            self.occupancy - [black pieces bitboard, white pieces bitboard]
+            self.occupied - bitboard of every piece
+            self.mailbox - bytearray of 64 piece codes (color * 6 + piece type, EMPTY for none)
+            self.turn - WHITE or BLACK
+            self.castling - castling rights bits
+            self.ep_square - square a pawn can move to capturing en passant, -1 for none
+            self.moves_since_taken - same as Board.moves_since_taken
+            self.zobrist_key - same as Board.zobrist_key, kept up to date by make_move
+            self.mg / self.eg - white - black middlegame / endgame evaluation (AI.Evaluation), kept up to
+                                date by put_piece and make_move
+            self.phase - game phase (AI.Evaluation.PHASE_WEIGHTS of the pieces on the board)
+        """
+        self.pieces = [0] * 12
+        self.occupancy = [0, 0]
+        self.occupied = 0
+        self.mailbox = bytearray([EMPTY]) * 64
+        self.turn = WHITE
+        self.castling = 0
+        self.ep_square = -1
+        self.moves_since_taken = 0
+        self.zobrist_key = 0
+        self.mg = 0
+        self.eg = 0
+        self.phase = 0
+
+    @classmethod
+    def from_board(cls, board):
+        """
+        :param board: Board object
+        :return: BitBoard in the same position as board
+        """
+        position = cls()
+        for row in range(8):
+            for col in range(8):
+                pc = board.board[row][col]
+                if pc:
+                    position.put_piece(pc.get_team().value * 6 + PIECE_TYPES[type(pc)], row * 8 + col)
+
+        for color, row in ((WHITE, 7), (BLACK, 0)):
+            king = board.board[row][4]
+            if isinstance(king, King) and king.get_team().value == color and king.init_position:
+                for right, rook_col in ((WHITE_KING_SIDE, 7), (WHITE_QUEEN_SIDE, 0)):
+                    rook = board.board[row][rook_col]
+                    if isinstance(rook, Rook) and rook.get_team().value == color and rook.init_position:
+                        position.castling |= right if color == WHITE else right << 2
+
+        # only the team that just moved can have a pawn that can be taken en passant
+        just_moved = board.black_pieces if board.team_turn() == Team.WHITE else board.white_pieces
+        for pc in just_moved:
+            if isinstance(pc, Pawn) and pc.just_moved_two:
+                position.ep_square = (pc.row - pc.direction) * 8 + pc.col
+
+        position.turn = board.team_turn().value
+        position.moves_since_taken = board.moves_since_taken
+        position.zobrist_key = position.compute_zobrist_key()
+        return position
+
+    @classmethod
+    def from_fen(cls, fen):
+        """
+        :param fen: FEN string, the fields after the piece placement can be left off (the half move clock
+                    is used as moves_since_taken, the full move number is ignored)
+        :return: BitBoard in the position
+        """
+        fields = fen.split()
+        ranks = fields[0].split('/') if fields else []
+        if len(ranks) != 8:
+            raise ValueError(f"FEN needs 8 ranks: {fen!r}")
+        position = cls()
+        for row, rank in enumerate(ranks):
+            col = 0
+            for char in rank:
+                if char.isdigit():
+                    col += int(char)
+                    continue
+                piece_type = FEN_PIECES.find(char.lower())
+                if piece_type == -1 or col > 7:
+                    raise ValueError(f"bad FEN rank {rank!r}: {fen!r}")
+                position.put_piece((WHITE if char.isupper() else BLACK) * 6 + piece_type, row * 8 + col)
+                col += 1
+            if col != 8:
+                raise ValueError(f"FEN rank {rank!r} isn't 8 squares: {fen!r}")
+
+        if len(fields) > 1 and fields[1] not in ('w', 'b'):
+            raise ValueError(f"FEN side to move must be w or b: {fen!r}")
+        position.turn = BLACK if len(fields) > 1 and fields[1] == 'b' else WHITE
+        if len(fields) > 2:
+            for char, right in zip('KQkq', (WHITE_KING_SIDE, WHITE_QUEEN_SIDE, BLACK_KING_SIDE, BLACK_QUEEN_SIDE)):
+                if char in fields[2]:
+                    position.castling |= right
+        if len(fields) > 3 and fields[3] != '-':
+            position.ep_square = (8 - int(fields[3][1])) * 8 + 'abcdefgh'.index(fields[3][0])
+        if len(fields) > 4:
+            position.moves_since_taken = int(fields[4])
+        position.zobrist_key = position.compute_zobrist_key()
+        return position
+
+    def to_fen(self, fullmove=1):
+        """
+        :param fullmove: full move number to write (positions don't keep one)
+        :return: FEN string of the position, moves_since_taken is written as the half move clock
+        """
+        ranks = []
+        for row in range(8):
+            rank = ''
+            empty = 0
+            for code in self.mailbox[row * 8:row * 8 + 8]:
+                if code == EMPTY:
+                    empty += 1
+                    continue
+                if empty:
+                    rank += str(empty)
+                    empty = 0
+                letter = FEN_PIECES[code % 6]
+                rank += letter.upper() if code // 6 == WHITE else letter
+            if empty:
+                rank += str(empty)
+            ranks.append(rank)
+
+        castling = ''.join(char for char, right in zip('KQkq', (WHITE_KING_SIDE, WHITE_QUEEN_SIDE, BLACK_KING_SIDE,
+                                                                BLACK_QUEEN_SIDE)) if self.castling & right)
+        ep = '-' if self.ep_square == -1 else 'abcdefgh'[self.ep_square & 7] + str(8 - (self.ep_square >> 3))
+        return (f"{'/'.join(ranks)} {'w' if self.turn == WHITE else 'b'} {castling or '-'} {ep} "
+                f"{self.moves_since_taken} {fullmove}")
+
+    def to_board(self):
+        """
+        :return: Board object in the same position as this BitBoard
+        """
+        from Board.Board import Board
+
+        grid = [[False for _ in range(8)] for _ in range(8)]
+        white_pieces = []
+        black_pieces = []
+        for sq in range(64):
+            code = self.mailbox[sq]
+            if code == EMPTY:
+                continue
+            color, piece_type = divmod(code, 6)
+            team = Team(color)
+            row, col = divmod(sq, 8)
+            if piece_type == PAWN:
+                start_row = 6 if color == WHITE else 1
+                pc = Pawn(team, row, col, row == start_row, self.ep_square != -1 and
+                          sq == self.ep_square + (-8 if color == WHITE else 8))
+            elif piece_type == ROOK:
+                corners = {(WHITE, 63): WHITE_KING_SIDE, (WHITE, 56): WHITE_QUEEN_SIDE,
+                           (BLACK, 7): BLACK_KING_SIDE, (BLACK, 0): BLACK_QUEEN_SIDE}
+                pc = Rook(team, row, col, bool(self.castling & corners.get((color, sq), 0)))
+            elif piece_type == KING:
+                rights = (WHITE_KING_SIDE | WHITE_QUEEN_SIDE) << (0 if color == WHITE else 2)
+                pc = King(team, row, col, bool(self.castling & rights))
+            else:
+                pc = PIECE_CLASSES[piece_type](team, row, col)
+            grid[row][col] = pc
+            (white_pieces if color == WHITE else black_pieces).append(pc)
+
+        return Board(grid, white_pieces, black_pieces, self.moves_since_taken, {}, Team(self.turn))
+
+    def copy(self):
+        """
+        :return: copy of this BitBoard (a few ints and the mailbox buffer, no Piece objects)
+        """
+        position = BitBoard()
+        position.pieces = self.pieces[:]
+        position.occupancy = self.occupancy[:]
+        position.occupied = self.occupied
+        position.mailbox = bytearray(self.mailbox)
+        position.turn = self.turn
+        position.castling = self.castling
+        position.ep_square = self.ep_square
+        position.moves_since_taken = self.moves_since_taken
+        position.zobrist_key = self.zobrist_key
+        position.mg = self.mg
+        position.eg = self.eg
+        position.phase = self.phase
+        return position
+
+    def serialize(self):
+        """
+        Compact form of the position for sending to other processes (a few ints rather than
+        a pickled Board and its Piece objects)
+        :return: (tuple of the 12 piece bitboards, turn, castling, ep_square, moves_since_taken)
+        """
+        return tuple(self.pieces), self.turn, self.castling, self.ep_square, self.moves_since_taken
+
+    @classmethod
+    def deserialize(cls, state):
+        """
+        :param state: tuple from serialize()
+        :return: BitBoard in the serialized position
+        """
+        position = cls()
+        pieces, position.turn, position.castling, position.ep_square, position.moves_since_taken = state
+        for code, bb in enumerate(pieces):
+            for sq in squares(bb):
+                position.put_piece(code, sq)
+        position.zobrist_key = position.compute_zobrist_key()
+        return position
+
+    def compute_zobrist_key(self):
+        """
+        :return: zobrist key of the position worked out from scratch
+        """
+        key = 0
+        for sq in range(64):
+            if self.mailbox[sq] != EMPTY:
+                key ^= PIECE_KEYS[self.mailbox[sq]][sq]
+        if self.turn == BLACK:
+            key ^= BLACK_TO_MOVE_KEY
+        key ^= CASTLING_KEYS[self.castling]
+        if self.ep_square != -1:
+            key ^= EP_KEYS[self.ep_square & 7]
+        return key
+
+    def put_piece(self, code, sq):
+        """
+        Puts the piece code on the empty square sq (used to set positions up, doesn't update zobrist_key)
+        """
+        bit = 1 << sq
+        self.pieces[code] |= bit
+        self.occupancy[code // 6] |= bit
+        self.occupied |= bit
+        self.mailbox[sq] = code
+        self.mg += MG[code][sq]
+        self.eg += EG[code][sq]
+        self.phase += PHASE[code]
+
+    def make_move(self, move):
+        """
+        Method that makes move in place. No valid move checking here.
+        :param move: move int from legal_moves
+        :return: undo tuple for unmake_move
+        """
+        from_sq = move & 63
+        to_sq = (move >> 6) & 63
+        promotion = (move >> 12) & 7
+        flag = move >> 15
+        us = self.turn
+        them = us ^ 1
+        pieces = self.pieces
+        occupancy = self.occupancy
+        mailbox = self.mailbox
+
+        code = mailbox[from_sq]
+        captured = mailbox[to_sq]
+        undo = (move, captured, self.castling, self.ep_square, self.moves_since_taken, self.zobrist_key,
+                self.mg, self.eg, self.phase)
+        key = self.zobrist_key ^ BLACK_TO_MOVE_KEY ^ CASTLING_KEYS[self.castling]
+        if self.ep_square != -1:
+            key ^= EP_KEYS[self.ep_square & 7]
+        piece_keys = PIECE_KEYS[code]
+        key ^= piece_keys[from_sq] ^ piece_keys[to_sq]
+        mg_table = MG[code]
+        eg_table = EG[code]
+        mg = self.mg + mg_table[to_sq] - mg_table[from_sq]
+        eg = self.eg + eg_table[to_sq] - eg_table[from_sq]
+
+        from_to = (1 << from_sq) | (1 << to_sq)
+        pieces[code] ^= from_to
+        occupancy[us] ^= from_to
+        mailbox[from_sq] = EMPTY
+        mailbox[to_sq] = code
+        self.moves_since_taken += 1
+
+        if captured != EMPTY:
+            to_bit = 1 << to_sq
+            pieces[captured] ^= to_bit
+            occupancy[them] ^= to_bit
+            self.moves_since_taken = 0
+            key ^= PIECE_KEYS[captured][to_sq]
+            mg -= MG[captured][to_sq]
+            eg -= EG[captured][to_sq]
+            self.phase -= PHASE[captured]
+        elif flag == EN_PASSANT:
+            captured_sq = to_sq + 8 if us == WHITE else to_sq - 8
+            captured_bit = 1 << captured_sq
+            pieces[them * 6 + PAWN] ^= captured_bit
+            occupancy[them] ^= captured_bit
+            mailbox[captured_sq] = EMPTY
+            self.moves_since_taken = 0
+            key ^= PIECE_KEYS[them * 6 + PAWN][captured_sq]
+            mg -= MG[them * 6 + PAWN][captured_sq]
+            eg -= EG[them * 6 + PAWN][captured_sq]
+        elif flag == CASTLE:
+            rook_from, rook_to = CASTLE_ROOK_SQUARES[to_sq]
+            rook_from_to = (1 << rook_from) | (1 << rook_to)
+            pieces[us * 6 + ROOK] ^= rook_from_to
+            occupancy[us] ^= rook_from_to
+            mailbox[rook_to] = mailbox[rook_from]
+            mailbox[rook_from] = EMPTY
+            rook_keys = PIECE_KEYS[us * 6 + ROOK]
+            key ^= rook_keys[rook_from] ^ rook_keys[rook_to]
+            mg += MG[us * 6 + ROOK][rook_to] - MG[us * 6 + ROOK][rook_from]
+            eg += EG[us * 6 + ROOK][rook_to] - EG[us * 6 + ROOK][rook_from]
+
+        if promotion:
+            to_bit = 1 << to_sq
+            pieces[code] ^= to_bit
+            pieces[us * 6 + promotion] |= to_bit
+            mailbox[to_sq] = us * 6 + promotion
+            key ^= piece_keys[to_sq] ^ PIECE_KEYS[us * 6 + promotion][to_sq]
+            mg += MG[us * 6 + promotion][to_sq] - mg_table[to_sq]
+            eg += EG[us * 6 + promotion][to_sq] - eg_table[to_sq]
+            self.phase += PHASE[us * 6 + promotion]
+
+        self.castling &= CASTLE_MASK[from_sq] & CASTLE_MASK[to_sq]
+        key ^= CASTLING_KEYS[self.castling]
+        if flag == DOUBLE_PUSH:
+            self.ep_square = (from_sq + to_sq) >> 1
+            key ^= EP_KEYS[to_sq & 7]
+        else:
+            self.ep_square = -1
+        self.occupied = occupancy[0] | occupancy[1]
+        self.turn = them
+        self.zobrist_key = key
+        self.mg = mg
+        self.eg = eg
+        return undo
+
+    def unmake_move(self, undo):
+        """
+        Method that takes back the move make_move returned undo for
+        :param undo: undo tuple from make_move
+        """
+        (move, captured, self.castling, self.ep_square, self.moves_since_taken, self.zobrist_key,
+         self.mg, self.eg, self.phase) = undo
+        from_sq = move & 63
+        to_sq = (move >> 6) & 63
+        promotion = (move >> 12) & 7
+        flag = move >> 15
+        them = self.turn
+        us = them ^ 1
+        pieces = self.pieces
+        occupancy = self.occupancy
+        mailbox = self.mailbox
+
+        from_to = (1 << from_sq) | (1 << to_sq)
+        if promotion:
+            code = us * 6 + PAWN
+            pieces[us * 6 + promotion] ^= 1 << to_sq
+            pieces[code] |= 1 << from_sq
+        else:
+            code = mailbox[to_sq]
+            pieces[code] ^= from_to
+        occupancy[us] ^= from_to
+        mailbox[from_sq] = code
+        mailbox[to_sq] = captured
+
+        if captured != EMPTY:
+            to_bit = 1 << to_sq
+            pieces[captured] |= to_bit
+            occupancy[them] |= to_bit
+        elif flag == EN_PASSANT:
+            captured_sq = to_sq + 8 if us == WHITE else to_sq - 8
+            captured_bit = 1 << captured_sq
+            pieces[them * 6 + PAWN] |= captured_bit
+            occupancy[them] |= captured_bit
+            mailbox[captured_sq] = them * 6 + PAWN
+        elif flag == CASTLE:
+            rook_from, rook_to = CASTLE_ROOK_SQUARES[to_sq]
+            rook_from_to = (1 << rook_from) | (1 << rook_to)
+            pieces[us * 6 + ROOK] ^= rook_from_to
+            occupancy[us] ^= rook_from_to
+            mailbox[rook_from] = mailbox[rook_to]
+            mailbox[rook_to] = EMPTY
+
+        self.occupied = occupancy[0] | occupancy[1]
+        self.turn = us
+
+    def make_null_move(self):
+        """
+        Passes the turn without moving (for null move pruning). Never legal in a game, and not to be
+        made when the team to move is in check.
+        :return: undo tuple for unmake_null_move
+        """
+        undo = (self.ep_square, self.zobrist_key)
+        key = self.zobrist_key ^ BLACK_TO_MOVE_KEY
+        if self.ep_square != -1:
+            key ^= EP_KEYS[self.ep_square & 7]
+            self.ep_square = -1
+        self.zobrist_key = key
+        self.turn ^= 1
+        return undo
+
+    def unmake_null_move(self, undo):
+        self.ep_square, self.zobrist_key = undo
+        self.turn ^= 1
+
+    def has_non_pawn_material(self, color):
+        """
+        :return: True if color has a knight, bishop, rook or queen
+        """
+        pieces = self.pieces
+        base = color * 6
+        return bool(pieces[base + KNIGHT] | pieces[base + BISHOP] | pieces[base + ROOK] | pieces[base + QUEEN])
+
+    def is_square_attacked(self, sq, color, occupied=None):
+        """
+        :param sq: square on the board
+        :param color: WHITE or BLACK
+        :param occupied: occupancy to look through for sliding pieces, the board's when None
+        :return: True if a piece of color attacks sq
+        """
+        if occupied is None:
+            occupied = self.occupied
+        pieces = self.pieces
+        base = color * 6
+        if KNIGHT_ATTACKS[sq] & pieces[base + KNIGHT]:
+            return True
+        if PAWN_ATTACKS[color ^ 1][sq] & pieces[base + PAWN]:
+            return True
+        if KING_ATTACKS[sq] & pieces[base + KING]:
+            return True
+        queens = pieces[base + QUEEN]
+        diagonal = pieces[base + BISHOP] | queens
+        if diagonal and bishop_attacks(sq, occupied) & diagonal:
+            return True
+        straight = pieces[base + ROOK] | queens
+        if straight and rook_attacks(sq, occupied) & straight:
+            return True
+        return False
+
+    def attackers(self, sq, color):
+        """
+        :return: bitboard of color's pieces attacking sq
+        """
+        pieces = self.pieces
+        base = color * 6
+        queens = pieces[base + QUEEN]
+        return ((KNIGHT_ATTACKS[sq] & pieces[base + KNIGHT]) | (PAWN_ATTACKS[color ^ 1][sq] & pieces[base + PAWN]) |
+                (KING_ATTACKS[sq] & pieces[base + KING]) |
+                (bishop_attacks(sq, self.occupied) & (pieces[base + BISHOP] | queens)) |
+                (rook_attacks(sq, self.occupied) & (pieces[base + ROOK] | queens)))
+
+    def see(self, move):
+        """
+        Static exchange evaluation: the material the team to move wins (or loses, if negative) on the move's
+        target square if both teams keep recapturing there with their least valuable attacker, each free to
+        stop when carrying on would lose more. No moves are made - pieces are taken out of an occupancy
+        bitboard, which also uncovers sliders attacking through them (x-rays). Pins aren't looked at.
+        :param move: move int
+        :return: net material in PIECE_VALUES (Board.score) units
+        """
+        from_sq = move & 63
+        to_sq = (move >> 6) & 63
+        promotion = (move >> 12) & 7
+        flag = move >> 15
+        if flag == CASTLE:
+            return 0
+        pieces = self.pieces
+        mailbox = self.mailbox
+        occupancy = self.occupancy
+        occupied = self.occupied ^ (1 << from_sq)
+
+        if flag == EN_PASSANT:
+            gain = PIECE_VALUES[PAWN]
+            occupied ^= 1 << (to_sq + 8 if self.turn == WHITE else to_sq - 8)
+        else:
+            victim = mailbox[to_sq]
+            gain = PIECE_VALUES[victim % 6] if victim != EMPTY else 0
+        # value of the piece standing on the square, the next one to be taken
+        on_square = PIECE_VALUES[mailbox[from_sq] % 6]
+        if promotion:
+            gain += PIECE_VALUES[promotion] - PIECE_VALUES[PAWN]
+            on_square = PIECE_VALUES[promotion]
+        gains = [gain]
+
+        diagonal = pieces[BISHOP] | pieces[QUEEN] | pieces[6 + BISHOP] | pieces[6 + QUEEN]
+        straight = pieces[ROOK] | pieces[QUEEN] | pieces[6 + ROOK] | pieces[6 + QUEEN]
+        attackers = ((KNIGHT_ATTACKS[to_sq] & (pieces[KNIGHT] | pieces[6 + KNIGHT])) |
+                     (PAWN_ATTACKS[WHITE][to_sq] & pieces[PAWN]) | (PAWN_ATTACKS[BLACK][to_sq] & pieces[6 + PAWN]) |
+                     (KING_ATTACKS[to_sq] & (pieces[KING] | pieces[6 + KING])) |
+                     (bishop_attacks(to_sq, occupied) & diagonal) | (rook_attacks(to_sq, occupied) & straight))
+        attackers &= occupied
+        side = self.turn ^ 1
+        while True:
+            side_attackers = attackers & occupancy[side]
+            if not side_attackers:
+                break
+            base = side * 6
+            for piece_type in range(6):
+                bb = side_attackers & pieces[base + piece_type]
+                if bb:
+                    break
+            # the king can only take if nothing can take it back
+            if piece_type == KING and attackers & occupancy[side ^ 1]:
+                break
+            gains.append(on_square - gains[-1])
+            on_square = PIECE_VALUES[piece_type]
+            occupied ^= bb & -bb
+            # a slider behind the piece that just took may now see the square
+            attackers |= (bishop_attacks(to_sq, occupied) & diagonal) | (rook_attacks(to_sq, occupied) & straight)
+            attackers &= occupied
+            side ^= 1
+
+        # each team only takes if it's better than stopping, worked back from the last capture
+        for index in range(len(gains) - 1, 0, -1):
+            gains[index - 1] = -max(-gains[index - 1], gains[index])
+        return gains[0]
+
+    def check_and_pins(self, color):
+        """
+        Looks out from color's king for pieces giving check and pieces pinned to the king
+        :return: (check_mask, pins). check_mask is the bitboard of squares a piece other than the king can move
+                 to (FULL when not in check, the checker and the squares between it and the king in check,
+                 0 in double check). pins is a dictionary of pinned square -> bitboard of squares it can move
+                 to along the pin.
+        """
+        king_sq = self.king_square(color)
+        checkers = self.attackers(king_sq, color ^ 1)
+        if not checkers:
+            check_mask = FULL
+        elif checkers & (checkers - 1):
+            check_mask = 0
+        else:
+            checker_sq = checkers.bit_length() - 1
+            check_mask = checkers | BETWEEN[king_sq][checker_sq]
+
+        pins = {}
+        pieces = self.pieces
+        base = (color ^ 1) * 6
+        own = self.occupancy[color]
+        occupied = self.occupied
+        straight = pieces[base + ROOK] | pieces[base + QUEEN]
+        diagonal = pieces[base + BISHOP] | pieces[base + QUEEN]
+        for direction in range(8):
+            sliders = straight if direction < 4 else diagonal
+            if not RAYS[direction][king_sq] & sliders:
+                continue
+            # the first piece along the ray is pinned if it's ours and the next one is an enemy slider
+            blocker_ray = ray_attacks(king_sq, occupied, direction)
+            blocker = blocker_ray & occupied
+            if not blocker & own:
+                continue
+            blocker_sq = blocker.bit_length() - 1
+            pinner = ray_attacks(blocker_sq, occupied, direction) & occupied & sliders
+            if pinner:
+                pins[blocker_sq] = blocker_ray | ray_attacks(blocker_sq, occupied, direction)
+        return check_mask, pins
+
+    def king_square(self, color):
+        return self.pieces[color * 6 + KING].bit_length() - 1
+
+    def in_check(self):
+        """
+        :return: True if the team to move is in check
+        """
+        return self.is_square_attacked(self.king_square(self.turn), self.turn ^ 1)
+
+    def generate_moves(self, captures_only=False):
+        """
+        :param captures_only: True for just captures and promotions (for quiescence search)
+        :return: list of pseudo legal moves (may leave own king in check) for the team to move
+        """
+        moves = []
+        us = self.turn
+        them = us ^ 1
+        pieces = self.pieces
+        own = self.occupancy[us]
+        enemy = self.occupancy[them]
+        empty = ~self.occupied & FULL
+        base = us * 6
+        # squares pieces other than pawns can move to
+        targets_mask = enemy if captures_only else ~own
+
+        # pawns, all pushes / captures of one kind at once
+        pawns = pieces[base + PAWN]
+        if us == WHITE:
+            single = (pawns >> 8) & empty
+            double = ((single & ROW_MASKS[5]) >> 8) & empty
+            left = ((pawns & ~FILE_A) >> 9) & enemy
+            right = ((pawns & ~FILE_H) >> 7) & enemy
+            push, promotion_row = 8, ROW_MASKS[0]
+        else:
+            single = (pawns << 8) & empty
+            double = ((single & ROW_MASKS[2]) << 8) & empty
+            left = ((pawns & ~FILE_A) << 7) & enemy
+            right = ((pawns & ~FILE_H) << 9) & enemy
+            push, promotion_row = -8, ROW_MASKS[7]
+        if captures_only:
+            single &= promotion_row
+            double = 0
+        for targets, offset in ((single, push), (left, push + 1), (right, push - 1)):
+            for to_sq in squares(targets & ~promotion_row):
+                moves.append(to_sq + offset | to_sq << 6)
+            for to_sq in squares(targets & promotion_row):
+                for promotion in (QUEEN, KNIGHT, ROOK, BISHOP):
+                    moves.append(to_sq + offset | to_sq << 6 | promotion << 12)
+        for to_sq in squares(double):
+            moves.append(encode_move(to_sq + 2 * push, to_sq, 0, DOUBLE_PUSH))
+        if self.ep_square != -1:
+            for from_sq in squares(PAWN_ATTACKS[them][self.ep_square] & pawns):
+                moves.append(encode_move(from_sq, self.ep_square, 0, EN_PASSANT))
+
+        for from_sq in squares(pieces[base + KNIGHT]):
+            for to_sq in squares(KNIGHT_ATTACKS[from_sq] & targets_mask):
+                moves.append(from_sq | to_sq << 6)
+        for from_sq in squares(pieces[base + BISHOP]):
+            for to_sq in squares(bishop_attacks(from_sq, self.occupied) & targets_mask):
+                moves.append(from_sq | to_sq << 6)
+        for from_sq in squares(pieces[base + ROOK]):
+            for to_sq in squares(rook_attacks(from_sq, self.occupied) & targets_mask):
+                moves.append(from_sq | to_sq << 6)
+        for from_sq in squares(pieces[base + QUEEN]):
+            attacks = rook_attacks(from_sq, self.occupied) | bishop_attacks(from_sq, self.occupied)
+            for to_sq in squares(attacks & targets_mask):
+                moves.append(from_sq | to_sq << 6)
+        for from_sq in squares(pieces[base + KING]):
+            for to_sq in squares(KING_ATTACKS[from_sq] & targets_mask):
+                moves.append(from_sq | to_sq << 6)
+
+        rights = 0 if captures_only else self.castling >> (0 if us == WHITE else 2) & 3
+        if rights:
+            for right in (WHITE_KING_SIDE, WHITE_QUEEN_SIDE):
+                if not rights & right:
+                    continue
+                king_from, king_to, _, _, between, passing = CASTLES[right if us == WHITE else right << 2]
+                if any(self.mailbox[sq] != EMPTY for sq in between):
+                    continue
+                if any(self.is_square_attacked(sq, them) for sq in passing):
+                    continue
+                moves.append(encode_move(king_from, king_to, 0, CASTLE))
+
+        return moves
+
+    def legal_moves(self, captures_only=False):
+        """
+        Pseudo legal moves filtered with the king's check mask and pins (check_and_pins), rather than
+        by making each move. Only king moves (looked at with the king taken off the board) and en passant
+        (which takes two pieces off a row and can uncover the king) need more than a mask test.
+        :param captures_only: True for just captures and promotions
+        :return: list of legal moves for the team to move
+        """
+        us = self.turn
+        them = us ^ 1
+        king_sq = self.king_square(us)
+        check_mask, pins = self.check_and_pins(us)
+        without_king = self.occupied & ~(1 << king_sq)
+
+        legal = []
+        for move in self.generate_moves(captures_only):
+            from_sq = move & 63
+            to_sq = (move >> 6) & 63
+            flag = move >> 15
+            if from_sq == king_sq:
+                if flag == CASTLE:
+                    if check_mask == FULL:
+                        legal.append(move)
+                elif not self.is_square_attacked(to_sq, them, without_king):
+                    legal.append(move)
+                continue
+            if from_sq in pins and not pins[from_sq] >> to_sq & 1:
+                continue
+            if flag == EN_PASSANT:
+                captured_sq = to_sq + 8 if us == WHITE else to_sq - 8
+                if not (check_mask >> to_sq & 1 or check_mask >> captured_sq & 1):
+                    continue
+                undo = self.make_move(move)
+                exposed = self.is_square_attacked(king_sq, them)
+                self.unmake_move(undo)
+                if not exposed:
+                    legal.append(move)
+            elif check_mask >> to_sq & 1:
+                legal.append(move)
+        return legal
+
+    def perft(self, depth, bulk=True, table=None):
+        """
+        Counts the leaf nodes of the legal move tree depth plies deep, to check move generation against
+        known counts and to time it
+        :param depth: plies to go
+        :param bulk: True to count the moves at the last ply rather than making them
+        :param table: dictionary to remember (zobrist key, depth) -> count in (hashed perft), None for no hashing
+        :return: number of leaf nodes
+        """
+        if depth == 0:
+            return 1
+        if table is not None:
+            count = table.get((self.zobrist_key, depth))
+            if count is not None:
+                return count
+        moves = self.legal_moves()
+        if bulk and depth == 1:
+            count = len(moves)
+        else:
+            count = 0
+            for move in moves:
+                undo = self.make_move(move)
+                count += self.perft(depth - 1, bulk, table)
+                self.unmake_move(undo)
+        if table is not None:
+            table[(self.zobrist_key, depth)] = count
+        return count
+
+    def perft_divide(self, depth, bulk=True, table=None):
+        """
+        perft split by root move, to find which move a wrong count comes from
+        :return: dictionary of move int -> leaf nodes under it
+        """
+        counts = {}
+        for move in self.legal_moves():
+            undo = self.make_move(move)
+            counts[move] = self.perft(depth - 1, bulk, table)
+            self.unmake_move(undo)
+        return counts
+
+    def board_move(self, move):
+        """
+        :param move: move int
+        :return: the same move in Board terms, (current_pos, next_pos) with a third promotion class
+                 element for promotions other than to a queen. Castling is the king moving onto its rook.
+        """
+        from_sq, to_sq = move & 63, (move >> 6) & 63
+        if move >> 15 == CASTLE:
+            to_sq = CASTLE_ROOK_SQUARES[to_sq][0]
+        board_move = (divmod(from_sq, 8), divmod(to_sq, 8))
+        promotion = (move >> 12) & 7
+        if promotion and promotion != QUEEN:
+            board_move = board_move + (PIECE_CLASSES[promotion],)
+        return board_move
+
+    def move_from_board_move(self, board_move):
+        """
+        :param board_move: (current_pos, next_pos) or (current_pos, next_pos, promotion class) like Board.make_move
+        :return: matching legal move int, None if it isn't legal here
+        """
+        promotion = PIECE_TYPES[board_move[2]] if len(board_move) > 2 else QUEEN
+        for move in self.legal_moves():
+            if self.board_move(move)[:2] == tuple(board_move[:2]):
+                if not (move >> 12) & 7 or (move >> 12) & 7 == promotion:
+                    return move
+        return None
+
+    def evaluate(self):
+        """
+        Tapered evaluation: the middlegame and endgame scores (material plus piece square tables, kept up to
+        date by make_move) blended by how much material is left. O(1), nothing is added up here.
+        :return: evaluation for the team to move, in hundredths of a pawn
+        """
+        phase = self.phase if self.phase < TOTAL_PHASE else TOTAL_PHASE
+        if self.turn == WHITE:
+            return (self.mg * phase + self.eg * (TOTAL_PHASE - phase)) // TOTAL_PHASE
+        return (-self.mg * phase - self.eg * (TOTAL_PHASE - phase)) // TOTAL_PHASE
+
+    def material(self, color):
+        """
+        :return: sum of PIECE_VALUES of color's pieces
+        """
+        base = color * 6
+        return sum(pop_count(self.pieces[base + piece_type]) * PIECE_VALUES[piece_type] for piece_type in range(6))
+
+    def is_space_empty(self, row, col):
+        """
+        Same as Board.is_space_empty
+        """
+        if not (0 <= row < 8 and 0 <= col < 8):
+            return None
+        return self.mailbox[row * 8 + col] == EMPTY
+
+    def team_on(self, row, col):
+        """
+        Same as Board.team_on (None for an empty or invalid square)
+        """
+        if not (0 <= row < 8 and 0 <= col < 8) or self.mailbox[row * 8 + col] == EMPTY:
+            return None
+        return Team(self.mailbox[row * 8 + col] // 6)
+
+    def team_turn(self):
+        return Team(self.turn)
@@ -1,3 +1,5 @@
+import atexit
+import os
 from Pieces import Piece
 from Pieces.Pawn import Pawn
 from Pieces.Rook import Rook
@@ -6,16 +8,64 @@ from Pieces.Knight import Knight
 from Pieces.Queen import Queen
 from Pieces.King import King
 from Pieces.Team import Team
+from Board.Bitboard import BitBoard, PIECE_TYPES, move_promotion
+from Board.Zobrist import PIECE_KEYS, BLACK_TO_MOVE_KEY, CASTLING_KEYS, EP_KEYS
+from AI.Search import Search
+from AI.ParallelSearch import ParallelSearch
+from AI.LazySMP import LazySMP
+from AI.TranspositionTable import TranspositionTable
+from AI.OpeningBook import OpeningBook, DEFAULT_BOOK_PATH
+from AI.Bitbases import Bitbases, DEFAULT_BITBASE_DIRECTORY
 
 ROW = 8
 COL = 8
 ROWS = range(0, ROW)
 COLS = range(0, COL)
+# size of the AI's transposition table
+TRANSPOSITION_TABLE_MB = 16
+# opening book the AI plays from before searching, if the file is there (python -m AI.OpeningBook builds one)
+OPENING_BOOK_PATH = DEFAULT_BOOK_PATH
+# endgame bitbases the AI's search probes, if the directory has any (python -m AI.Bitbases builds them)
+BITBASE_DIRECTORY = DEFAULT_BITBASE_DIRECTORY
+
+
+def piece_key(pc, row, col):
+    """
+    :return: zobrist key for Piece pc standing on row, col
+    """
+    return PIECE_KEYS[pc.get_team().value * 6 + PIECE_TYPES[type(pc)]][row * 8 + col]
+
+
+class UndoRecord:
+    """
+    Everything Board.unmake_move needs to take back a move made with Board.make_move
+    """
+    __slots__ = ('piece', 'current_pos', 'next_pos', 'moves_since_taken', 'turn', 'zobrist_key', 'init_position',
+                 'just_moved_two', 'captured', 'captured_pos', 'captured_index', 'rook', 'promoted',
+                 'cleared_pawns')
+
+    def __init__(self, piece, current_pos, next_pos, moves_since_taken, turn, zobrist_key, init_position,
+                 just_moved_two):
+        self.piece = piece
+        self.current_pos = current_pos
+        self.next_pos = next_pos
+        self.moves_since_taken = moves_since_taken
+        self.turn = turn
+        self.zobrist_key = zobrist_key
+        self.init_position = init_position
+        self.just_moved_two = just_moved_two
+        self.captured = None
+        self.captured_pos = None
+        self.captured_index = None
+        self.rook = None
+        self.promoted = None
+        self.cleared_pawns = []
 
 
 class Board:
 
-    def __init__(self, board=None, white_pieces=[], black_pieces=[], moves_since_taken=0, prev_states={}):
+    def __init__(self, board=None, white_pieces=[], black_pieces=[], moves_since_taken=0, prev_states=None,
+                 turn=Team.WHITE, zobrist_key=None):
         """
         Board object which represents the state of the chess board/game. If no
         arguments are provided to constructor, then a chess board with an initial
@@ -25,19 +75,64 @@ class Board:
             self.white_pieces - List
             self.black_pieces - List
             self.turn -
+            self.zobrist_key - 64 bit hash of the position, kept up to date by make_move
+            self.transposition_table - the AI's TranspositionTable, shared by copies of the board (made on
+                                       the AI's first search)
+            self.opening_book - the AI's OpeningBook (False when there's no book file), shared by copies
+            self.lazy_smp - the AI's LazySMP (helper processes and shared table kept between moves), shared by
+                            copies (made on the AI's first lazy_smp search)
+            self.parallel_search - the AI's ParallelSearch (worker processes kept between moves), shared by
+                                   copies (made on the AI's first root split search)
+            self.bitbases - the AI's Bitbases (False when there are no bitbase files), shared by copies
         :param board: List[List] type which contains row/columns of Piece objects
                       or False when there is no piece in that position.
         :param white_pieces: List of pieces that belong to the white team
         :param black_pieces: List of pieces that belong to the black team
+        :param moves_since_taken: moves made since a piece was last taken
+        :param prev_states: dictionary of zobrist key -> times the position has been seen (threefold rule)
+        :param turn: team to move
+        :param zobrist_key: zobrist key of the position if already known (copies), worked out when None
         """
         self.board = board
         self.white_pieces = white_pieces
         self.black_pieces = black_pieces
         self.moves_since_taken = moves_since_taken
-        self.prev_states = prev_states
+        self.prev_states = prev_states if prev_states is not None else {}
         if self.board is None:
             self.set_board_to_init_state()
-        self.turn = Team.WHITE
+        self.turn = turn
+        self.zobrist_key = zobrist_key if zobrist_key is not None else self.compute_zobrist_key()
+        self.transposition_table = None
+        self.opening_book = None
+        self.bitbases = None
+        self.lazy_smp = None
+        self.parallel_search = None
+
+    @classmethod
+    def from_fen(cls, fen):
+        """
+        Board in the position of a FEN string. Castling rights become King / Rook init_position, the en
+        passant square the pawn's just_moved_two, and the half move clock moves_since_taken.
+        :param fen: FEN string
+        :return: Board object
+        """
+        return BitBoard.from_fen(fen).to_board()
+
+    def to_fen(self, fullmove=1):
+        """
+        :param fullmove: full move number to write (the board doesn't keep one)
+        :return: FEN string of the position
+        """
+        return BitBoard.from_board(self).to_fen(fullmove)
+
+    def __hash__(self):
+        return self.zobrist_key
+
+    def __eq__(self, other):
+        """
+        Boards are equal when they are in the same position (same zobrist key)
+        """
+        return isinstance(other, Board) and self.zobrist_key == other.zobrist_key
 
     def set_board_to_init_state(self):
         """
@@ -66,119 +161,160 @@ class Board:
         self.white_pieces = white_pawns[:] + white_back_row[:]
         self.black_pieces = black_pawns[:] + black_back_row[:]
 
-    def move_piece(self, current_pos, next_pos, gui_move=False, ai=False):
+    def move_piece(self, current_pos, next_pos, gui_move=False, ai=False, promotion=None):
         """
         Method that returns a copy of the current board with the piece on
         current_pos moved to next_pos. No error / valid move checking here.
-        Valid move checking done a piece level.
+        Valid move checking done a piece level. The move itself is made on the
+        copy with make_move, so this is the convenient (but allocating) version
+        used by the gui; search should call make_move / unmake_move directly.
         :param current_pos: position of piece you'd like to move
         :param next_pos: position you'd like to move th piece
         :param gui_move: True if move is being made on gui, False if it's being made in game logic
         :param ai: is ai making this move
+        :param promotion: Piece class a pawn reaching the last row is promoted to (None for a queen)
         :return: {'board': copy of new board, 'game_over': bool, 'draw': bool, 'winner': Team.WHITE or Team.BLACK}
         """
 
-        # copy board and retrieve the piece being moved along with it's data
+        # copy board and make the move on the copy
         new_board = self.copy_board_object()
         return_dictionary = {'board': new_board, 'game_over': False, 'draw': False, 'winner': None}
-        piece = new_board.get_board()[current_pos[0]][current_pos[1]]
-        """
-        if gui_move:
-            print(f"Board:")
-            new_board.print_board()
-            print(f"Piece: {piece}")
-            print(f"current position: {current_pos[0], current_pos[1]}")
-            print(f"destination position: {next_pos[0], next_pos[1]}")
-        if not gui_move:
-            print("SOME NONE GUI ACTION......")
-            print()
-            print(f"Board:")
-            new_board.print_board()
-            print(f"Piece: {piece}")
-            print(f"current position: {current_pos[0], current_pos[1]}")
-            print(f"destination position: {next_pos[0], next_pos[1]}")
-        """
-        data = piece.move(next_pos[0], next_pos[1], new_board)
-        new_board.moves_since_taken += 1
-        castle = False
-
-        # check for and make castle move
-        if isinstance(piece, King) and data and gui_move:
-            # update board
-            castle = True
-            row = 7 if piece.get_team() == Team.WHITE else 0
-            king_col = 6 if next_pos[1] == 7 else 2
-            rook_col = 5 if next_pos[1] == 7 else 3
-            rook = new_board.get_board()[row][next_pos[1]]
-            rook.move(row, rook_col, new_board)
-            new_board.get_board()[row][king_col] = piece
-            new_board.get_board()[row][rook_col] = rook
-            new_board.get_board()[current_pos[0]][current_pos[1]] = False
-            new_board.get_board()[next_pos[0]][next_pos[1]] = False
-
-        if not castle:
-            # non-castle move, make the move on the board.board
-            destination_piece = new_board.board[next_pos[0]][next_pos[1]]
-            new_board.board[current_pos[0]][current_pos[1]] = False
-            new_board.board[next_pos[0]][next_pos[1]] = piece
-
-            if destination_piece:
-                new_board.update_teams_pieces()
-                new_board.moves_since_taken = 0
-
-            # Check for en_passant and pawn promotion
-            if isinstance(piece, Pawn):
-                if data[0]:  # if en passant
-                    new_board.moves_since_taken = 0
-                    new_board.board[next_pos[0] - piece.direction][next_pos[1]] = False
-                if data[1] and gui_move:  # check if pawn promotion and gui move
-                    new_board.execute_pawn_promotion(piece.get_team(), next_pos, ai)
-        # endif not castle
-
-        moving_team_pieces = new_board.white_pieces if piece.get_team() == Team.WHITE else new_board.black_pieces
-        for pc in moving_team_pieces:
-            if isinstance(pc, Pawn) and pc is not piece:
-                pc.en_passant_move = []
-                pc.just_moved_two = False
+        move = (current_pos, next_pos) if promotion is None else (current_pos, next_pos, promotion)
+        undo = new_board.make_move(move)
+
+        # let a human player choose the piece a pawn is promoted to (make_move promotes to a queen)
+        if undo.promoted is not None and gui_move and not ai:
+            new_board.execute_pawn_promotion(undo.piece.get_team(), next_pos, ai)
 
         # check for threefold rule
         three_fold_bool = False
         if gui_move:
             three_fold_bool = new_board.add_state_check_threefold()
 
+            # no legal moves left is checkmate (the team that just moved wins) or stalemate
+            if not new_board.legal_moves():
+                return_dictionary['game_over'] = True
+                if new_board.in_check(new_board.turn):
+                    return_dictionary['winner'] = undo.piece.get_team()
+                else:
+                    return_dictionary['draw'] = True
+                return return_dictionary
+
         # was there 50 moves made without a piece being taken or third instance of game board, then game over and draw
         if new_board.moves_since_taken >= 50 or three_fold_bool:
             return_dictionary['game_over'] = True
             return_dictionary['draw'] = True
 
-        # change turns
-        new_board.turn = Team.BLACK if piece.get_team() == Team.WHITE else Team.WHITE
-
-        # update teams pcs
-        new_board.update_teams_pieces()
+        return return_dictionary
 
+    def make_move(self, move):
         """
-        # check mate or draw?
-        if gui_move:
-            pcs = self.white_pieces if new_board.turn == Team.WHITE else self.black_pieces
-            moves = []
-            check = False
-            for pc in pcs:
-                moves = moves + pc.get_valid_moves(new_board, False)
-                moves = pc.king_in_harms_way(new_board, moves)
-                if isinstance(pc, King):
-                    if pc.in_check(new_board, (pc.row, pc.col)):
-                        check = True
-            if len(moves) == 0:
-                return_dictionary['game_over'] = True
-                if check:
-                    return_dictionary['draw'] = False
-                    return_dictionary['winner'] = 'white team' if new_board.turn == Team.BLACK else 'black team'
-                else:
-                    return_dictionary['draw'] = True
+        Method that makes move on this board in place (no copy). Handles captures,
+        castling (the king being moved onto its own rook, like in the gui), en passant
+        and pawn promotion (to a queen unless move has a third element giving the
+        Piece class to promote to). No valid move checking here.
+        :param move: (current_pos, next_pos) or (current_pos, next_pos, promotion class)
+        :return: UndoRecord which unmake_move uses to put the board back the way it was
         """
+        current_pos, next_pos = move[0], move[1]
+        piece = self.board[current_pos[0]][current_pos[1]]
+        team = piece.get_team()
+        own_pieces, other_pieces = self.get_team_pieces(team)
+        undo = UndoRecord(piece, current_pos, next_pos, self.moves_since_taken, self.turn, self.zobrist_key,
+                          getattr(piece, 'init_position', None), getattr(piece, 'just_moved_two', None))
+        # take out the parts of the key that aren't just piece positions, they're put back once the move is made
+        key = self.zobrist_key ^ self.castling_ep_key()
+        key ^= piece_key(piece, current_pos[0], current_pos[1])
+
+        # en passant is only possible right after the two space move, so clear it for the moving team
+        for pc in own_pieces:
+            if isinstance(pc, Pawn) and pc.just_moved_two and pc is not piece:
+                pc.just_moved_two = False
+                undo.cleared_pawns.append(pc)
 
-        return return_dictionary
+        data = piece.move(next_pos[0], next_pos[1], self)
+        self.moves_since_taken += 1
+        self.board[current_pos[0]][current_pos[1]] = False
+
+        if isinstance(piece, King) and data:
+            # castle - king has been placed by King.move, bring the rook over next to it
+            rook = self.board[next_pos[0]][next_pos[1]]
+            rook_col = 5 if next_pos[1] == 7 else 3
+            undo.rook = rook
+            rook.move(next_pos[0], rook_col, self)
+            self.board[next_pos[0]][next_pos[1]] = False
+            self.board[next_pos[0]][rook_col] = rook
+            self.board[piece.row][piece.col] = piece
+            key ^= piece_key(rook, next_pos[0], next_pos[1]) ^ piece_key(rook, next_pos[0], rook_col)
+            key ^= piece_key(piece, piece.row, piece.col)
+        else:
+            # en passant takes the pawn behind the destination
+            captured_pos = next_pos
+            if isinstance(piece, Pawn) and data[0]:
+                captured_pos = (next_pos[0] - piece.direction, next_pos[1])
+            captured = self.board[captured_pos[0]][captured_pos[1]]
+            if captured:
+                undo.captured = captured
+                undo.captured_pos = captured_pos
+                undo.captured_index = other_pieces.index(captured)
+                del other_pieces[undo.captured_index]
+                self.board[captured_pos[0]][captured_pos[1]] = False
+                self.moves_since_taken = 0
+                key ^= piece_key(captured, captured_pos[0], captured_pos[1])
+            self.board[next_pos[0]][next_pos[1]] = piece
+
+            if isinstance(piece, Pawn) and data[1]:
+                promotion = move[2] if len(move) > 2 else Queen
+                promoted = promotion(team, next_pos[0], next_pos[1])
+                undo.promoted = promoted
+                self.board[next_pos[0]][next_pos[1]] = promoted
+                own_pieces[own_pieces.index(piece)] = promoted
+            key ^= piece_key(self.board[next_pos[0]][next_pos[1]], next_pos[0], next_pos[1])
+
+        self.turn = Team.BLACK if team == Team.WHITE else Team.WHITE
+        if self.turn != undo.turn:
+            key ^= BLACK_TO_MOVE_KEY
+        self.zobrist_key = key ^ self.castling_ep_key()
+        return undo
+
+    def unmake_move(self, undo):
+        """
+        Method that takes back the move make_move returned undo for. Moves have to
+        be unmade in the reverse order they were made.
+        :param undo: UndoRecord returned by make_move
+        :return: None
+        """
+        piece = undo.piece
+        current_pos, next_pos = undo.current_pos, undo.next_pos
+        own_pieces, other_pieces = self.get_team_pieces(piece.get_team())
+
+        if undo.rook is not None:
+            rook = undo.rook
+            self.board[piece.row][piece.col] = False
+            self.board[rook.row][rook.col] = False
+            rook.row, rook.col = next_pos
+            rook.init_position = True
+            self.board[next_pos[0]][next_pos[1]] = rook
+        else:
+            self.board[next_pos[0]][next_pos[1]] = False
+            if undo.promoted is not None:
+                own_pieces[own_pieces.index(undo.promoted)] = piece
+            if undo.captured is not None:
+                self.board[undo.captured_pos[0]][undo.captured_pos[1]] = undo.captured
+                other_pieces.insert(undo.captured_index, undo.captured)
+
+        piece.row, piece.col = current_pos
+        if undo.init_position is not None:
+            piece.init_position = undo.init_position
+        if undo.just_moved_two is not None:
+            piece.just_moved_two = undo.just_moved_two
+        self.board[current_pos[0]][current_pos[1]] = piece
+
+        for pc in undo.cleared_pawns:
+            pc.just_moved_two = True
+        self.moves_since_taken = undo.moves_since_taken
+        self.turn = undo.turn
+        self.zobrist_key = undo.zobrist_key
 
     def update_teams_pieces(self):
         self.white_pieces = []
@@ -193,23 +329,18 @@ class Board:
                         self.white_pieces.append(pc)
                     else:
                         self.black_pieces.append(pc)
+        # the board has been changed by hand, so the key has to be worked out again
+        self.zobrist_key = self.compute_zobrist_key()
 
     def add_state_check_threefold(self):
-        # get state of the board as string tuple
-        state = self.create_state_tuple()
-        # if we've seen the state before, increment count
-        if state in self.prev_states.keys():
-            count = self.prev_states[state]
-            count = count + 1
-            # if we've seen this state three times, then threefold rule says draw
-            if count == 3:
-                return True
-            else:
-                self.prev_states[state] = count
-        else:
-            self.prev_states[state] = 1
-
-        return False
+        """
+        Counts the current position (by zobrist key) in self.prev_states
+        :return: True if this is the third time the position has been seen
+        """
+        count = self.prev_states.get(self.zobrist_key, 0) + 1
+        self.prev_states[self.zobrist_key] = count
+        # if we've seen this state three times, then threefold rule says draw
+        return count >= 3
 
     def execute_pawn_promotion(self, team, next_pos, ai):
         if not ai:
@@ -231,6 +362,7 @@ class Board:
 
         old_pc = self.get_board()[next_pos[0]][next_pos[1]]
         self.get_board()[next_pos[0]][next_pos[1]] = new_pc
+        self.zobrist_key ^= piece_key(old_pc, next_pos[0], next_pos[1]) ^ piece_key(new_pc, next_pos[0], next_pos[1])
 
         if team == Team.WHITE:
             self.white_pieces.remove(old_pc)
@@ -243,102 +375,449 @@ class Board:
         """
         :return: deep copy of a board object (self)
         """
-        new_board = []
+        new_board = [[pc.copy() if pc else False for pc in row] for row in self.board]
         new_white_pieces = []
         new_black_pieces = []
-        for i in range(len(self.board)):
-            row = []
-            for j in range(len(self.board[0])):
-                if self.board[i][j]:
-                    copy = self.board[i][j].copy()
-                    row.append(copy)
-                    if copy.get_team() == Team.WHITE:
-                        new_white_pieces.append(copy)
+        for row in new_board:
+            for pc in row:
+                if pc:
+                    if pc.team == Team.WHITE:
+                        new_white_pieces.append(pc)
                     else:
-                        new_black_pieces.append(copy)
-                else:
-                    row.append(False)
-            new_board.append(row)
-
-        return Board(new_board, new_white_pieces, new_black_pieces, self.moves_since_taken, self.prev_states)
+                        new_black_pieces.append(pc)
+
+        copy = Board(new_board, new_white_pieces, new_black_pieces, self.moves_since_taken, self.prev_states,
+                     self.turn, self.zobrist_key)
+        copy.transposition_table = self.transposition_table
+        copy.opening_book = self.opening_book
+        copy.lazy_smp = self.lazy_smp
+        copy.parallel_search = self.parallel_search
+        copy.bitbases = self.bitbases
+        return copy
+
+    def let_AI_move(self, movetime_ms=None, max_depth=4, max_nodes=None, workers=1, lazy_smp=False):
+        """
+        Lets the AI pick a move for the team to move with an iterative deepening search and makes it
+        (through move_piece, as a gui move). The search stops at max_depth, after movetime_ms or after
+        max_nodes, whichever comes first, and plays the best move of the last depth it completed.
+        :param movetime_ms: time budget in milliseconds (None for no limit)
+        :param max_depth: deepest search
+        :param max_nodes: node budget (None for no limit), not used by the root split search
+        :param workers: number of processes to search with when more than 1, None for one per cpu
+        :param lazy_smp: True to search with LazySMP (every process searches the whole tree on a shared
+                         transposition table), False to split the root moves between them (ParallelSearch)
+        :return: same dictionary as move_piece
+        """
+        best_move, _, _ = self.choose_AI_move(movetime_ms, max_depth, max_nodes, workers, lazy_smp)
+        return self.move_piece(best_move[0], best_move[1], True, True, best_move[2] if len(best_move) > 2 else None)
 
-    def let_AI_move(self):
+    def choose_AI_move(self, movetime_ms=None, max_depth=4, max_nodes=None, workers=1, lazy_smp=False,
+                       stop_event=None, on_search=None, use_book=True):
+        """
+        The search of let_AI_move, without making the move - so it can be run in another thread while
+        the board isn't changed. A move from the opening book is played without searching.
+        :param stop_event: threading.Event that stops the search when set, the best move of the last depth
+                           completed is still returned (not used by the root split search)
+        :param on_search: called with the search object once it's made, its nodes count goes up as it searches
+        :param use_book: False to always search, even when the opening book has a move
+        :return: (best move as legal_moves() gives it, depth completed, nodes searched) - depth and nodes
+                 are 0 for a book move
+        """
         white = True if self.team_turn() == Team.WHITE else False
-        best_move, _, _ = self.max_value(white, 4, float('-inf'), float('inf'))
-        move = self.move_piece(best_move[0], best_move[1], True, True)
-        print(f"AI has returned the best move for white:{white} - {best_move[0]} to {best_move[1]}...")
-        return move
+        position = BitBoard.from_board(self)
+        book = self.get_opening_book() if use_book else None
+        book_move = book.choose(position) if book is not None else None
+        if book_move is not None:
+            best_move = position.board_move(book_move)
+            print(f"AI has played a book move for white:{white} - {best_move[0]} to {best_move[1]}...")
+            return best_move, 0, 0
+        if lazy_smp and (workers is None or workers > 1):
+            search = self.get_lazy_smp(workers - 1 if workers else None)
+            search.set_position(position, self.prev_states).stop_event = stop_event
+            if on_search is not None:
+                on_search(search)
+            best_move, _, depth = search.iterative_deepening(max_depth, movetime_ms, max_nodes)
+            nodes = search.nodes
+        elif workers is None or workers > 1:
+            search = self.get_parallel_search(workers)
+            search.set_position(position, self.prev_states)
+            if on_search is not None:
+                on_search(search)
+            best_move, _, depth = search.iterative_deepening(max_depth, movetime_ms)
+            nodes = search.nodes
+        else:
+            search = Search(position, self.prev_states, self.get_transposition_table(),
+                            bitbases=self.get_bitbases())
+            search.stop_event = stop_event
+            if on_search is not None:
+                on_search(search)
+            best_move, _, depth = search.iterative_deepening(max_depth, movetime_ms, max_nodes)
+            nodes = search.nodes
+        best_move = position.board_move(best_move)
+        print(f"AI has returned the best move for white:{white} - {best_move[0]} to {best_move[1]} "
+              f"(depth {depth}, {nodes} nodes)...")
+        return best_move, depth, nodes
 
     def get_successors(self, white):
-        piece_set = self.white_pieces if white else self.black_pieces
-        for pc in piece_set:
-            for move in pc.get_valid_moves(self):
-                move_dict = self.move_piece(pc.get_location(), move, False, True)
-                yield (pc.get_location(), move), move_dict['board']
+        """
+        Generator of the legal moves for a team. Moves are (current_pos, next_pos) tuples,
+        with a third promotion class element for pawn promotions, that can be given to make_move.
+        :param white: True for white's moves, False for black's
+        """
+        for move in self.legal_moves(Team.WHITE if white else Team.BLACK):
+            yield move
+
+    def legal_moves(self, team=None):
+        """
+        Every legal move for a team in one go. The king's checkers and pinned pieces are found
+        once (check_and_pins) along with the squares the other team attacks (attacked_squares),
+        and each piece's moves are filtered with them rather than by trying the moves out.
+        :param team: Team.WHITE or Team.BLACK, the team to move when None
+        :return: List of (current_pos, next_pos) moves, pawn promotions are listed once for each
+                 piece they can be promoted to as (current_pos, next_pos, promotion class)
+        """
+        team = self.turn if team is None else team
+        other_team = Team.BLACK if team == Team.WHITE else Team.WHITE
+        own_pieces, _ = self.get_team_pieces(team)
+        king = self.get_king(team)
+        check_mask, pins = self.check_and_pins(team)
+        attacked = self.attacked_squares(other_team, king)
+
+        moves = []
+        for pc in own_pieces[:]:
+            if pc is king:
+                destinations = [move for move in pc.get_valid_moves(self, False) if move not in attacked]
+                if check_mask is None:
+                    destinations = pc.try_adding_castle(self, destinations)[0]
+            elif check_mask is not None and not check_mask:
+                # double check, only the king can move
+                continue
+            else:
+                destinations = self.filter_moves(pc, pc.get_valid_moves(self, False), check_mask, pins)
+
+            current_pos = pc.get_location()
+            for next_pos in destinations:
+                if isinstance(pc, Pawn) and next_pos[0] in (0, ROW - 1):
+                    for promotion in (Queen, Rook, Bishop, Knight):
+                        moves.append((current_pos, next_pos, promotion))
+                else:
+                    moves.append((current_pos, next_pos))
+        return moves
+
+    def perft(self, depth, bulk=True, hashed=False, bitboard=True):
+        """
+        Counts the leaf nodes of the legal move tree depth plies deep (see Board/Perft.py for the suite of
+        positions with known counts)
+        :param depth: plies to go
+        :param bulk: True to count the moves at the last ply rather than making them
+        :param hashed: True to remember counts by zobrist key so transpositions are only counted once
+        :param bitboard: True to count with the BitBoard move generator the AI uses, False with this board's
+                         own (legal_moves / make_move / unmake_move)
+        :return: number of leaf nodes
+        """
+        table = {} if hashed else None
+        if bitboard:
+            return BitBoard.from_board(self).perft(depth, bulk, table)
+        return self.board_perft(depth, bulk, table)
+
+    def perft_divide(self, depth, bulk=True, hashed=False, bitboard=True):
+        """
+        perft split by root move, to find which move a wrong count comes from
+        :return: dictionary of move (as legal_moves gives them) -> leaf nodes under it
+        """
+        table = {} if hashed else None
+        counts = {}
+        if bitboard:
+            position = BitBoard.from_board(self)
+            for move, count in position.perft_divide(depth, bulk, table).items():
+                board_move = position.board_move(move)
+                if move_promotion(move) and len(board_move) == 2:
+                    board_move = board_move + (Queen,)
+                counts[board_move] = count
+        else:
+            for move in self.legal_moves():
+                undo = self.make_move(move)
+                counts[move] = self.board_perft(depth - 1, bulk, table)
+                self.unmake_move(undo)
+        return counts
+
+    def board_perft(self, depth, bulk=True, table=None):
+        """
+        perft with this board's own move generation
+        :param table: dictionary of (zobrist key, depth) -> count for hashed perft, None for no hashing
+        """
+        if depth == 0:
+            return 1
+        if table is not None:
+            count = table.get((self.zobrist_key, depth))
+            if count is not None:
+                return count
+        moves = self.legal_moves()
+        if bulk and depth == 1:
+            count = len(moves)
+        else:
+            count = 0
+            for move in moves:
+                undo = self.make_move(move)
+                count += self.board_perft(depth - 1, bulk, table)
+                self.unmake_move(undo)
+        if table is not None:
+            table[(self.zobrist_key, depth)] = count
+        return count
+
+    def get_king(self, team):
+        """
+        :return: team's King, None if it doesn't have one
+        """
+        for pc in self.get_team_pieces(team)[0]:
+            if pc.is_king:
+                return pc
+        return None
+
+    def check_and_pins(self, team):
+        """
+        Looks out from team's king along the 8 lines and the knight jumps to find the pieces giving
+        check and the pieces pinned to the king.
+        :param team: Team.WHITE or Team.BLACK
+        :return: (check_mask, pins). check_mask is None when the king isn't in check, otherwise the set of
+                 squares a piece other than the king can move to to get out of check (take the checking
+                 piece or get in its way), empty for double check. pins is a dictionary of pinned piece
+                 location -> set of squares it can move to without leaving the line of the pin.
+        """
+        king = self.get_king(team)
+        if king is None:
+            return None, {}
+
+        checkers = 0
+        check_mask = set()
+        pins = {}
+        for d_row, d_col in Queen.options:
+            diagonal = d_row != 0 and d_col != 0
+            line = []
+            own_piece = None
+            row, col = king.row + d_row, king.col + d_col
+            while 0 <= row < ROW and 0 <= col < COL:
+                line.append((row, col))
+                pc = self.board[row][col]
+                if pc:
+                    if pc.get_team() == team:
+                        if own_piece is not None:
+                            break
+                        own_piece = pc
+                    else:
+                        if isinstance(pc, Queen) or isinstance(pc, Bishop if diagonal else Rook):
+                            if own_piece is None:
+                                checkers += 1
+                                check_mask.update(line)
+                            else:
+                                pins[own_piece.get_location()] = set(line)
+                        break
+                row, col = row + d_row, col + d_col
+
+        for d_row, d_col in Knight.options:
+            row, col = king.row + d_row, king.col + d_col
+            if 0 <= row < ROW and 0 <= col < COL:
+                pc = self.board[row][col]
+                if isinstance(pc, Knight) and pc.get_team() != team:
+                    checkers += 1
+                    check_mask.add((row, col))
+
+        # pawns attack diagonally forward, so the other team's pawns that can check are a row towards their side
+        pawn_row = king.row - 1 if team == Team.WHITE else king.row + 1
+        for col in (king.col - 1, king.col + 1):
+            if 0 <= pawn_row < ROW and 0 <= col < COL:
+                pc = self.board[pawn_row][col]
+                if isinstance(pc, Pawn) and pc.get_team() != team:
+                    checkers += 1
+                    check_mask.add((pawn_row, col))
+
+        if checkers == 0:
+            return None, pins
+        if checkers > 1:
+            return set(), pins
+        return check_mask, pins
+
+    def filter_moves(self, pc, moves, check_mask, pins):
+        """
+        :param pc: piece (not a king) that is moving
+        :param moves: List of destinations from pc.get_valid_moves(board, False)
+        :param check_mask: check mask from check_and_pins
+        :param pins: pins from check_and_pins
+        :return: List of the destinations that don't leave pc's king in check
+        """
+        pin = pins.get(pc.get_location())
+        legal = []
+        for move in moves:
+            if pin is not None and move not in pin:
+                continue
+            en_passant = isinstance(pc, Pawn) and move[1] != pc.col and not self.board[move[0]][move[1]]
+            if check_mask is not None and move not in check_mask:
+                # en passant can take a checking pawn without landing on its square
+                if not (en_passant and (pc.row, move[1]) in check_mask):
+                    continue
+            if en_passant and self.en_passant_exposes_king(pc, move):
+                continue
+            legal.append(move)
+        return legal
+
+    def en_passant_exposes_king(self, pawn, move):
+        """
+        En passant takes two pawns off the same row, which can leave the king open along that row.
+        That isn't a normal pin, so try the move to see.
+        :return: True if pawn taking en passant to move leaves its king in check
+        """
+        undo = self.make_move((pawn.get_location(), move))
+        exposed = self.in_check(pawn.get_team())
+        self.unmake_move(undo)
+        return exposed
+
+    def attacked_squares(self, team, ignore=None):
+        """
+        :param team: Team.WHITE or Team.BLACK
+        :param ignore: piece to take off the board while looking (a king, so it can't hide behind itself)
+        :return: set of squares team's pieces attack, including squares with pieces on them
+        """
+        if ignore is not None:
+            self.board[ignore.row][ignore.col] = False
+        try:
+            attacked = set()
+            for pc in self.get_team_pieces(team)[0]:
+                if isinstance(pc, Pawn):
+                    steps = [(pc.direction, 1), (pc.direction, -1)]
+                elif isinstance(pc, King):
+                    steps = pc.move_options
+                elif isinstance(pc, Knight):
+                    steps = pc.options
+                else:
+                    for d_row, d_col in pc.options:
+                        row, col = pc.row + d_row, pc.col + d_col
+                        while 0 <= row < ROW and 0 <= col < COL:
+                            attacked.add((row, col))
+                            if self.board[row][col]:
+                                break
+                            row, col = row + d_row, col + d_col
+                    continue
+                for d_row, d_col in steps:
+                    if 0 <= pc.row + d_row < ROW and 0 <= pc.col + d_col < COL:
+                        attacked.add((pc.row + d_row, pc.col + d_col))
+        finally:
+            if ignore is not None:
+                self.board[ignore.row][ignore.col] = ignore
+        return attacked
 
     def get_utility(self, white):
-        utility = 0
-        max_pieces = self.white_pieces if white else self.black_pieces
-        min_pieces = self.black_pieces if white else self.white_pieces
-        for pc in max_pieces:
-            utility += self.score(pc)
-        for pc in min_pieces:
-            utility -= self.score(pc)
-        return utility
+        """
+        :param white: True for white's point of view, False for black's
+        :return: the search's evaluation of the position (BitBoard.evaluate, in hundredths of a pawn)
+        """
+        position = BitBoard.from_board(self)
+        utility = position.evaluate()
+        return utility if (position.turn == Team.WHITE.value) == white else -utility
 
     def max_value(self, white, limit, alpha, beta):
-        utility = self.get_utility(white)
-        v = float('-inf')
-        count = 0
-        leaf = 0
-
-        if limit == 0:
-            return None, utility, 1
-
-        for successor in self.get_successors(white):
-            min_child_node = successor[1].min_value(white, limit - 1, alpha, beta)
-            v2 = min_child_node[1]
-            leaf += min_child_node[2]
-            if v2 > v:
-                v = v2
-                best_move = successor[0]
-            if v >= beta:
-                return best_move, v, leaf
-            if v > alpha:
-                alpha = v
-            count += 1
-
-        if count == 0:
-            return None, utility, 1
-        else:
-            return best_move, v, leaf
+        """
+        Minimax (alpha beta) search for the maximizing team, which is the team to move.
+        The search itself runs on a BitBoard copy of this board (AI.Search).
+        :param white: True if the maximizing team is white
+        :param limit: depth to search
+        :param alpha: lower bound
+        :param beta: upper bound
+        :return: (best move as (current_pos, next_pos), value, leaves searched, principal variation - the
+                 line of moves both teams are expected to play, starting with the best move)
+        """
+        position = BitBoard.from_board(self)
+        search = Search(position, self.prev_states, self.get_transposition_table())
+        best_move, v, leaf, pv = search.max_value(white, limit, alpha, beta)
+        return self.board_move(position, best_move), v, leaf, self.board_line(position, pv)
 
     def min_value(self, white, limit, alpha, beta):
-        utility = self.get_utility(white)
-        v = float('inf')
-        count = 0
-        leaf = 0
-
-        if limit == 0:
-            return None, utility, 1
-
-        for successor in self.get_successors(not white):
-            min_child_node = successor[1].max_value(white, limit - 1, alpha, beta)
-            v2 = min_child_node[1]
-            leaf += min_child_node[2]
-            if v2 < v:
-                v = v2
-                best_move = successor[0]
-            if v <= alpha:
-                return best_move, v, leaf
-            if v < beta:
-                beta = v
-            count += 1
-
-        if count == 0:
-            return None, utility, 1
-        else:
-            return best_move, v, leaf
+        """
+        Same as max_value for when the minimizing team (not white) is the team to move
+        :return: (best move for the minimizing team, value for the maximizing team, leaves searched,
+                  principal variation)
+        """
+        position = BitBoard.from_board(self)
+        search = Search(position, self.prev_states, self.get_transposition_table())
+        best_move, v, leaf, pv = search.min_value(white, limit, alpha, beta)
+        return self.board_move(position, best_move), v, leaf, self.board_line(position, pv)
+
+    def get_transposition_table(self):
+        """
+        :return: the AI's TranspositionTable (TRANSPOSITION_TABLE_MB in size), made the first time it's needed
+        """
+        if self.transposition_table is None:
+            self.transposition_table = TranspositionTable(TRANSPOSITION_TABLE_MB)
+        return self.transposition_table
+
+    def get_lazy_smp(self, helpers=None):
+        """
+        :param helpers: number of helper processes (None for LazySMP's default, or whatever the last one had)
+        :return: the AI's LazySMP, made the first time it's needed (or when a different number of helpers is
+                 asked for) and closed when the program exits
+        """
+        if self.lazy_smp is not None and helpers is not None and self.lazy_smp.helpers != helpers:
+            self.lazy_smp.close()
+            atexit.unregister(self.lazy_smp.close)
+            self.lazy_smp = None
+        if self.lazy_smp is None:
+            self.lazy_smp = LazySMP(helpers=helpers, bitbases=self.get_bitbases())
+            atexit.register(self.lazy_smp.close)
+        return self.lazy_smp
+
+    def get_parallel_search(self, workers=None):
+        """
+        :param workers: number of worker processes (None for ParallelSearch's default, or whatever the last one had)
+        :return: the AI's ParallelSearch, made the first time it's needed (or when a different number of workers
+                 is asked for) and closed when the program exits
+        """
+        if self.parallel_search is not None and workers is not None and self.parallel_search.workers != workers:
+            self.parallel_search.close()
+            atexit.unregister(self.parallel_search.close)
+            self.parallel_search = None
+        if self.parallel_search is None:
+            self.parallel_search = ParallelSearch(workers=workers, bitbases=self.get_bitbases())
+            atexit.register(self.parallel_search.close)
+        return self.parallel_search
+
+    def get_opening_book(self):
+        """
+        :return: the AI's OpeningBook (the file at OPENING_BOOK_PATH), None if there isn't one
+        """
+        if self.opening_book is None:
+            self.opening_book = OpeningBook(OPENING_BOOK_PATH) if os.path.exists(OPENING_BOOK_PATH) else False
+        return self.opening_book or None
+
+    def get_bitbases(self):
+        """
+        :return: the AI's Bitbases (the tables in BITBASE_DIRECTORY), None if there aren't any
+        """
+        if self.bitbases is None:
+            bitbases = Bitbases(BITBASE_DIRECTORY)
+            self.bitbases = bitbases if bitbases.available() else False
+        return self.bitbases or None
+
+    @staticmethod
+    def board_move(position, move):
+        """
+        :return: BitBoard move int as a (current_pos, next_pos) move for this board, None for no move
+        """
+        return position.board_move(move) if move is not None else None
+
+    @staticmethod
+    def board_line(position, moves):
+        """
+        :param position: BitBoard the line starts from (left as it was)
+        :param moves: List of BitBoard move ints played one after another
+        :return: List of the moves as (current_pos, next_pos) moves
+        """
+        line = []
+        undos = []
+        for move in moves:
+            line.append(position.board_move(move))
+            undos.append(position.make_move(move))
+        for undo in reversed(undos):
+            position.unmake_move(undo)
+        return line
 
     def get_team_pieces(self, team):
         if team == Team.WHITE:
@@ -361,58 +840,107 @@ class Board:
         if isinstance(pc, Pawn):
             return 1
 
-    def potential_next_moves(self):
-        moves = []
-        if self.turn == Team.WHITE:
-            piece_set = self.white_pieces
-        else:
-            piece_set = self.black_pieces
-
-        for pc in piece_set:
-            if isinstance(pc, King):
-                for move in pc.move_options:
-                    moves.append((pc.row + move[0], pc.col + move[1]))
-            elif isinstance(pc, Pawn):
-                moves = moves + pc.get_attack_moves()
-            else:
-                moves = moves + pc.get_valid_moves(self, False)
+    def see(self, move):
+        """
+        Static exchange evaluation of a move for the team to move (see BitBoard.see): the material won on
+        the target square once every profitable recapture there has been made, least valuable attacker first
+        and counting sliders lined up behind other pieces, without making any moves
+        :param move: (current_pos, next_pos) or (current_pos, next_pos, promotion class), legal on this board
+        :return: net material in score() units, negative if the move loses material
+        """
+        position = BitBoard.from_board(self)
+        return position.see(position.move_from_board_move(move))
 
-        return moves
+    def is_square_attacked(self, square, by_team):
+        """
+        Looks out from square for a piece of by_team that attacks it: knight jumps, pawn diagonals,
+        the king ring, then along the 8 lines for rooks, bishops and queens. Stops at the first attacker
+        found and doesn't change the board.
+        :param square: (row, col) tuple
+        :param by_team: Team.WHITE or Team.BLACK
+        :return: True if a piece of by_team attacks square
+        """
+        board = self.board
+        row, col = square
+
+        for d_row, d_col in Knight.options:
+            r, c = row + d_row, col + d_col
+            if 0 <= r < ROW and 0 <= c < COL:
+                pc = board[r][c]
+                if pc and isinstance(pc, Knight) and pc.get_team() == by_team:
+                    return True
+
+        # pawns attack diagonally forward, so an attacking pawn is a row back towards its own side
+        r = row + 1 if by_team == Team.WHITE else row - 1
+        if 0 <= r < ROW:
+            for c in (col - 1, col + 1):
+                if 0 <= c < COL:
+                    pc = board[r][c]
+                    if pc and isinstance(pc, Pawn) and pc.get_team() == by_team:
+                        return True
+
+        for d_row, d_col in Queen.options:
+            diagonal = d_row != 0 and d_col != 0
+            r, c = row + d_row, col + d_col
+            distance = 1
+            while 0 <= r < ROW and 0 <= c < COL:
+                pc = board[r][c]
+                if pc:
+                    if pc.get_team() == by_team:
+                        if isinstance(pc, Queen) or isinstance(pc, Bishop if diagonal else Rook):
+                            return True
+                        if distance == 1 and pc.is_king:
+                            return True
+                    break
+                r, c = r + d_row, c + d_col
+                distance += 1
 
-    def create_state_tuple(self):
-        state = []
-        for i in range(len(self.board)):
-            state_row = []
-            for j in range(len(self.board[0])):
-                piece = self.board[i][j]
-                if not piece:
-                    state_row.append('x')
-                else:
-                    string = ''
-                    if isinstance(piece, King):
-                        _, can_castle = piece.try_adding_castle(self, [])
-                        if can_castle:
-                            string = string + 'c'
-                    if isinstance(piece, Pawn):
-                        try:
-                            piece.en_passant(self)
-                            if len(piece.en_passant_move) != 0:
-                                string = string + 'e'
-                        except TypeError:
-                            pass
-
-                    string = string + 'W' if piece.get_team() == Team.WHITE else string + 'B'
-
-                    string = string + str(piece)
-                    state_row.append(string)
-            state.append(state_row)
-
-        tuple_representation = []
-        for i in range(len(state)):
-            row_as_tuple = tuple(state[i])
-            tuple_representation.append(row_as_tuple)
-
-        return tuple(tuple_representation)
+        return False
+
+    def in_check(self, team):
+        """
+        :return: True if team's king is attacked
+        """
+        king = self.get_king(team)
+        other_team = Team.BLACK if team == Team.WHITE else Team.WHITE
+        return king is not None and self.is_square_attacked(king.get_location(), other_team)
+
+    def compute_zobrist_key(self):
+        """
+        :return: zobrist key of the position worked out from scratch (make_move keeps self.zobrist_key up to
+                 date, this is for boards that have been set up or changed by hand)
+        """
+        key = 0
+        for row in ROWS:
+            for col in COLS:
+                pc = self.board[row][col]
+                if pc:
+                    key ^= piece_key(pc, row, col)
+        if self.turn == Team.BLACK:
+            key ^= BLACK_TO_MOVE_KEY
+        return key ^ self.castling_ep_key()
+
+    def castling_ep_key(self):
+        """
+        :return: the part of the zobrist key for castling rights (kings and rooks that haven't moved) and
+                 the pawn that can be taken en passant
+        """
+        rights = 0
+        for team, row, shift in ((Team.WHITE, 7, 0), (Team.BLACK, 0, 2)):
+            king = self.board[row][4]
+            if isinstance(king, King) and king.get_team() == team and king.init_position:
+                for right, col in ((1, 7), (2, 0)):
+                    rook = self.board[row][col]
+                    if isinstance(rook, Rook) and rook.get_team() == team and rook.init_position:
+                        rights |= right << shift
+        key = CASTLING_KEYS[rights]
+
+        # only the team that just moved can have a pawn that can be taken en passant
+        just_moved = self.black_pieces if self.turn == Team.WHITE else self.white_pieces
+        for pc in just_moved:
+            if isinstance(pc, Pawn) and pc.just_moved_two:
+                key ^= EP_KEYS[pc.col]
+        return key
 
     def print_board(self):
         for i in range(8):
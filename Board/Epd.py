@@ -0,0 +1,77 @@
+"""
+EPD (extended position description) reading. An EPD line is the first four FEN fields followed by
+operations, e.g.
+
+    r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - bm Qxf7#; id "mate in one";
+"""
+from Board.Bitboard import BitBoard
+
+
+def parse_operations(text):
+    """
+    :param text: the operations part of an EPD line
+    :return: dictionary of opcode -> operand string (quotes taken off, '' for no operands)
+    """
+    operations = {}
+    for operation in split_operations(text):
+        opcode, _, operand = operation.partition(' ')
+        operand = operand.strip()
+        if len(operand) >= 2 and operand[0] == operand[-1] == '"':
+            operand = operand[1:-1]
+        operations[opcode] = operand
+    return operations
+
+
+def split_operations(text):
+    """
+    :return: List of the ';' separated operations in text, ignoring ';' inside quoted strings
+    """
+    if '"' not in text:
+        return [operation.strip() for operation in text.split(';') if operation.strip()]
+    operations = []
+    current = []
+    quoted = False
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        if char == ';' and not quoted:
+            operations.append(''.join(current).strip())
+            current = []
+        else:
+            current.append(char)
+    operations.append(''.join(current).strip())
+    return [operation for operation in operations if operation]
+
+
+def parse_epd(line):
+    """
+    :param line: one EPD line
+    :return: (BitBoard, operations dictionary). An hmvc operation sets the position's moves_since_taken.
+    """
+    fields = line.split(None, 4)
+    if len(fields) < 4:
+        raise ValueError(f"EPD needs at least 4 fields: {line!r}")
+    operations = parse_operations(fields[4]) if len(fields) > 4 else {}
+    fen = ' '.join(fields[:4])
+    if 'hmvc' in operations:
+        fen += ' ' + operations['hmvc']
+    return BitBoard.from_fen(fen), operations
+
+
+def read_epd(source, board=False):
+    """
+    Generator of the positions in an EPD file, skipping blank lines and lines starting with #
+    :param source: path of the file, or an iterable of lines (e.g. an open file)
+    :param board: True to yield Board objects (for the gui / Board methods), False for BitBoards (much faster)
+    :return: yields (position, operations dictionary)
+    """
+    if isinstance(source, str):
+        with open(source) as lines:
+            yield from read_epd(lines, board)
+        return
+    for line in source:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        position, operations = parse_epd(line)
+        yield (position.to_board() if board else position), operations
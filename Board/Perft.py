@@ -0,0 +1,87 @@
+"""
+Perft suite: counts the legal move tree of standard test positions and checks the counts against the
+known ones, timing the move generator as it goes.
+
+    python -m Board.Perft [--depth N] [--no-bulk] [--hashed] [--board]
+
+Exits with status 1 if any count is wrong.
+"""
+import argparse
+import sys
+import time
+
+from Board.Bitboard import BitBoard
+
+# (name, FEN, leaf counts for depth 1, 2, 3, ...)
+SUITE = [
+    ("start position", "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+     [20, 400, 8902, 197281, 4865609]),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     [48, 2039, 97862, 4085603]),
+    ("rook endgame, en passant pins", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     [14, 191, 2812, 43238, 674624]),
+    ("promotions and castling", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     [6, 264, 9467, 422333]),
+    ("promotions and castling, mirrored", "r2q1rk1/pP1p2pp/Q4n2/bbp1p3/Np6/1B3NBn/pPPP1PPP/R3K2R b KQ - 0 1",
+     [6, 264, 9467, 422333]),
+    ("discovered checks", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+     [44, 1486, 62379, 2103487]),
+    ("middlegame", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     [46, 2079, 89890, 3894594]),
+]
+
+
+def run_suite(depth=3, bulk=True, hashed=False, board=False, suite=SUITE, out=sys.stdout):
+    """
+    Runs perft on each position of suite to depth (or its deepest known count, if less)
+    :param depth: deepest perft to run
+    :param bulk: count the moves at the last ply rather than making them
+    :param hashed: hashed perft (counts remembered by zobrist key)
+    :param board: True to count with Board's move generation instead of BitBoard's
+    :param suite: List of (name, FEN, counts)
+    :param out: where the report is written
+    :return: number of wrong counts
+    """
+    failures = 0
+    total_nodes = 0
+    total_time = 0.0
+    for name, fen, counts in suite:
+        position = BitBoard.from_fen(fen)
+        if board:
+            position = position.to_board()
+        search_depth = min(depth, len(counts))
+        table = {} if hashed else None
+        start = time.perf_counter()
+        if board:
+            nodes = position.board_perft(search_depth, bulk, table)
+        else:
+            nodes = position.perft(search_depth, bulk, table)
+        elapsed = time.perf_counter() - start
+        total_nodes += nodes
+        total_time += elapsed
+
+        expected = counts[search_depth - 1]
+        status = 'ok' if nodes == expected else f'WRONG (expected {expected})'
+        if nodes != expected:
+            failures += 1
+        nps = nodes / elapsed if elapsed else 0
+        out.write(f"{name:36} depth {search_depth}  {nodes:>9} nodes  {elapsed:7.2f}s  {nps:>10.0f} nps  {status}\n")
+
+    nps = total_nodes / total_time if total_time else 0
+    out.write(f"{'total':36}          {total_nodes:>9} nodes  {total_time:7.2f}s  {nps:>10.0f} nps  "
+              f"{failures} wrong\n")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Perft move generation suite")
+    parser.add_argument('--depth', type=int, default=3, help="deepest perft to run (default 3)")
+    parser.add_argument('--no-bulk', dest='bulk', action='store_false', help="make the moves at the last ply too")
+    parser.add_argument('--hashed', action='store_true', help="remember counts by zobrist key")
+    parser.add_argument('--board', action='store_true', help="use Board's move generation instead of BitBoard's")
+    args = parser.parse_args(argv)
+    return 1 if run_suite(args.depth, args.bulk, args.hashed, args.board) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,257 @@
+"""
+PGN reading and SAN (standard algebraic notation) moves. Files are read a line at a time and games are
+handed out one by one, so archives of any size are read in constant memory:
+
+    for headers, board, move in read_pgn('games.pgn'):
+        ...
+
+Moves are Board moves, (current_pos, next_pos) with a third promotion class element for promotions,
+castling being the king moving onto its own rook like in the gui.
+"""
+import re
+
+from Board.Board import Board
+from Pieces.Pawn import Pawn
+from Pieces.Knight import Knight
+from Pieces.Bishop import Bishop
+from Pieces.Rook import Rook
+from Pieces.Queen import Queen
+from Pieces.King import King
+
+PIECE_LETTERS = {Knight: 'N', Bishop: 'B', Rook: 'R', Queen: 'Q', King: 'K'}
+LETTER_PIECES = {letter: cls for cls, letter in PIECE_LETTERS.items()}
+RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+
+HEADER_RE = re.compile(r'\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+# comments ({...} or ; to the end of the line), variation brackets, or anything else up to a space
+TOKEN_RE = re.compile(r'\{[^}]*\}?|;.*|[()]|[^\s(){};]+')
+MOVE_NUMBER_RE = re.compile(r'^\d+\.*')
+SAN_RE = re.compile(r'^([KQRBN])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([QRBN]))?$')
+
+
+class PgnError(ValueError):
+    """
+    Raised for a SAN move that doesn't match exactly one legal move
+    """
+    pass
+
+
+def square(name):
+    """
+    :param name: square name, e.g. 'e4'
+    :return: (row, col) on the board
+    """
+    return 8 - int(name[1]), ord(name[0]) - ord('a')
+
+
+def square_name(position):
+    """
+    :param position: (row, col) on the board
+    :return: square name, e.g. 'e4'
+    """
+    return 'abcdefgh'[position[1]] + str(8 - position[0])
+
+
+def piece_moves(board, piece_class, from_file=None, from_rank=None):
+    """
+    Legal moves of just the pieces of one kind of the team to move - a SAN move names the kind of piece,
+    so there's no need to generate every move
+    :param board: Board
+    :param piece_class: Pawn, Knight, ...
+    :param from_file: only pieces on this column (None for any)
+    :param from_rank: only pieces on this row (None for any)
+    :return: List of moves like board.legal_moves() gives
+    """
+    moves = []
+    for pc in board.get_team_pieces(board.team_turn())[0]:
+        if type(pc) is not piece_class or from_file not in (None, pc.col) or from_rank not in (None, pc.row):
+            continue
+        for next_pos in pc.get_valid_moves(board, True):
+            if piece_class is Pawn and next_pos[0] in (0, 7):
+                for promotion in (Queen, Rook, Bishop, Knight):
+                    moves.append((pc.get_location(), next_pos, promotion))
+            else:
+                moves.append((pc.get_location(), next_pos))
+    return moves
+
+
+def parse_san(board, san):
+    """
+    Finds the legal move a SAN move stands for
+    :param board: Board the move is played on
+    :param san: SAN move, e.g. 'Nbd7', 'exd6', 'e8=Q+', 'O-O'
+    :return: the move, as in board.legal_moves() (a pawn promotion without a piece is to a queen)
+    """
+    text = san.rstrip('+#!?')
+    if text in ('O-O', 'O-O-O', '0-0', '0-0-0'):
+        rook_col = 7 if len(text) == 3 else 0
+        for move in piece_moves(board, King):
+            if move[1][1] == rook_col and abs(move[1][1] - move[0][1]) > 1:
+                return move
+        raise PgnError(f"illegal castle {san!r} in {board.to_fen()}")
+
+    match = SAN_RE.match(text)
+    if match is None:
+        raise PgnError(f"can't read move {san!r}")
+    letter, from_file, from_rank, to_name, promotion = match.groups()
+    piece_class = LETTER_PIECES[letter] if letter else Pawn
+    to_pos = square(to_name)
+    promotion_class = LETTER_PIECES[promotion] if promotion else Queen
+    col = ord(from_file) - ord('a') if from_file is not None else None
+    row = 8 - int(from_rank) if from_rank is not None else None
+
+    found = []
+    for move in piece_moves(board, piece_class, col, row):
+        if move[1] == to_pos and (len(move) == 2 or move[2] is promotion_class):
+            found.append(move)
+    if len(found) != 1:
+        problem = 'illegal' if not found else 'ambiguous'
+        raise PgnError(f"{problem} move {san!r} in {board.to_fen()}")
+    return found[0]
+
+
+def move_to_san(board, move):
+    """
+    :param board: Board the move is played on (left as it was)
+    :param move: legal move on board
+    :return: SAN of the move, with + or # for check or mate
+    """
+    (from_row, from_col), (to_row, to_col) = move[0], move[1]
+    pc = board.board[from_row][from_col]
+    target = board.board[to_row][to_col]
+
+    if pc.is_king and target and target.get_team() == pc.get_team():
+        san = 'O-O' if to_col == 7 else 'O-O-O'
+    elif isinstance(pc, Pawn):
+        san = square_name(move[1])
+        if from_col != to_col:
+            san = 'abcdefgh'[from_col] + 'x' + san
+        if len(move) > 2:
+            san += '=' + PIECE_LETTERS[move[2]]
+    else:
+        others = [other[0] for other in piece_moves(board, type(pc)) if other[1] == move[1] and other[0] != move[0]]
+        disambiguation = ''
+        if others:
+            if all(other[1] != from_col for other in others):
+                disambiguation = 'abcdefgh'[from_col]
+            elif all(other[0] != from_row for other in others):
+                disambiguation = str(8 - from_row)
+            else:
+                disambiguation = square_name(move[0])
+        san = PIECE_LETTERS[type(pc)] + disambiguation + ('x' if target else '') + square_name(move[1])
+
+    undo = board.make_move(move)
+    if board.in_check(board.turn):
+        san += '#' if not board.legal_moves() else '+'
+    board.unmake_move(undo)
+    return san
+
+
+def read_games(source):
+    """
+    Generator of the games in a PGN file, read a line at a time. Comments, variations, NAGs and move
+    numbers are skipped.
+    :param source: path of the file, or an iterable of lines (e.g. an open file)
+    :return: yields (headers dictionary, List of SAN moves, result) for each game
+    """
+    if isinstance(source, str):
+        with open(source) as lines:
+            yield from read_games(lines)
+        return
+
+    headers = {}
+    moves = []
+    variation_depth = 0
+    in_comment = False
+    for line in source:
+        if in_comment:
+            end = line.find('}')
+            if end == -1:
+                continue
+            line = line[end + 1:]
+            in_comment = False
+
+        stripped = line.strip()
+        if stripped.startswith('[') and not variation_depth:
+            header = HEADER_RE.match(stripped)
+            if header is not None:
+                # a game without a result before the next game's headers
+                if moves:
+                    yield headers, moves, headers.get('Result', '*')
+                    headers, moves = {}, []
+                headers[header.group(1)] = header.group(2).replace('\\"', '"').replace('\\\\', '\\')
+                continue
+        if stripped.startswith('%'):
+            continue
+
+        for token in TOKEN_RE.findall(line):
+            first = token[0]
+            if first == '{':
+                in_comment = not token.endswith('}')
+            elif first == ';':
+                break
+            elif first == '(':
+                variation_depth += 1
+            elif first == ')':
+                variation_depth = max(0, variation_depth - 1)
+            elif variation_depth or first == '$':
+                continue
+            elif token in RESULTS:
+                yield headers, moves, token
+                headers, moves = {}, []
+            else:
+                token = MOVE_NUMBER_RE.sub('', token)
+                if token:
+                    moves.append(token)
+    if moves or headers:
+        yield headers, moves, headers.get('Result', '*')
+
+
+def start_board(headers):
+    """
+    :return: Board a game starts from (its FEN header, or the usual start)
+    """
+    return Board.from_fen(headers['FEN']) if 'FEN' in headers else Board()
+
+
+def read_pgn(source, bulk=False):
+    """
+    Generator of every move of every game in a PGN file, replayed through the Board rules. The board
+    yielded is the position the move is played from; the move is made when the generator is resumed.
+    :param source: path of the file, or an iterable of lines
+    :param bulk: False to replay with move_piece, so every position yielded is a new Board that can be kept.
+                 True to replay each game on one Board with make_move (no copies) - the board yielded is
+                 then changed in place by the following moves.
+    :return: yields (headers, board, move). A move that isn't legal raises PgnError.
+    """
+    for headers, sans, _ in read_games(source):
+        board = start_board(headers)
+        for san in sans:
+            move = parse_san(board, san)
+            yield headers, board, move
+            if bulk:
+                board.make_move(move)
+            else:
+                board = board.move_piece(move[0], move[1], promotion=move[2] if len(move) > 2 else None)['board']
+
+
+def replay_games(source):
+    """
+    Bulk replays every game in a PGN file (in place with make_move) to check the moves are legal
+    :param source: path of the file, or an iterable of lines
+    :return: yields (headers, final Board, plies played, PgnError or None) for each game. A game with a bad
+             move stops there, with the board in the position before it.
+    """
+    for headers, sans, _ in read_games(source):
+        board = start_board(headers)
+        plies = 0
+        error = None
+        for san in sans:
+            try:
+                move = parse_san(board, san)
+            except PgnError as e:
+                error = e
+                break
+            board.make_move(move)
+            plies += 1
+        yield headers, board, plies, error
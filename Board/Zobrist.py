@@ -0,0 +1,25 @@
+import random
+
+# fixed seed so keys are the same every run (keys get stored on disk, e.g. opening books)
+_random = random.Random(0x5A0B)
+
+
+def _random_key():
+    return _random.getrandbits(64)
+
+
+# PIECE_KEYS[color * 6 + piece type][square], same piece codes and squares as BitBoard
+PIECE_KEYS = [[_random_key() for _ in range(64)] for _ in range(12)]
+# xored in when black is to move
+BLACK_TO_MOVE_KEY = _random_key()
+# one key per castling right, CASTLING_KEYS[rights] is the xor of the keys of the rights set
+_castling_right_keys = [_random_key() for _ in range(4)]
+CASTLING_KEYS = []
+for _rights in range(16):
+    _key = 0
+    for _i in range(4):
+        if _rights & (1 << _i):
+            _key ^= _castling_right_keys[_i]
+    CASTLING_KEYS.append(_key)
+# keyed by the column of the en passant square
+EP_KEYS = [_random_key() for _ in range(8)]
@@ -0,0 +1,325 @@
+"""
+Engine server: hosts many games at once over a local TCP or Unix socket, so a game doesn't need its own
+process to get AI moves.
+
+    python -m Engine.Server [--host 127.0.0.1] [--port 8765 | --unix PATH] [--workers N] [--hash MB]
+
+Requests and replies are JSON objects, one per line. Every reply echoes the request's "id" and has "ok":
+
+    {"id": 1, "type": "new_game"}                          -> {"id": 1, "ok": true, "session": "...", "fen": "..."}
+    {"id": 2, "type": "move", "session": "...", "move": "e2e4"}        -> {..., "fen": "...", "status": "playing"}
+    {"id": 3, "type": "think", "session": "...", "movetime_ms": 500, "deadline_ms": 2000, "play": true}
+                                          -> {..., "move": "e7e5", "score": "cp 0", "depth": 4, "nodes": 5120, ...}
+    {"id": 4, "type": "close_game", "session": "..."}
+    {"id": 5, "type": "error"}                              -> {"id": 5, "ok": false, "error": "..."}
+
+Searches run in one process pool shared by every session, all on one transposition table in shared memory.
+A think request waits for a free search slot until its deadline, then gets a "busy" error; a connection with
+too many requests in flight isn't read from until some are answered.
+"""
+import argparse
+import asyncio
+import collections
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from Board.Bitboard import BitBoard
+from AI.Search import Search, DRAW_MOVES_SINCE_TAKEN
+from AI.TranspositionTable import TranspositionTable, table_bytes
+from Engine.Uci import START_FEN, move_to_uci, parse_uci_move, format_score
+
+SHARED_TRANSPOSITION_TABLE_MB = 64
+# searches queued in the pool beyond one per worker
+QUEUED_SEARCHES_PER_WORKER = 2
+# requests a connection can have in flight before the server stops reading from it
+MAX_IN_FLIGHT = 64
+MAX_SESSIONS = 10000
+# zobrist keys kept per session for repetitions - a capture makes older positions unreachable anyway
+MAX_HISTORY = 256
+DEFAULT_MOVETIME_MS = 1000
+MAX_DEPTH = 64
+# kept back from a request's deadline for sending the reply
+DEADLINE_MARGIN_MS = 20
+
+# set up in each worker process by _init_worker
+_worker_memory = None
+_worker_tt = None
+
+
+def _init_worker(memory_name, tt_mb):
+    """
+    Runs once in each worker process: attaches to the shared transposition table
+    :param memory_name: name of the shared_memory block holding the table
+    :param tt_mb: size of the table
+    """
+    global _worker_memory, _worker_tt
+    _worker_memory = shared_memory.SharedMemory(name=memory_name)
+    _worker_tt = TranspositionTable(tt_mb, _worker_memory.buf)
+
+
+def _think(state, history, max_depth, movetime_ms):
+    """
+    Worker task: iterative deepening search of one position
+    :param state: BitBoard.serialize() of the position
+    :param history: zobrist keys of positions already seen in the game
+    :param max_depth: deepest iteration
+    :param movetime_ms: time budget
+    :return: (best move int or None, value for the team to move, depth completed, nodes searched)
+    """
+    search = Search(BitBoard.deserialize(state), history, _worker_tt)
+    move, value, depth = search.iterative_deepening(max_depth, movetime_ms)
+    return move, value, depth, search.nodes + search.qnodes
+
+
+class RequestError(Exception):
+    """
+    Raised for a request that can't be answered, its message is sent back as the error
+    """
+    pass
+
+
+class Session:
+
+    def __init__(self, position, max_history=MAX_HISTORY):
+        """
+        One game hosted by the server
+        :param position: BitBoard of the current position
+        :param max_history: most zobrist keys of earlier positions kept
+        """
+        self.position = position
+        self.history = collections.deque(maxlen=max_history)
+        # requests on one game are answered in order
+        self.lock = asyncio.Lock()
+
+    def play(self, move):
+        self.history.append(self.position.zobrist_key)
+        self.position.make_move(move)
+
+    def status(self):
+        """
+        :return: 'checkmate', 'stalemate', 'draw' (50 moves without a capture or threefold repetition) or 'playing'
+        """
+        position = self.position
+        if not position.legal_moves():
+            return 'checkmate' if position.in_check() else 'stalemate'
+        if position.moves_since_taken >= DRAW_MOVES_SINCE_TAKEN or self.history.count(position.zobrist_key) >= 2:
+            return 'draw'
+        return 'playing'
+
+
+class EngineServer:
+
+    def __init__(self, workers=None, tt_mb=SHARED_TRANSPOSITION_TABLE_MB, max_sessions=MAX_SESSIONS,
+                 max_history=MAX_HISTORY, max_in_flight=MAX_IN_FLIGHT):
+        """
+        Use as a context manager (or call close()) so the pool and the shared memory are freed
+        :param workers: search processes (None for one per cpu)
+        :param tt_mb: size of the shared transposition table
+        :param max_sessions: most games hosted at once
+        :param max_history: most earlier positions kept per game
+        :param max_in_flight: most unanswered requests per connection
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.tt_mb = tt_mb
+        self.max_sessions = max_sessions
+        self.max_history = max_history
+        self.max_in_flight = max_in_flight
+        self.sessions = {}
+        self.session_ids = itertools.count(1)
+        # a new shared memory block is zeroed, which is an empty table
+        self.memory = shared_memory.SharedMemory(create=True, size=table_bytes(tt_mb))
+        self.pool = ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(self.memory.name, tt_mb))
+        self.search_slots = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.pool.shutdown()
+        self.memory.close()
+        self.memory.unlink()
+
+    async def serve(self, host='127.0.0.1', port=8765, unix_path=None):
+        """
+        Accepts connections until cancelled
+        """
+        if unix_path is not None:
+            server = await asyncio.start_unix_server(self.handle_connection, unix_path)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+        async with server:
+            await server.serve_forever()
+
+    async def handle_connection(self, reader, writer):
+        """
+        Answers the requests of one connection, several at a time
+        """
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+        write_lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                # backpressure: nothing more is read while max_in_flight requests are unanswered
+                await in_flight.acquire()
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):
+                    line = b''
+                if not line:
+                    in_flight.release()
+                    break
+                task = asyncio.ensure_future(self.answer(line, writer, write_lock, in_flight))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except asyncio.CancelledError:
+            # the server is shutting down
+            pass
+        finally:
+            writer.close()
+
+    async def answer(self, line, writer, write_lock, in_flight):
+        try:
+            reply = await self.handle_request(line)
+            async with write_lock:
+                writer.write(json.dumps(reply).encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            in_flight.release()
+
+    async def handle_request(self, line):
+        """
+        :param line: one JSON request
+        :return: reply dictionary
+        """
+        received = time.perf_counter()
+        request_id = None
+        try:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                raise RequestError("request isn't JSON")
+            if not isinstance(request, dict):
+                raise RequestError("request isn't a JSON object")
+            request_id = request.get('id')
+            handler = {'new_game': self.new_game, 'move': self.move, 'think': self.think,
+                       'close_game': self.close_game}.get(request.get('type'))
+            if handler is None:
+                raise RequestError(f"unknown request type {request.get('type')!r}")
+            reply = await handler(request, received)
+        except RequestError as e:
+            return {'id': request_id, 'ok': False, 'error': str(e)}
+        except Exception as e:
+            # e.g. a worker process dying, the server keeps going
+            return {'id': request_id, 'ok': False, 'error': f"internal error: {e!r}"}
+        reply.update(id=request_id, ok=True)
+        return reply
+
+    def session(self, request):
+        session = self.sessions.get(request.get('session'))
+        if session is None:
+            raise RequestError(f"no game {request.get('session')!r}")
+        return session
+
+    async def new_game(self, request, received):
+        if len(self.sessions) >= self.max_sessions:
+            raise RequestError("too many games")
+        try:
+            position = BitBoard.from_fen(request.get('fen', START_FEN))
+        except ValueError as e:
+            raise RequestError(str(e))
+        session_id = str(next(self.session_ids))
+        self.sessions[session_id] = Session(position, self.max_history)
+        return {'session': session_id, 'fen': position.to_fen()}
+
+    async def close_game(self, request, received):
+        self.session(request)
+        del self.sessions[request['session']]
+        return {}
+
+    async def move(self, request, received):
+        session = self.session(request)
+        async with session.lock:
+            try:
+                move = parse_uci_move(session.position, str(request.get('move')))
+            except ValueError as e:
+                raise RequestError(str(e))
+            session.play(move)
+            return {'fen': session.position.to_fen(), 'status': session.status()}
+
+    async def think(self, request, received):
+        """
+        Searches the game's position within the request's movetime_ms / depth, replying by deadline_ms
+        (measured from when the request was read). With "play": true the move is made too.
+        """
+        session = self.session(request)
+        try:
+            movetime_ms = int(request.get('movetime_ms', DEFAULT_MOVETIME_MS))
+            max_depth = int(request.get('depth', MAX_DEPTH))
+            deadline_ms = int(request['deadline_ms']) if 'deadline_ms' in request else None
+        except (TypeError, ValueError):
+            raise RequestError("movetime_ms, depth and deadline_ms must be numbers")
+        deadline = received + deadline_ms / 1000 if deadline_ms is not None else None
+
+        def remaining_ms():
+            return (deadline - time.perf_counter()) * 1000 - DEADLINE_MARGIN_MS if deadline is not None else None
+
+        if self.search_slots is None:
+            self.search_slots = asyncio.Semaphore(self.workers * (1 + QUEUED_SEARCHES_PER_WORKER))
+        async with session.lock:
+            try:
+                await asyncio.wait_for(self.search_slots.acquire(), None if deadline is None
+                                       else max(0, remaining_ms() / 1000))
+            except asyncio.TimeoutError:
+                raise RequestError("busy")
+            if deadline is not None:
+                movetime_ms = min(movetime_ms, remaining_ms())
+                if movetime_ms <= 0:
+                    self.search_slots.release()
+                    raise RequestError("busy")
+            position = session.position
+            future = asyncio.get_running_loop().run_in_executor(
+                self.pool, _think, position.serialize(), tuple(session.history), max_depth, movetime_ms)
+            # the slot is only free once the worker is, even if the reply has already gone
+            future.add_done_callback(lambda _: self.search_slots.release())
+            try:
+                move, value, depth, nodes = await asyncio.wait_for(
+                    asyncio.shield(future), None if deadline is None else max(0, remaining_ms() / 1000) + 1)
+            except asyncio.TimeoutError:
+                raise RequestError("deadline passed")
+            reply = {'move': move_to_uci(move) if move else None, 'score': format_score(value), 'depth': depth,
+                     'nodes': nodes}
+            if request.get('play') and move:
+                session.play(move)
+                reply.update(fen=position.to_fen(), status=session.status())
+            return reply
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="JSON lines engine server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help="listen on this Unix socket path instead of TCP")
+    parser.add_argument('--workers', type=int, help="search processes (default one per cpu)")
+    parser.add_argument('--hash', type=int, default=SHARED_TRANSPOSITION_TABLE_MB,
+                        help="shared transposition table MB")
+    args = parser.parse_args(argv)
+    with EngineServer(args.workers, args.hash) as server:
+        try:
+            asyncio.run(server.serve(args.host, args.port, args.unix))
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
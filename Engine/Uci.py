@@ -0,0 +1,309 @@
+"""
+UCI (universal chess interface) engine, so the AI can be played from any UCI gui or tournament manager:
+
+    python -m Engine
+
+Commands are read a line at a time from stdin. The search runs in a worker thread, so stop, isready and
+quit are answered while it's thinking; info lines (depth, score, nodes, nps, pv) are written after every
+completed iteration.
+"""
+import sys
+import threading
+import time
+
+from Board.Bitboard import BitBoard, FEN_PIECES, move_from, move_to, move_promotion
+from AI.Search import Search, MATE, MATE_BOUND
+from AI.LazySMP import LazySMP
+from AI.TranspositionTable import TranspositionTable
+from AI.Bitbases import Bitbases
+
+ENGINE_NAME = 'PyChess'
+ENGINE_AUTHOR = 'jrbrinlee1'
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+DEFAULT_HASH_MB = 16
+MAX_HASH_MB = 1024
+MAX_THREADS = 64
+# deepest iteration when go doesn't give a depth
+MAX_DEPTH = 64
+# moves the remaining clock time is split over when go doesn't give movestogo
+DEFAULT_MOVES_TO_GO = 30
+# kept back from the clock for the time it takes the gui to get the move
+MOVE_OVERHEAD_MS = 50
+
+# go arguments taking a number
+GO_NUMBERS = ('depth', 'movetime', 'nodes', 'wtime', 'btime', 'winc', 'binc', 'movestogo')
+
+
+def square_name(sq):
+    """
+    :param sq: BitBoard square (row * 8 + col, row 0 being rank 8)
+    :return: square name, e.g. 'e4'
+    """
+    return 'abcdefgh'[sq % 8] + str(8 - sq // 8)
+
+
+def move_to_uci(move):
+    """
+    :param move: BitBoard move int
+    :return: long algebraic move, e.g. 'e2e4', 'e1g1' (castling), 'e7e8q'
+    """
+    text = square_name(move_from(move)) + square_name(move_to(move))
+    promotion = move_promotion(move)
+    return text + FEN_PIECES[promotion] if promotion else text
+
+
+def parse_uci_move(position, text):
+    """
+    :param position: BitBoard the move is played on
+    :param text: long algebraic move, e.g. 'e2e4'
+    :return: the legal move int it stands for
+    """
+    for move in position.legal_moves():
+        if move_to_uci(move) == text:
+            return move
+    raise ValueError(f"illegal move {text!r} in {position.to_fen()}")
+
+
+def format_score(value):
+    """
+    :param value: search value for the team to move
+    :return: UCI score, 'cp <centipawns>' or 'mate <moves>' (negative when getting mated)
+    """
+    if abs(value) >= MATE_BOUND:
+        plies = MATE - abs(value)
+        moves = (plies + 1) // 2
+        return f"mate {moves if value > 0 else -moves}"
+    return f"cp {int(value)}"
+
+
+def time_budget(limits, white):
+    """
+    :param limits: go arguments
+    :param white: True when white is to move
+    :return: milliseconds to think for (None for no limit)
+    """
+    if 'movetime' in limits:
+        return max(1, limits['movetime'] - MOVE_OVERHEAD_MS // 2)
+    time_left = limits.get('wtime' if white else 'btime')
+    if time_left is None:
+        return None
+    increment = limits.get('winc' if white else 'binc', 0)
+    moves_to_go = limits.get('movestogo') or DEFAULT_MOVES_TO_GO
+    budget = time_left / moves_to_go + increment * 3 / 4
+    return max(1, int(min(budget, time_left / 2, time_left - MOVE_OVERHEAD_MS)))
+
+
+class UciEngine:
+
+    def __init__(self, out=sys.stdout):
+        """
+        :param out: where replies are written
+        """
+        self.out = out
+        self.output_lock = threading.Lock()
+        self.position = BitBoard.from_fen(START_FEN)
+        # zobrist keys of the positions before the current one, for repetitions
+        self.history = []
+        # endgame bitbases in AI/bitbases, if any have been built
+        bitbases = Bitbases()
+        self.bitbases = bitbases if bitbases.available() else None
+        self.hash_mb = DEFAULT_HASH_MB
+        self.threads = 1
+        # LazySMP kept while Threads is over 1, its helpers and shared table are reused by every go
+        self.smp = None
+        self.tt = None
+        self.make_table()
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def send(self, line):
+        with self.output_lock:
+            self.out.write(line + '\n')
+            self.out.flush()
+
+    def run(self, source=sys.stdin):
+        """
+        Reads commands until quit or the end of source
+        :param source: iterable of command lines
+        """
+        for line in source:
+            if not self.handle(line):
+                break
+        self.stop()
+        self.close()
+
+    def handle(self, line):
+        """
+        :param line: one command line
+        :return: False once quit has been received
+        """
+        words = line.split()
+        if not words:
+            return True
+        command, args = words[0], words[1:]
+        if command == 'quit':
+            return False
+        if command == 'uci':
+            self.send(f"id name {ENGINE_NAME}")
+            self.send(f"id author {ENGINE_AUTHOR}")
+            self.send(f"option name Hash type spin default {DEFAULT_HASH_MB} min 1 max {MAX_HASH_MB}")
+            self.send(f"option name Threads type spin default 1 min 1 max {MAX_THREADS}")
+            self.send("uciok")
+        elif command == 'isready':
+            self.send("readyok")
+        elif command == 'ucinewgame':
+            self.stop()
+            self.tt.clear()
+        elif command == 'setoption':
+            self.set_option(args)
+        elif command == 'position':
+            self.stop()
+            self.set_position(args)
+        elif command == 'go':
+            self.go(args)
+        elif command == 'stop':
+            self.stop()
+        else:
+            self.send(f"info string unknown command {command}")
+        return True
+
+    def set_option(self, args):
+        """
+        :param args: 'name <name> value <value>' words
+        """
+        if 'name' not in args or 'value' not in args:
+            return
+        name = ' '.join(args[args.index('name') + 1:args.index('value')]).lower()
+        value = ' '.join(args[args.index('value') + 1:])
+        self.stop()
+        try:
+            if name == 'hash':
+                self.hash_mb = min(max(1, int(value)), MAX_HASH_MB)
+                self.make_table()
+            elif name == 'threads':
+                threads = min(max(1, int(value)), MAX_THREADS)
+                if threads != self.threads:
+                    self.threads = threads
+                    self.make_table()
+            else:
+                self.send(f"info string unknown option {name}")
+        except ValueError:
+            self.send(f"info string bad value {value} for {name}")
+
+    def make_table(self):
+        """
+        Makes the transposition table for the Hash and Threads options. With more than one thread it's the
+        shared table of a LazySMP, whose helper processes are started now and kept until the options change
+        """
+        self.close()
+        if self.threads > 1:
+            self.smp = LazySMP(helpers=self.threads - 1, tt_mb=self.hash_mb, bitbases=self.bitbases)
+            self.tt = self.smp.tt
+        else:
+            self.tt = TranspositionTable(self.hash_mb)
+
+    def close(self):
+        """
+        Frees the transposition table, and stops the LazySMP helpers if there are any
+        """
+        if self.smp is not None:
+            self.smp.close()
+            self.smp = None
+        elif self.tt is not None:
+            self.tt.release()
+        self.tt = None
+
+    def set_position(self, args):
+        """
+        :param args: 'startpos [moves ...]' or 'fen <fen> [moves ...]' words
+        """
+        moves = args[args.index('moves') + 1:] if 'moves' in args else []
+        setup = args[:args.index('moves')] if 'moves' in args else args
+        try:
+            if setup and setup[0] == 'fen':
+                position = BitBoard.from_fen(' '.join(setup[1:]))
+            else:
+                position = BitBoard.from_fen(START_FEN)
+            history = []
+            for text in moves:
+                move = parse_uci_move(position, text)
+                history.append(position.zobrist_key)
+                position.make_move(move)
+        except ValueError as e:
+            self.send(f"info string {e}")
+            return
+        self.position = position
+        self.history = history
+
+    def go(self, args):
+        """
+        Starts a search in the worker thread; bestmove is sent when it's done
+        :param args: go arguments, e.g. 'depth 6' or 'wtime 60000 btime 60000 winc 1000 binc 1000'
+        """
+        self.stop()
+        limits = {}
+        for index, word in enumerate(args):
+            if word in GO_NUMBERS and index + 1 < len(args):
+                try:
+                    limits[word] = int(args[index + 1])
+                except ValueError:
+                    pass
+            elif word == 'infinite':
+                limits['infinite'] = True
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.search, args=(self.position.copy(), limits, self.stop_event),
+                                       daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stops the search if one is running and waits for its bestmove
+        """
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
+
+    def search(self, position, limits, stop_event):
+        """
+        Worker thread: iterative deepening within the go limits, then bestmove
+        """
+        max_depth = limits.get('depth', MAX_DEPTH)
+        movetime = time_budget(limits, position.turn == 1)
+        start = time.perf_counter()
+        smp = self.smp
+        if smp is not None:
+            search = smp.set_position(position, self.history)
+        else:
+            smp = None
+            search = Search(position, self.history, self.tt, bitbases=self.bitbases)
+        search.stop_event = stop_event
+
+        def report(depth, move, value):
+            elapsed = time.perf_counter() - start
+            nodes = smp.nodes if smp is not None else search.nodes + search.qnodes
+            pv = ' '.join(move_to_uci(pv_move) for pv_move in search.pv)
+            self.send(f"info depth {depth} score {format_score(value)} nodes {nodes} "
+                      f"nps {int(nodes / elapsed) if elapsed else 0} time {int(elapsed * 1000)} pv {pv}")
+
+        search.on_iteration = report
+        best_move, _, _ = (smp or search).iterative_deepening(max_depth, movetime, limits.get('nodes'))
+        ponder = search.pv[1:2]
+        # with go infinite the bestmove waits for stop, even if the search finished
+        if limits.get('infinite'):
+            stop_event.wait()
+        if best_move is None:
+            self.send("bestmove 0000")
+        elif ponder:
+            self.send(f"bestmove {move_to_uci(best_move)} ponder {move_to_uci(ponder[0])}")
+        else:
+            self.send(f"bestmove {move_to_uci(best_move)}")
+
+
+def main():
+    UciEngine().run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,4 @@
+from Engine.Uci import main
+
+if __name__ == '__main__':
+    main()
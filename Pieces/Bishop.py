@@ -3,10 +3,13 @@ from Pieces.Piece import Piece
 
 
 class Bishop(Piece):
+    __slots__ = ()
+    image_paths = {Team.BLACK: "Images/bB.png", Team.WHITE: "Images/wB.png"}
+    # directions the bishop moves in
+    options = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
 
     def __init__(self, team, row, col):
         super().__init__(team, row, col)
-        self.image_path = "Images/bB.png" if self.team == Team.BLACK else "Images/wB.png"
 
     def get_valid_moves(self, board, current_move=True):
         """
@@ -16,9 +19,8 @@ class Bishop(Piece):
         :return: list of valid moves for current bishop
         """
         valid_moves = []
-        options = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
 
-        for op in options:
+        for op in self.options:
             for i in range(1, 9):
                 row = self.row + op[0] * i
                 col = self.col + op[1] * i
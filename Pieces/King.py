@@ -4,6 +4,11 @@ from Pieces.Rook import Rook
 
 
 class King(Piece):
+    __slots__ = ('init_position',)
+    image_paths = {Team.BLACK: "Images/bK.png", Team.WHITE: "Images/wK.png"}
+    is_king = True
+    # squares around the king it can step to
+    move_options = [(1, 1), (1, -1), (-1, 1), (-1, -1), (0, 1), (0, -1), (1, 0), (-1, 0)]
 
     def __init__(self, team, row, col,  init_position=True):
         """
@@ -14,16 +19,13 @@ class King(Piece):
         :param init_position: True if the piece hasn't been moved, False otherwise
         """
         super().__init__(team, row, col)
-        self.image_path = "Images/bK.png" if self.team == Team.BLACK else "Images/wK.png"
-        self.move_options = [(1, 1), (1, -1), (-1, 1), (-1, -1), (0, 1), (0, -1), (1, 0), (-1, 0)]
         self.init_position = init_position
-        self.is_king = True
 
     def get_valid_moves(self, board, current_move=True):
         """
         Method used to get the valid move for the king
         :param board: current board object
-        :param current_move: True to make sure king isn't moving into check, false otherwise
+        :param current_move: True to make sure king isn't moving into check (and add castle moves), false otherwise
         :return: list of valid moves for current king
         """
         valid_moves = []
@@ -40,8 +42,9 @@ class King(Piece):
                     if board.team_on(row, col) != self.team:
                         valid_moves.append((row, col))
 
-        valid_moves = self.try_adding_castle(board, valid_moves)[0]
-        valid_moves = self.harms_way(board, valid_moves)
+        if current_move:
+            valid_moves = self.harms_way(board, valid_moves)
+            valid_moves = self.try_adding_castle(board, valid_moves)[0]
 
         return valid_moves
 
@@ -100,14 +103,8 @@ class King(Piece):
         :param location: (row, column) tuple where we want to determine check (usually just the location of king)
         :return: True if (row, column) would be check, otherwise False
         """
-        change_team = Team.WHITE if self.team == Team.BLACK else Team.BLACK
-        board.turn = change_team
-        if (location[0], location[1]) in board.potential_next_moves():
-            board.turn = self.team
-            return True
-        else:
-            board.turn = self.team
-            return False
+        other_team = Team.WHITE if self.team == Team.BLACK else Team.BLACK
+        return board.is_square_attacked((location[0], location[1]), other_team)
 
     def move(self, row, col, board):
         """
@@ -166,18 +163,6 @@ class King(Piece):
         :param valid_moves: current set of valid moves
         :return: update list of valid moves
         """
-        remove_from_valid = []
-        # make sure the king isn't moving into harms way
-        for move in valid_moves:
-            move_dict = board.move_piece((self.row, self.col), move)
-            if move in move_dict['board'].potential_next_moves():
-                remove_from_valid.append(move)
-
-        # remove the moves that would lead to being in check
-        remove_from_valid = set(remove_from_valid)
-        for move in remove_from_valid:
-            if move in valid_moves:
-                valid_moves.remove(move)
-
-        return valid_moves
-
+        other_team = Team.WHITE if self.team == Team.BLACK else Team.BLACK
+        attacked = board.attacked_squares(other_team, self)
+        return [move for move in valid_moves if move not in attacked]
@@ -3,10 +3,13 @@ from Pieces.Piece import Piece
 
 
 class Knight(Piece):
+    __slots__ = ()
+    image_paths = {Team.BLACK: "Images/bN.png", Team.WHITE: "Images/wN.png"}
+    # jumps the knight can make
+    options = [(1, 2), (2, 1), (1, -2), (-2, 1), (-1, 2), (2, -1), (-1, -2), (-2, -1)]
 
     def __init__(self, team, row, col):
         super().__init__(team, row, col)
-        self.image_path = "Images/bN.png" if self.team == Team.BLACK else "Images/wN.png"
 
     def get_valid_moves(self, board, current_move=True):
         """
@@ -16,9 +19,8 @@ class Knight(Piece):
         :return: list of valid moves for current knight
         """
         valid_moves = []
-        options = [(1, 2), (2, 1), (1, -2), (-2, 1), (-1, 2), (2, -1), (-1, -2), (-2, -1)]
 
-        for op in options:
+        for op in self.options:
             i = self.row + op[0]
             j = self.col + op[1]
 
@@ -3,10 +3,11 @@ from Pieces.Piece import Piece
 
 
 class Pawn(Piece):
+    __slots__ = ('init_position', 'just_moved_two', 'direction', 'en_passant_move')
+    image_paths = {Team.BLACK: "Images/bP.png", Team.WHITE: "Images/wP.png"}
 
     def __init__(self, team, row, col, init_position=True, just_moved_two=False, en_passant_move=[]):
         super().__init__(team, row, col)
-        self.image_path = "Images/bP.png" if self.team == Team.BLACK else "Images/wP.png"
         self.init_position = init_position
         self.just_moved_two = just_moved_two
         self.direction = 1 if self.team == Team.BLACK else -1
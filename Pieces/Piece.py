@@ -1,17 +1,25 @@
 from abc import ABC, abstractmethod
-from Pieces.Team import Team
 
 
 class Piece(ABC):
     """
-    Abstract class for all the different pieces on the board.
+    Abstract class for all the different pieces on the board. Pieces use __slots__ (no per instance
+    __dict__), and what is the same for every piece of a kind (is_king, image paths, move directions)
+    is kept on the class.
     """
+    __slots__ = ('team', 'row', 'col')
+    is_king = False
+    # Team -> image shown in the gui, set by each piece class
+    image_paths = {}
 
     def __init__(self, team, row, col):
         self.team = team
         self.row = row
         self.col = col
-        self.is_king = False
+
+    @property
+    def image_path(self):
+        return self.image_paths[self.team]
 
     @abstractmethod
     def __str__(self):
@@ -43,27 +51,8 @@ class Piece(ABC):
         :param valid_moves: list of current valid moves
         :return: updated valid_moves list (List(Tuple)) with moves removed that would leave the king in check
         """
-        copy = board.copy_board_object()
-
-        pieces = copy.white_pieces if self.team == Team.WHITE else copy.black_pieces
-        for pc in pieces:
-            if pc.is_king:
-                king = pc
-
-        remove_from_valid = []
-        # make sure the king isn't moving into harms way
-        for move in valid_moves:
-            move_dict = copy.move_piece((self.row, self.col), move, False)
-            if (king.row, king.col) in move_dict['board'].potential_next_moves():
-                remove_from_valid.append(move)
-
-        # remove those moves that would put king in check
-        remove_from_valid = set(remove_from_valid)
-        for move in remove_from_valid:
-            if move in valid_moves:
-                valid_moves.remove(move)
-
-        return valid_moves
+        check_mask, pins = board.check_and_pins(self.team)
+        return board.filter_moves(self, valid_moves, check_mask, pins)
 
     def move(self, row, col, board):
         self.row = row
@@ -74,10 +63,3 @@ class Piece(ABC):
 
     def get_location(self):
         return self.row, self.col
-
-
-
-
-
-
-
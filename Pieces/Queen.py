@@ -3,10 +3,13 @@ from Pieces.Piece import Piece
 
 
 class Queen(Piece):
+    __slots__ = ()
+    image_paths = {Team.BLACK: "Images/bQ.png", Team.WHITE: "Images/wQ.png"}
+    # directions the queen moves in
+    options = [(1, 1), (1, -1), (-1, 1), (-1, -1), (0, 1), (0, -1), (1, 0), (-1, 0)]
 
     def __init__(self, team, row, col):
         super().__init__(team, row, col)
-        self.image_path = "Images/bQ.png" if self.team == Team.BLACK else "Images/wQ.png"
 
     def get_valid_moves(self, board, current_move=True):
         """
@@ -16,9 +19,8 @@ class Queen(Piece):
         :return: list of valid moves for current queen
         """
         valid_moves = []
-        options = [(1, 1), (1, -1), (-1, 1), (-1, -1), (0, 1), (0, -1), (1, 0), (-1, 0)]
 
-        for op in options:
+        for op in self.options:
             for i in range(1, 9):
                 row = self.row + op[0] * i
                 col = self.col + op[1] * i
@@ -3,10 +3,13 @@ from Pieces.Piece import Piece
 
 
 class Rook(Piece):
+    __slots__ = ('init_position',)
+    image_paths = {Team.BLACK: "Images/bR.png", Team.WHITE: "Images/wR.png"}
+    # directions the rook moves in
+    options = [(0, 1), (0, -1), (1, 0), (-1, 0)]
 
     def __init__(self, team, row, col, init_position=True):
         super().__init__(team, row, col)
-        self.image_path = "Images/bR.png" if self.team == Team.BLACK else "Images/wR.png"
         self.init_position = init_position
 
     def get_valid_moves(self, board, current_move=True):
@@ -17,9 +20,8 @@ class Rook(Piece):
         :return: list of valid moves for current rook
         """
         valid_moves = []
-        options = [(0, 1), (0, -1), (1, 0), (-1, 0)]
 
-        for op in options:
+        for op in self.options:
             for i in range(1, 9):
                 row = self.row + op[0] * i
                 col = self.col + op[1] * i
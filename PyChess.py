@@ -1,7 +1,9 @@
 import tkinter as tk
-from tkinter.messagebox import showinfo
+from tkinter.messagebox import showinfo, showerror
 from Board.Board import Board
+import queue
 import sys
+import threading
 import PIL
 from PIL import ImageTk, Image
 
@@ -11,6 +13,8 @@ SELECTED_COLOR = "red"
 VALID_MOVES_COLOR = "orange"
 GUI_SPACE_WIDTH = 80
 GUI_SPACE_HEIGHT = 80
+# how often (ms) the gui checks on a running AI search
+AI_POLL_MS = 100
 
 
 class ClickTracker:
@@ -36,9 +40,43 @@ class ClickTracker:
         self.valid_moves = []
 
 
+class AISearchThread(threading.Thread):
+
+    def __init__(self, board):
+        """
+        Runs Board.choose_AI_move off the Tk main thread. The gui polls nodes() while it runs and
+        reads the move from results once it's there - or the exception, if the search raised one.
+        :param board: Board to search, not to be changed until the search is done
+        """
+        super().__init__(daemon=True)
+        self.board = board
+        self.stop_event = threading.Event()
+        self.results = queue.Queue()
+        self.search = None
+
+    def run(self):
+        try:
+            self.results.put(self.board.choose_AI_move(stop_event=self.stop_event, on_search=self.set_search))
+        except Exception as e:
+            # put on the queue so the gui stops waiting for a move
+            self.results.put(e)
+
+    def set_search(self, search):
+        self.search = search
+
+    def nodes(self):
+        return self.search.nodes if self.search is not None else 0
+
+    def cancel(self):
+        """
+        Stops the search, the best move found so far is still played
+        """
+        self.stop_event.set()
+
+
 class PyChess(tk.Frame):
 
-    def __init__(self, master=None):
+    def __init__(self, master=None, ai_plays_both=False):
         super().__init__(master)
         self.blank_path = "Images/blank.png"
         self.master = master
@@ -48,11 +86,23 @@ class PyChess(tk.Frame):
         self.click_tracker = ClickTracker()
         self.board = Board()
         self.board_map = []
+        # image path -> PhotoImage, each image is decoded once
+        self.images = {}
+        # image path shown on each square, so only squares that change are redrawn
+        self.shown_paths = []
+        # (row, col) of squares colored for the selected piece and its moves
+        self.highlighted = []
+        # AISearchThread while the AI is thinking
+        self.ai_thread = None
+        self.ai_plays_both = ai_plays_both
         self.create_board_display()
 
         self.pack()
 
     def on_click(self, i, j):
+        # the board can't change under the AI search
+        if self.ai_thread is not None:
+            return
         space_is_empty = self.board.is_space_empty(i, j)
         team_on_space = self.board.team_on(i, j) if not space_is_empty else None
 
@@ -62,6 +112,7 @@ class PyChess(tk.Frame):
                 if self.board.team_turn() == team_on_space:
                     piece = self.board.get_board()[i][j]
                     self.board_map[i][j]['bg'] = SELECTED_COLOR
+                    self.highlighted.append((i, j))
                     self.click_tracker.update(i, j, piece, piece.get_valid_moves(self.board))
                     self.highlight_valid_moves(self.click_tracker.valid_moves)
         # piece is currently highlighted / clicked on
@@ -88,13 +139,48 @@ class PyChess(tk.Frame):
                 if self.draw:
                     showinfo("tk", f"The game ends in a draw!")
                 else:
-                    showinfo("tk", f"The {self.winner} wins!")
+                    showinfo("tk", f"The {self.winner.name.lower()} team wins!")
                 self.master.destroy()
 
     def let_AI_move(self):
+        """
+        Starts the AI search in a background thread, the move is made by poll_AI_move once it's found
+        """
+        if self.ai_thread is not None or self.game_over:
+            return
         print("Letting AI move...")
+        self.ai_thread = AISearchThread(self.board)
+        self.ai_thread.start()
+        self.thinking_label['text'] = "thinking..."
+        self.cancel_button['state'] = tk.NORMAL
+        self.after(AI_POLL_MS, self.poll_AI_move)
+
+    def cancel_AI_move(self):
+        if self.ai_thread is not None:
+            self.ai_thread.cancel()
+
+    def poll_AI_move(self):
+        """
+        Runs on the Tk event loop every AI_POLL_MS while the AI is thinking: shows the node count, then
+        makes the move once the search thread has one
+        """
+        try:
+            result = self.ai_thread.results.get_nowait()
+        except queue.Empty:
+            self.thinking_label['text'] = f"thinking... {self.ai_thread.nodes()} nodes"
+            self.after(AI_POLL_MS, self.poll_AI_move)
+            return
+        self.ai_thread = None
+        self.thinking_label['text'] = ""
+        self.cancel_button['state'] = tk.DISABLED
+        if isinstance(result, Exception):
+            # the board takes clicks again, the player can move or try the AI again
+            showerror("tk", f"The AI couldn't find a move: {result!r}")
+            return
+        best_move, _, _ = result
 
-        move_dict = self.board.let_AI_move()
+        move_dict = self.board.move_piece(best_move[0], best_move[1], True, True,
+                                          best_move[2] if len(best_move) > 2 else None)
         self.board = move_dict['board']
         self.game_over = move_dict['game_over']
         self.draw = move_dict['draw']
@@ -109,33 +195,44 @@ class PyChess(tk.Frame):
             if self.draw:
                 showinfo("tk", f"The game ends in a draw!")
             else:
-                showinfo("tk", f"The {self.winner} wins!")
+                showinfo("tk", f"The {self.winner.name.lower()} team wins!")
             self.master.destroy()
+        elif self.ai_plays_both:
+            self.after(1, self.let_AI_move)
 
     def highlight_valid_moves(self, moves):
         for move in moves:
             self.board_map[move[0]][move[1]]['bg'] = VALID_MOVES_COLOR
+            self.highlighted.append((move[0], move[1]))
 
     def reset_board_map_color(self):
-        rows = len(self.board.get_board())
-        cols = len(self.board.get_board()[0])
+        # only the highlighted squares have changed color
+        for i, j in self.highlighted:
+            color = BLACK_SPACE_COLOR if (i + j) % 2 == 1 else WHITE_SPACE_COLOR
+            self.board_map[i][j]['bg'] = color
+        self.highlighted = []
 
-        for i in range(rows):
-            for j in range(cols):
-                color = BLACK_SPACE_COLOR if (i + j) % 2 == 1 else WHITE_SPACE_COLOR
-                self.board_map[i][j]['bg'] = color
+    def image(self, path):
+        """
+        :return: PhotoImage of the file at path, loaded the first time it's asked for
+        """
+        img = self.images.get(path)
+        if img is None:
+            img = ImageTk.PhotoImage(PIL.Image.open(path))
+            self.images[path] = img
+        return img
 
-    def reset_board_map_images(self):
-        rows = len(self.board.get_board())
-        cols = len(self.board.get_board()[0])
+    def square_image_path(self, i, j):
+        return self.board.board[i][j].image_path if not self.board.is_space_empty(i, j) else self.blank_path
 
-        for i in range(rows):
-            for j in range(cols):
-                path = self.board.board[i][j].image_path if not self.board.is_space_empty(i, j) else self.blank_path
-                image = PIL.Image.open(path)
-                img = ImageTk.PhotoImage(image)
-                self.board_map[i][j]['image'] = img
-                self.board_map[i][j].image = img
+    def reset_board_map_images(self):
+        # only squares whose piece changed since the last redraw get a new image
+        for i, row in enumerate(self.shown_paths):
+            for j, shown in enumerate(row):
+                path = self.square_image_path(i, j)
+                if path != shown:
+                    self.board_map[i][j]['image'] = self.image(path)
+                    row[j] = path
 
     def create_board_display(self):
         rows = len(self.board.get_board())
@@ -147,20 +244,25 @@ class PyChess(tk.Frame):
             for j in range(cols):
                 row.append(None)
             self.board_map.append(row)
+            self.shown_paths.append([None] * cols)
 
         # create labels and store in data structure
         for i in range(rows):
             for j in range(cols):
                 color = BLACK_SPACE_COLOR if (i + j) % 2 == 1 else WHITE_SPACE_COLOR
-                path = self.board.board[i][j].image_path if not self.board.is_space_empty(i, j) else self.blank_path
-                image = PIL.Image.open(path)
-                img = ImageTk.PhotoImage(image)
-                label = tk.Label(self, image=img, bg=color, height=GUI_SPACE_HEIGHT, width=GUI_SPACE_WIDTH)
-                label.image = img
+                path = self.square_image_path(i, j)
+                label = tk.Label(self, image=self.image(path), bg=color, height=GUI_SPACE_HEIGHT, width=GUI_SPACE_WIDTH)
                 self.board_map[i][j] = label
+                self.shown_paths[i][j] = path
                 label.grid(row=i, column=j)
                 label.bind('<Button-1>', lambda e, x=i, y=j: self.on_click(x, y))
 
+        # AI search status and a button to play the best move found so far
+        self.thinking_label = tk.Label(self, text="", anchor=tk.W)
+        self.thinking_label.grid(row=rows, column=0, columnspan=cols - 2, sticky=tk.W)
+        self.cancel_button = tk.Button(self, text="Move now", state=tk.DISABLED, command=self.cancel_AI_move)
+        self.cancel_button.grid(row=rows, column=cols - 2, columnspan=2)
+
         # bind enter to let AI move
         self.bind("<Return>", lambda event: self.let_AI_move())
         self.focus_set()
@@ -172,18 +274,10 @@ class FullGUI(tk.Frame):
 
 def Run(ai=False):
     chess_root = tk.Tk()
-    app = PyChess(master=chess_root)
+    app = PyChess(master=chess_root, ai_plays_both=ai)
     if ai:
-        while True:
-            #try:
-            app.let_AI_move()
-            #except AttributeError:
-            #    print("having trouble with ai")
-            #    inp = input()
-            app.update_idletasks()
-            app.update()
-    else:
-        app.mainloop()
+        app.after(1, app.let_AI_move)
+    app.mainloop()
 
 
 if __name__ == "__main__":
@@ -1,7 +1,37 @@
+import asyncio
+import io
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
 import unittest
+import time
+from multiprocessing import shared_memory
 from Board.Board import Board
 from Pieces.Pawn import Pawn
 from Pieces.Queen import Queen
+from Pieces.King import King
+from Pieces.Rook import Rook
+from Pieces.Knight import Knight
+from Pieces.Bishop import Bishop
+from Pieces.Team import Team
+from Board.Bitboard import BitBoard
+from AI.TranspositionTable import TranspositionTable, EXACT, LOWER, table_bytes
+from AI.Search import Search, MATE, KNOWN_WIN
+from AI.MoveOrdering import MoveOrderer
+from AI.ParallelSearch import ParallelSearch
+from AI.LazySMP import LazySMP
+from Board.Perft import SUITE as PERFT_SUITE, run_suite
+from AI.Bench import BENCH, run_bench
+from AI.OpeningBook import OpeningBook, build_from_pgn, START_FEN
+from AI.Bitbases import Bitbases, generate_all, piece_codes, table_size, decode, WIN, DRAW, LOSS
+from Board.Epd import read_epd
+from Board.Pgn import read_pgn, replay_games, parse_san, move_to_san, PgnError
+from Engine.Uci import UciEngine, move_to_uci, parse_uci_move
+from Engine.Server import EngineServer, Session
 
 
 class TestPawn(unittest.TestCase):
@@ -287,5 +317,1030 @@ class TestPawn(unittest.TestCase):
 # class TestRook(unittest.TestCase):
 
 
+class TestBoard(unittest.TestCase):
+    """
+    Testing Board Class:
+     - make_move(move) / unmake_move(undo)
+       1 - every move from a few positions is taken back exactly (pieces, lists, clocks and turn)
+       2 - castling, en passant and promotion are made and taken back
+     - zobrist_key
+       1 - same position reached by different move orders has the same key, and BitBoard agrees
+    """
+
+    @staticmethod
+    def snapshot(board):
+        squares = []
+        for row in board.board:
+            for pc in row:
+                if pc:
+                    squares.append((str(pc), pc.team, pc.row, pc.col, getattr(pc, 'init_position', None),
+                                    getattr(pc, 'just_moved_two', None)))
+                else:
+                    squares.append(None)
+        return (squares, [id(pc) for pc in board.white_pieces], [id(pc) for pc in board.black_pieces],
+                board.moves_since_taken, board.turn)
+
+    def test_make_unmake_move_1(self):
+        """
+        make and unmake every move of a short game and check nothing changed
+        """
+        board = Board(prev_states={})
+        game = [((6, 4), (4, 4)), ((1, 3), (3, 3)), ((4, 4), (3, 3)), ((0, 3), (3, 3)), ((7, 6), (5, 5))]
+        for move in game:
+            for team_move in board.get_successors(board.team_turn() == Team.WHITE):
+                before = self.snapshot(board)
+                undo = board.make_move(team_move)
+                board.unmake_move(undo)
+                self.assertEqual(before, self.snapshot(board))
+            board = board.move_piece(move[0], move[1])['board']
+
+    def test_make_unmake_move_2(self):
+        """
+        castle king side, capture en passant and promote, then take them all back
+        """
+        board = Board(prev_states={})
+        board.board[7][5] = False
+        board.board[7][6] = False
+        board.board[1][0] = False
+        board.update_teams_pieces()
+        white_pawn = board.board[6][0]
+        white_pawn.row, white_pawn.col = 1, 0
+        board.board[1][0], board.board[6][0] = white_pawn, False
+        before = self.snapshot(board)
+
+        # castle - king onto the rook like the gui
+        castle = board.make_move(((7, 4), (7, 7)))
+        self.assertIsInstance(board.board[7][6], King)
+        self.assertIsInstance(board.board[7][5], Rook)
+        self.assertFalse(board.board[7][7])
+
+        # black pawn two forward, white can't take it en passant from there so just promote
+        push = board.make_move(((1, 4), (3, 4)))
+        promote = board.make_move(((1, 0), (0, 1)))
+        self.assertIsInstance(board.board[0][1], Queen)
+        self.assertIn(board.board[0][1], board.white_pieces)
+        self.assertEqual(board.moves_since_taken, 0)
+
+        for undo in [promote, push, castle]:
+            board.unmake_move(undo)
+        self.assertEqual(before, self.snapshot(board))
+
+    def test_zobrist_key(self):
+        """
+        knights out and back in a different order give the start position back (and an equal Board)
+        """
+        start = Board()
+        board = Board()
+        for move in [((7, 6), (5, 5)), ((0, 1), (2, 2)), ((7, 1), (5, 2)), ((0, 6), (2, 5)),
+                     ((5, 2), (7, 1)), ((2, 5), (0, 6)), ((5, 5), (7, 6)), ((2, 2), (0, 1))]:
+            board.make_move(move)
+            self.assertEqual(board.zobrist_key, board.compute_zobrist_key())
+            self.assertEqual(board.zobrist_key, BitBoard.from_board(board).zobrist_key)
+        self.assertEqual(start.zobrist_key, board.zobrist_key)
+        self.assertEqual(start, board)
+        self.assertEqual(hash(start), hash(board))
+
+        # en passant square and side to move change the key
+        board.make_move(((6, 4), (4, 4)))
+        other = Board()
+        other.make_move(((6, 4), (5, 4)))
+        other.make_move(((1, 0), (2, 0)))
+        other.make_move(((5, 4), (4, 4)))
+        other.make_move(((2, 0), (1, 0)))
+        self.assertNotEqual(board, other)
+
+
+class TestBitBoard(unittest.TestCase):
+    """
+    Testing BitBoard Class:
+     - legal_moves() agrees with the Board / Piece move generation
+     - from_board(board) / to_board() round trip
+    """
+
+    game = [((6, 4), (4, 4)), ((1, 3), (3, 3)), ((4, 4), (3, 3)), ((0, 3), (3, 3)), ((7, 6), (5, 5)),
+            ((1, 2), (3, 2)), ((7, 5), (4, 2)), ((3, 3), (0, 3)), ((7, 4), (7, 7)), ((1, 4), (3, 4))]
+
+    def test_legal_moves(self):
+        """
+        same moves as Board.get_successors all through a game with captures and castling
+        """
+        board = Board(prev_states={})
+        for move in self.game:
+            white = board.team_turn() == Team.WHITE
+            position = BitBoard.from_board(board)
+            bitboard_moves = set(position.board_move(m)[:2] for m in position.legal_moves())
+            self.assertEqual(set(board.get_successors(white)), bitboard_moves)
+            board = board.move_piece(move[0], move[1])['board']
+
+    def test_round_trip(self):
+        """
+        BitBoard -> Board -> BitBoard gives back the same position
+        """
+        board = Board(prev_states={})
+        for move in self.game:
+            board = board.move_piece(move[0], move[1])['board']
+            position = BitBoard.from_board(board)
+            self.assertEqual(vars(BitBoard.from_board(position.to_board())), vars(position))
+
+
+class TestTranspositionTable(unittest.TestCase):
+    """
+    Testing TranspositionTable Class:
+     - store(...) / probe(key) round trip and counters
+     - replacement keeps entries from the current search over older ones
+     - clear() empties a table kept in shared memory
+    """
+
+    def test_store_probe(self):
+        tt = TranspositionTable(1)
+        self.assertIsNone(tt.probe(12345))
+        tt.store(12345, 4, LOWER, -MATE + 3, 1076)
+        self.assertEqual(tt.probe(12345), (4, LOWER, -MATE + 3, 1076))
+        # storing again without a move keeps the old best move
+        tt.store(12345, 5, EXACT, 7, 0)
+        self.assertEqual(tt.probe(12345), (5, EXACT, 7, 1076))
+        self.assertEqual((tt.hits, tt.misses), (2, 1))
+
+    def test_replacement(self):
+        tt = TranspositionTable(1)
+        # three keys in the same two entry bucket
+        keys = [7, 7 + tt.buckets, 7 + 2 * tt.buckets]
+        tt.store(keys[0], 9, EXACT, 1, 0)
+        tt.new_search()
+        tt.store(keys[1], 1, EXACT, 2, 0)
+        tt.store(keys[2], 1, EXACT, 3, 0)
+        # the deep entry from the old search was replaced, not the shallow one from this search
+        self.assertIsNone(tt.probe(keys[0]))
+        self.assertEqual(tt.collisions, 1)
+        self.assertEqual(tt.probe(keys[1])[2], 2)
+        self.assertEqual(tt.probe(keys[2])[2], 3)
+
+    def test_clear(self):
+        memory = shared_memory.SharedMemory(create=True, size=table_bytes(2))
+        try:
+            tt = TranspositionTable(2, memory.buf)
+            tt.store(12345, 4, EXACT, 7, 1076)
+            tt.new_search()
+            tt.clear()
+            self.assertIsNone(tt.probe(12345))
+            self.assertEqual((tt.age, tt.hits, tt.misses), (0, 0, 1))
+            self.assertEqual(bytes(memory.buf[:table_bytes(2)]).count(0), table_bytes(2))
+            tt.release()
+        finally:
+            memory.close()
+            memory.unlink()
+
+
+class TestSearch(unittest.TestCase):
+    """
+    Testing Search Class:
+     - iterative_deepening(max_depth, movetime_ms, max_nodes)
+       1 - finds a back rank mate in one
+       2 - stays inside its node budget and still returns a move
+     - Board.choose_AI_move(stop_event, on_search)
+       1 - stopped from another thread, still gives a legal move
+    """
+
+    @staticmethod
+    def back_rank_board():
+        grid = [[False for _ in range(8)] for _ in range(8)]
+        pieces = [King(Team.BLACK, 0, 6, False), Pawn(Team.BLACK, 1, 5, False), Pawn(Team.BLACK, 1, 6, False),
+                  Pawn(Team.BLACK, 1, 7, False), King(Team.WHITE, 7, 6, False), Rook(Team.WHITE, 7, 0, False)]
+        for pc in pieces:
+            grid[pc.row][pc.col] = pc
+        return Board(grid, [pc for pc in pieces if pc.team == Team.WHITE],
+                     [pc for pc in pieces if pc.team == Team.BLACK])
+
+    def test_iterative_deepening_1(self):
+        board = self.back_rank_board()
+        position = BitBoard.from_board(board)
+        move, value, depth = Search(position).iterative_deepening(max_depth=3)
+        self.assertEqual(position.board_move(move), ((7, 0), (0, 0)))
+        self.assertEqual(value, MATE - 1)
+
+    def test_iterative_deepening_2(self):
+        position = BitBoard.from_board(Board())
+        search = Search(position)
+        move, _, depth = search.iterative_deepening(max_depth=20, max_nodes=500)
+        self.assertIn(move, position.legal_moves())
+        self.assertLessEqual(search.nodes, 500)
+        self.assertLess(depth, 20)
+        # the position is put back the way it was after the search is stopped
+        self.assertEqual(vars(position), vars(BitBoard.from_board(Board())))
+
+    def test_choose_AI_move(self):
+        board = Board()
+        stop_event = threading.Event()
+        searches = []
+
+        def started(search):
+            searches.append(search)
+            threading.Timer(0.2, stop_event.set).start()
+
+        move, depth, nodes = board.choose_AI_move(max_depth=20, stop_event=stop_event, on_search=started,
+                                                  use_book=False)
+        self.assertIn(move, board.legal_moves())
+        self.assertLess(depth, 20)
+        self.assertEqual(nodes, searches[0].nodes)
+
+
+class TestMoveOrderer(unittest.TestCase):
+    """
+    Testing MoveOrderer Class:
+     - order(position, moves, hash_move, ply) puts the hash move, then captures, then killers first
+     - record_cutoff(...) counts first move cutoffs
+    """
+
+    def test_order(self):
+        board = Board()
+        board = board.move_piece((6, 4), (4, 4))['board']
+        board = board.move_piece((1, 3), (3, 3))['board']
+        position = BitBoard.from_board(board)
+        moves = position.legal_moves()
+        hash_move = position.move_from_board_move(((7, 6), (5, 5)))
+        killer = position.move_from_board_move(((6, 0), (5, 0)))
+        capture = position.move_from_board_move(((4, 4), (3, 3)))
+
+        orderer = MoveOrderer()
+        orderer.record_cutoff(position, killer, 3, 2, 4)
+        ordered = list(orderer.order(position, moves, hash_move, 2))
+        self.assertEqual(ordered[:3], [hash_move, capture, killer])
+        self.assertEqual(sorted(ordered), sorted(moves))
+        self.assertEqual(orderer.first_move_cutoff_rate(), 0.0)
+        orderer.record_cutoff(position, capture, 0, 2, 4)
+        self.assertEqual(orderer.first_move_cutoff_rate(), 0.5)
+
+
+class TestQuiescence(unittest.TestCase):
+    """
+    Testing Search.quiescence:
+     - a depth 1 search without quiescence takes a defended pawn with the queen, with quiescence it doesn't
+    """
+
+    def test_quiescence(self):
+        grid = [[False for _ in range(8)] for _ in range(8)]
+        pieces = [King(Team.BLACK, 0, 7, False), Pawn(Team.BLACK, 3, 3, False), Pawn(Team.BLACK, 2, 4, False),
+                  King(Team.WHITE, 7, 7, False), Queen(Team.WHITE, 7, 3)]
+        for pc in pieces:
+            grid[pc.row][pc.col] = pc
+        board = Board(grid, [pc for pc in pieces if pc.team == Team.WHITE],
+                      [pc for pc in pieces if pc.team == Team.BLACK])
+        position = BitBoard.from_board(board)
+        queen_takes = position.move_from_board_move(((7, 3), (3, 3)))
+
+        search = Search(position, quiescence_depth=0)
+        self.assertEqual(search.max_value(True, 1, float('-inf'), float('inf'))[0], queen_takes)
+        self.assertEqual(search.qnodes, 0)
+
+        search = Search(position)
+        move, value, _, _ = search.max_value(True, 1, float('-inf'), float('inf'))
+        self.assertNotEqual(move, queen_takes)
+        self.assertGreater(search.qnodes, 0)
+
+
+class TestLegalMoves(unittest.TestCase):
+    """
+    Testing Board.legal_moves / BitBoard.legal_moves (check masks and pins):
+     - a pinned knight can't move
+     - en passant that uncovers the king along its row isn't allowed
+     - in check only moves that take the checker or block it are allowed
+    """
+
+    @staticmethod
+    def make_board(pieces):
+        grid = [[False for _ in range(8)] for _ in range(8)]
+        for pc in pieces:
+            grid[pc.row][pc.col] = pc
+        return Board(grid, [pc for pc in pieces if pc.team == Team.WHITE],
+                     [pc for pc in pieces if pc.team == Team.BLACK])
+
+    def assert_legal_moves(self, board, expected):
+        self.assertEqual(set(move[:2] for move in board.legal_moves()), expected)
+        position = BitBoard.from_board(board)
+        self.assertEqual(set(position.board_move(move)[:2] for move in position.legal_moves()), expected)
+
+    def test_pins(self):
+        board = self.make_board([King(Team.WHITE, 3, 0, False), Pawn(Team.WHITE, 3, 1, False),
+                                 Knight(Team.WHITE, 4, 1), Pawn(Team.BLACK, 3, 2, False, True),
+                                 Bishop(Team.BLACK, 6, 3), Rook(Team.BLACK, 3, 7, False),
+                                 King(Team.BLACK, 0, 4, False)])
+        # the knight is pinned by the bishop and the pawn can't take en passant because of the rook
+        self.assert_legal_moves(board, {((3, 0), (2, 0)), ((3, 0), (2, 1)), ((3, 0), (4, 0)),
+                                        ((3, 1), (2, 1))})
+
+    def test_check(self):
+        board = self.make_board([King(Team.WHITE, 7, 4, False), Rook(Team.WHITE, 6, 0, False),
+                                 Knight(Team.WHITE, 5, 2), Rook(Team.BLACK, 4, 4, False),
+                                 King(Team.BLACK, 0, 4, False)])
+        self.assert_legal_moves(board, {((7, 4), (7, 3)), ((7, 4), (7, 5)), ((7, 4), (6, 3)), ((7, 4), (6, 5)),
+                                        ((5, 2), (4, 4)), ((5, 2), (6, 4)), ((6, 0), (6, 4))})
+
+
+class TestIsSquareAttacked(unittest.TestCase):
+    """
+    Testing Board.is_square_attacked(square, by_team):
+     - agrees with the BitBoard on every square through a game
+     - move_piece ends the game on checkmate with the right winner
+    """
+
+    def test_is_square_attacked(self):
+        board = Board(prev_states={})
+        for move in TestBitBoard.game:
+            board = board.move_piece(move[0], move[1])['board']
+            position = BitBoard.from_board(board)
+            for team in (Team.WHITE, Team.BLACK):
+                for row in range(8):
+                    for col in range(8):
+                        self.assertEqual(board.is_square_attacked((row, col), team),
+                                         position.is_square_attacked(row * 8 + col, team.value))
+
+    def test_checkmate(self):
+        board = TestSearch.back_rank_board()
+        self.assertFalse(board.in_check(Team.BLACK))
+        move_dict = board.move_piece((7, 0), (0, 0), True, True)
+        self.assertTrue(move_dict['board'].in_check(Team.BLACK))
+        self.assertTrue(move_dict['game_over'])
+        self.assertFalse(move_dict['draw'])
+        self.assertEqual(move_dict['winner'], Team.WHITE)
+
+
+class TestParallelSearch(unittest.TestCase):
+    """
+    Testing ParallelSearch Class:
+     - BitBoard.serialize / deserialize round trip
+     - iterative_deepening(max_depth) with 2 workers finds the back rank mate
+     - the spawned worker pool is kept between the AI's moves
+    """
+
+    def test_serialize(self):
+        board = Board(prev_states={})
+        for move in TestBitBoard.game:
+            board = board.move_piece(move[0], move[1])['board']
+            position = BitBoard.from_board(board)
+            self.assertEqual(vars(BitBoard.deserialize(position.serialize())), vars(position))
+
+    def test_iterative_deepening(self):
+        position = BitBoard.from_board(TestSearch.back_rank_board())
+        with ParallelSearch(position, workers=2) as search:
+            move, value, depth = search.iterative_deepening(max_depth=3)
+        self.assertEqual(position.board_move(move), ((7, 0), (0, 0)))
+        self.assertEqual(value, MATE - 1)
+        self.assertGreater(search.nodes, 0)
+
+    def test_reused(self):
+        board = Board()
+        search = board.get_parallel_search(2)
+        self.assertEqual(search.context.get_start_method(), 'spawn')
+        self.assertIs(board.copy_board_object().get_parallel_search(), search)
+        try:
+            for move_number in range(2):
+                move, depth, _ = board.choose_AI_move(max_depth=2, workers=2, use_book=False)
+                self.assertEqual(depth, 2)
+                board = board.move_piece(move[0], move[1])['board']
+            self.assertIs(board.get_parallel_search(), search)
+            self.assertIsNot(board.get_parallel_search(3), search)
+        finally:
+            board.get_parallel_search().close()
+
+
+class TestLazySMP(unittest.TestCase):
+    """
+    Testing LazySMP Class and the shared transposition table:
+     - a table made on another table's buffer sees its entries, a torn entry is a miss
+     - iterative_deepening(max_depth) with a helper finds the back rank mate
+     - the helpers and table are kept between searches, which don't wait for the helpers
+    """
+
+    def test_shared_buffer(self):
+        buffer = bytearray(table_bytes(1))
+        tt = TranspositionTable(1, buffer)
+        other = TranspositionTable(1, buffer)
+        tt.store(0x1234, 3, EXACT, 17, 42)
+        self.assertEqual(other.probe(0x1234), (3, EXACT, 17, 42))
+        # another process half way through writing the entry
+        slot = (0x1234 & tt.mask) * 4
+        tt.table[slot + 1] ^= 1
+        self.assertIsNone(other.probe(0x1234))
+
+    def test_iterative_deepening(self):
+        position = BitBoard.from_board(TestSearch.back_rank_board())
+        with LazySMP(position, helpers=1) as search:
+            move, value, depth = search.iterative_deepening(max_depth=3)
+        self.assertEqual(position.board_move(move), ((7, 0), (0, 0)))
+        self.assertEqual(value, MATE - 1)
+
+    def test_reused(self):
+        board = Board()
+        search = board.get_lazy_smp(2)
+        processes = list(search.processes)
+        self.assertIs(board.copy_board_object().get_lazy_smp(), search)
+        for move_number in range(2):
+            start = time.perf_counter()
+            move, depth, _ = board.choose_AI_move(movetime_ms=200, max_depth=64, workers=3, lazy_smp=True,
+                                                  use_book=False)
+            # the helpers are told to stop, not waited for
+            self.assertLess(time.perf_counter() - start, 0.2 + 0.15)
+            self.assertGreater(depth, 0)
+            board = board.move_piece(move[0], move[1])['board']
+        self.assertIs(board.get_lazy_smp(), search)
+        self.assertEqual(search.processes, processes)
+        self.assertTrue(all(process.is_alive() for process in processes))
+        self.assertIsNot(board.get_lazy_smp(1), search)
+        board.get_lazy_smp().close()
+
+
+class TestEvaluation(unittest.TestCase):
+    """
+    Testing BitBoard.evaluate and the incremental evaluation:
+     - the start position is level, a centralised knight scores better than one on the rim
+     - Board.get_utility is the same evaluation, from either team's point of view
+     - mg / eg / phase kept by make_move / unmake_move match a position built from scratch
+    """
+
+    def test_evaluate(self):
+        position = BitBoard.from_board(Board())
+        self.assertEqual(position.evaluate(), 0)
+        center = position.copy()
+        center.make_move(position.move_from_board_move(((7, 6), (5, 5))))
+        rim = position.copy()
+        rim.make_move(position.move_from_board_move(((7, 6), (5, 7))))
+        # black to move, so lower is better for white
+        self.assertLess(center.evaluate(), rim.evaluate())
+
+    def test_get_utility(self):
+        board = Board()
+        self.assertEqual(board.get_utility(True), 0)
+        board = board.move_piece((7, 6), (5, 5))['board']
+        value = BitBoard.from_board(board).evaluate()
+        self.assertNotEqual(value, 0)
+        self.assertEqual(board.get_utility(False), value)
+        self.assertEqual(board.get_utility(True), -value)
+
+    def test_incremental(self):
+        board = Board(prev_states={})
+        position = BitBoard.from_board(board)
+        undos = []
+        for move in TestBitBoard.game:
+            undos.append(position.make_move(position.move_from_board_move(move)))
+            fresh = BitBoard.deserialize(position.serialize())
+            self.assertEqual((position.mg, position.eg, position.phase), (fresh.mg, fresh.eg, fresh.phase))
+        for undo in reversed(undos):
+            position.unmake_move(undo)
+        self.assertEqual(vars(position), vars(BitBoard.from_board(board)))
+
+
+class TestPieceSlots(unittest.TestCase):
+    """
+    Testing the compact pieces:
+     - pieces have no __dict__, per kind data lives on the class
+     - copy_board_object copies the pieces and keeps the zobrist key
+    """
+
+    def test_slots(self):
+        board = Board()
+        for pc in board.white_pieces + board.black_pieces:
+            self.assertFalse(hasattr(pc, '__dict__'))
+        king = board.get_board()[7][4]
+        self.assertTrue(king.is_king)
+        self.assertIs(king.move_options, board.get_board()[0][4].move_options)
+        self.assertEqual(king.image_path, "Images/wK.png")
+        self.assertEqual(board.get_board()[1][0].image_path, "Images/bP.png")
+
+    def test_copy(self):
+        board = Board()
+        board = board.move_piece((6, 4), (4, 4))['board']
+        copy = board.copy_board_object()
+        self.assertEqual(copy.zobrist_key, copy.compute_zobrist_key())
+        self.assertEqual(copy.zobrist_key, board.zobrist_key)
+        self.assertIsNot(copy.get_board()[4][4], board.get_board()[4][4])
+        self.assertTrue(copy.get_board()[4][4].just_moved_two)
+
+
+class TestPerft(unittest.TestCase):
+    """
+    Testing perft:
+     - Board.perft with both move generators, bulk / not bulk, hashed, on the start position
+     - perft_divide adds up to perft
+     - the suite runner counts a wrong expected count as a failure
+    """
+
+    def test_perft(self):
+        board = Board()
+        for bitboard in (True, False):
+            self.assertEqual(board.perft(3, bitboard=bitboard), 8902)
+            self.assertEqual(board.perft(2, bulk=False, hashed=True, bitboard=bitboard), 400)
+
+    def test_perft_divide(self):
+        board = BitBoard.from_fen(PERFT_SUITE[3][1]).to_board()
+        divide = board.perft_divide(2)
+        self.assertEqual(divide, board.perft_divide(2, bitboard=False))
+        self.assertEqual(sum(divide.values()), 264)
+        # white is in check, the king stepping to h1 is one of the 6 moves
+        self.assertEqual(divide[((7, 6), (7, 7))], 46)
+
+    def test_run_suite(self):
+        out = io.StringIO()
+        suite = [(name, fen, counts[:2]) for name, fen, counts in PERFT_SUITE[:2]]
+        self.assertEqual(run_suite(2, suite=suite, out=out), 0)
+        suite[1] = (suite[1][0], suite[1][1], [48, 2038])
+        self.assertEqual(run_suite(2, suite=suite, out=out), 1)
+        self.assertIn('WRONG', out.getvalue())
+
+
+class TestFen(unittest.TestCase):
+    """
+    Testing Board.from_fen / to_fen and EPD reading:
+     - castling rights, en passant, half move clock and side to move are restored and written back
+     - the start position matches the initial board
+     - EPD lines are read with their operations
+    """
+
+    def test_from_fen(self):
+        board = Board.from_fen("r3k2r/8/8/3pP3/8/8/8/R3K2R w Kq d6 5 20")
+        self.assertEqual(board.team_turn(), Team.WHITE)
+        self.assertEqual(board.moves_since_taken, 5)
+        self.assertTrue(board.get_board()[7][4].init_position)
+        self.assertTrue(board.get_board()[7][7].init_position)
+        self.assertFalse(board.get_board()[7][0].init_position)
+        self.assertFalse(board.get_board()[0][7].init_position)
+        self.assertTrue(board.get_board()[3][3].just_moved_two)
+        self.assertIn(((3, 4), (2, 3)), board.legal_moves())
+        self.assertEqual(board.to_fen(20), "r3k2r/8/8/3pP3/8/8/8/R3K2R w Kq d6 5 20")
+
+    def test_to_fen(self):
+        board = Board()
+        self.assertEqual(board.to_fen(), "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1")
+        self.assertEqual(Board.from_fen(board.to_fen()).zobrist_key, board.zobrist_key)
+        board = board.move_piece((6, 4), (4, 4))['board']
+        # moves_since_taken is only reset by captures
+        self.assertEqual(board.to_fen(), "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 1 1")
+        with self.assertRaises(ValueError):
+            Board.from_fen("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP w KQkq - 0 1")
+
+    def test_read_epd(self):
+        lines = ['# comment', '',
+                 'r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - bm Qxf7#; id "mate; in one";',
+                 '8/8/8/8/8/8/8/K6k b - - hmvc 12;']
+        positions = list(read_epd(lines))
+        self.assertEqual(len(positions), 2)
+        position, operations = positions[0]
+        self.assertEqual(operations, {'bm': 'Qxf7#', 'id': 'mate; in one'})
+        self.assertEqual(position.castling, 15)
+        position, operations = positions[1]
+        self.assertEqual(position.moves_since_taken, 12)
+        self.assertEqual(position.to_fen(), "8/8/8/8/8/8/8/K6k b - - 12 1")
+        board, _ = next(read_epd(lines[2:], board=True))
+        self.assertIsInstance(board, Board)
+
+
+class TestPgn(unittest.TestCase):
+    """
+    Testing Board/Pgn.py:
+     - read_pgn replays games with castling, en passant and promotion, skipping comments, variations and NAGs
+     - replay_games reports the first illegal move
+     - move_to_san / parse_san disambiguation
+    """
+
+    pgn = '''[Event "italian"]
+[Result "1-0"]
+
+1. e4 e5 2. Nf3 {a comment
+over two lines} Nc6 (2... d6 3. d4) 3. Bc4 Bc5 4. O-O Nf6 5. Re1 O-O 6. c3 d6
+7. d4 exd4 8. cxd4 Bb6 $1 9. Nc3 ; the rest of the line is a comment 9... Bg4
+1-0
+
+[Event "en passant"]
+[FEN "4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1"]
+
+1. exd6 Kf7 2. d7 Ke7 3. d8=N *
+'''
+
+    def test_read_pgn(self):
+        events = list(read_pgn(self.pgn.splitlines(True)))
+        self.assertEqual(len(events), 22)
+        headers, board, move = events[6]
+        self.assertEqual(headers['Event'], 'italian')
+        self.assertEqual(move, ((7, 4), (7, 7)))
+        headers, board, move = events[-1]
+        self.assertEqual(headers['FEN'], "4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1")
+        self.assertEqual(move, ((1, 3), (0, 3), Knight))
+        self.assertEqual(events[-5][2], ((3, 4), (2, 3)))
+        # with bulk the same board is moved along in place
+        boards = set(id(board) for _, board, _ in read_pgn(self.pgn.splitlines(True), bulk=True))
+        self.assertEqual(len(boards), 2)
+
+    def test_replay_games(self):
+        results = list(replay_games(self.pgn.splitlines(True)))
+        self.assertEqual([plies for _, _, plies, _ in results], [17, 5])
+        self.assertEqual(results[0][1].to_fen().split()[0], "r1bq1rk1/ppp2ppp/1bnp1n2/8/2BPP3/2N2N2/PP3PPP/R1BQR1K1")
+        headers, board, plies, error = next(replay_games(['1. e4 e5 2. Ke3 *']))
+        self.assertEqual(plies, 2)
+        self.assertIsInstance(error, PgnError)
+
+    def test_san(self):
+        board = Board.from_fen("4k3/8/8/8/8/8/8/1N2KN2 w - - 0 1")
+        self.assertEqual(move_to_san(board, ((7, 1), (6, 3))), 'Nbd2')
+        self.assertEqual(parse_san(board, 'Nfd2'), ((7, 5), (6, 3)))
+        with self.assertRaises(PgnError):
+            parse_san(board, 'Nd2')
+        board = TestSearch.back_rank_board()
+        self.assertEqual(move_to_san(board, ((7, 0), (0, 0))), 'Ra8#')
+
+
+class TestUci(unittest.TestCase):
+    """
+    Testing Engine/Uci.py:
+     - uci / isready / position / go handshake gives info lines and a bestmove
+     - go infinite holds bestmove back until stop
+     - run() over a real stdin pipe with Threads > 1 (LazySMP helpers) answers go and quits cleanly
+     - with Threads > 1 the LazySMP's shared table is the engine's, kept between goes, and go movetime keeps to time
+     - long algebraic moves to and from move ints
+    """
+
+    def test_handshake_and_search(self):
+        out = io.StringIO()
+        engine = UciEngine(out)
+        for line in ['uci', 'isready', 'position startpos moves e2e4 e7e5', 'go depth 2']:
+            engine.handle(line)
+        engine.thread.join()
+        lines = out.getvalue().splitlines()
+        self.assertIn('uciok', lines)
+        self.assertIn('readyok', lines)
+        self.assertTrue(any(line.startswith('info depth 2 ') and ' pv ' in line for line in lines))
+        self.assertTrue(lines[-1].startswith('bestmove '))
+
+    def test_stop_infinite(self):
+        out = io.StringIO()
+        engine = UciEngine(out)
+        engine.handle('position fen 6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1')
+        engine.handle('go infinite')
+        deadline = time.time() + 10
+        while 'info' not in out.getvalue() and time.time() < deadline:
+            time.sleep(0.01)
+        # the search is done but go infinite holds bestmove back until stop
+        self.assertNotIn('bestmove', out.getvalue())
+        engine.handle('stop')
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[-1], 'bestmove a1a8')
+        self.assertIn('score mate 1', lines[0])
+
+    def test_threads_over_pipe(self):
+        # helpers started while the main thread is blocked reading stdin
+        engine = subprocess.Popen([sys.executable, '-m', 'Engine'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                  stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                  universal_newlines=True, start_new_session=True)
+        lines = []
+        reader = threading.Thread(target=lambda: lines.extend(engine.stdout), daemon=True)
+        reader.start()
+        try:
+            engine.stdin.write('setoption name Threads value 2\nposition startpos\ngo depth 3\n')
+            engine.stdin.flush()
+            deadline = time.time() + 30
+            while not any(line.startswith('bestmove') for line in lines) and time.time() < deadline:
+                time.sleep(0.05)
+            self.assertTrue(any(line.startswith('bestmove') for line in lines))
+            engine.stdin.write('quit\n')
+            engine.stdin.flush()
+            self.assertEqual(engine.wait(10), 0)
+            self.assertNotIn('leaked', engine.stderr.read())
+        finally:
+            if engine.poll() is None:
+                # the helper processes too, they'd keep the pipes open
+                os.killpg(engine.pid, signal.SIGKILL)
+                engine.wait()
+            reader.join(10)
+            engine.stdin.close()
+            engine.stdout.close()
+            engine.stderr.close()
+
+    def test_threads_movetime(self):
+        out = io.StringIO()
+        engine = UciEngine(out)
+        try:
+            engine.handle('setoption name Threads value 3')
+            smp = engine.smp
+            self.assertIs(engine.tt, smp.tt)
+            for moves in ('', ' moves e2e4'):
+                engine.handle('position startpos' + moves)
+                start = time.perf_counter()
+                engine.handle('go movetime 300')
+                engine.thread.join()
+                self.assertLess(time.perf_counter() - start, 0.45)
+                self.assertTrue(out.getvalue().splitlines()[-1].startswith('bestmove '))
+            self.assertIs(engine.smp, smp)
+            self.assertTrue(all(process.is_alive() for process in smp.processes))
+            engine.handle('ucinewgame')
+            self.assertIs(engine.tt, smp.tt)
+        finally:
+            engine.close()
+
+    def test_moves(self):
+        position = BitBoard.from_fen('r3k3/1P6/8/8/8/8/8/4K2R w K - 0 1')
+        self.assertEqual(move_to_uci(parse_uci_move(position, 'e1g1')), 'e1g1')
+        self.assertEqual(move_to_uci(parse_uci_move(position, 'b7a8n')), 'b7a8n')
+        self.assertRaises(ValueError, parse_uci_move, position, 'e1c1')
+
+
+class TestEngineServer(unittest.TestCase):
+    """
+    Testing Engine/Server.py:
+     - new_game / move / think / close_game requests get replies with the request's id, a bad move an error
+     - Session.status() sees checkmate and the history is bounded
+    """
+
+    def test_requests(self):
+        async def play(server):
+            game = await server.handle_request(b'{"id": 1, "type": "new_game"}')
+            session = game['session']
+            moved = await server.handle_request(json.dumps({'id': 2, 'type': 'move', 'session': session,
+                                                            'move': 'e2e4'}))
+            thought = await server.handle_request(json.dumps({'id': 3, 'type': 'think', 'session': session,
+                                                              'depth': 2, 'deadline_ms': 10000, 'play': True}))
+            bad = await server.handle_request(json.dumps({'id': 4, 'type': 'move', 'session': session,
+                                                          'move': 'e2e4'}))
+            closed = await server.handle_request(json.dumps({'id': 5, 'type': 'close_game', 'session': session}))
+            return game, moved, thought, bad, closed
+
+        with EngineServer(workers=1, tt_mb=1) as server:
+            game, moved, thought, bad, closed = asyncio.run(play(server))
+        self.assertTrue(game['ok'])
+        self.assertEqual(moved['status'], 'playing')
+        self.assertEqual((thought['id'], thought['ok'], thought['depth']), (3, True, 2))
+        self.assertIn(' b KQkq', moved['fen'])
+        self.assertIn(' w ', thought['fen'])
+        self.assertEqual((bad['id'], bad['ok']), (4, False))
+        self.assertTrue(closed['ok'])
+        self.assertEqual(server.sessions, {})
+
+    def test_session_status(self):
+        session = Session(BitBoard.from_fen('6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1'), max_history=4)
+        session.play(parse_uci_move(session.position, 'a1a8'))
+        self.assertEqual(session.status(), 'checkmate')
+        for _ in range(10):
+            session.history.append(0)
+        self.assertEqual(len(session.history), 4)
+
+
+class TestSelectiveSearch(unittest.TestCase):
+    """
+    Testing null move pruning, late move reductions and futility pruning:
+     - BitBoard.make_null_move / unmake_null_move put the position back
+     - with every technique switched off none of the counters move
+     - the techniques search fewer nodes and still find the mate in one
+    """
+
+    def test_null_move(self):
+        position = BitBoard.from_fen('rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq e6 0 2')
+        before = vars(position.copy())
+        undo = position.make_null_move()
+        self.assertEqual(position.turn, before['turn'] ^ 1)
+        self.assertEqual(position.ep_square, -1)
+        self.assertEqual(position.zobrist_key, position.compute_zobrist_key())
+        position.unmake_null_move(undo)
+        self.assertEqual(vars(position), before)
+
+    def test_switches(self):
+        positions = BENCH[:3]
+        _, off_nodes, _, counters = run_bench(3, positions, null_move=False, late_move_reductions=False,
+                                              futility_pruning=False)
+        for counter in ('null_move_cutoffs', 'lmr_reductions', 'futility_pruned'):
+            self.assertEqual(counters[counter], 0)
+        _, on_nodes, _, counters = run_bench(3, positions)
+        self.assertLess(on_nodes, off_nodes)
+        self.assertGreater(counters['futility_pruned'], 0)
+
+    def test_mate(self):
+        position = BitBoard.from_fen('6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1')
+        move, value, _ = Search(position).iterative_deepening(max_depth=4)
+        self.assertEqual(value, MATE - 1)
+
+
+class TestPrincipalVariation(unittest.TestCase):
+    """
+    Testing principal variation search and aspiration windows:
+     - the principal variation is a legal line starting with the best move
+     - Board.max_value gives the line back as board moves
+     - aspiration windows and the null window searches don't change the result of a full window search
+    """
+
+    def test_pv(self):
+        position = BitBoard.from_fen(BENCH[1][1])
+        search = Search(position)
+        move, _, depth = search.iterative_deepening(max_depth=4)
+        self.assertEqual(search.pv[0], move)
+        self.assertGreater(len(search.pv), 1)
+        undos = []
+        for pv_move in search.pv:
+            self.assertIn(pv_move, position.legal_moves())
+            undos.append(position.make_move(pv_move))
+        for undo in reversed(undos):
+            position.unmake_move(undo)
+
+    def test_board_pv(self):
+        board = TestSearch.back_rank_board()
+        move, value, _, pv = board.max_value(True, 3, float('-inf'), float('inf'))
+        self.assertEqual(pv, [((7, 0), (0, 0))])
+        self.assertEqual(move, pv[0])
+
+    def test_matches_full_window(self):
+        for _, fen in (BENCH[1], BENCH[5]):
+            search = Search(BitBoard.from_fen(fen), null_move=False, late_move_reductions=False,
+                            futility_pruning=False)
+            move, value, _ = search.iterative_deepening(max_depth=4)
+            full = Search(BitBoard.from_fen(fen), quiescence_depth=search.quiescence_depth,
+                          null_move=False, late_move_reductions=False, futility_pruning=False)
+            _, full_value = full.search_root(4, float('-inf'), float('inf'))
+            self.assertEqual(value, full_value)
+
+
+class TestSee(unittest.TestCase):
+    """
+    Testing static exchange evaluation (BitBoard.see / Board.see):
+     - undefended and defended captures, x-ray attackers behind sliders, the king only taking
+       an undefended piece, quiet moves to attacked squares
+    """
+
+    @staticmethod
+    def see(fen, move):
+        position = BitBoard.from_fen(fen)
+        return position.see(parse_uci_move(position, move))
+
+    def test_captures(self):
+        # pawn defended by a pawn
+        self.assertEqual(self.see('4k3/8/2p5/3p4/8/8/8/3RK3 w - - 0 1', 'd1d5'), 1 - 8)
+        # undefended knight
+        self.assertEqual(self.see('4k3/8/8/3n4/8/8/8/3RK3 w - - 0 1', 'd1d5'), 6)
+        # pawn takes a defended knight
+        self.assertEqual(self.see('4k3/8/4p3/3n4/2P5/8/8/4K3 w - - 0 1', 'c4d5'), 6 - 1)
+
+    def test_x_ray(self):
+        fen = '3rk3/8/8/3p4/8/8/3R4/3RK3 w - - 0 1'
+        # the rook behind the first one recaptures, so the pawn is won
+        self.assertEqual(self.see(fen, 'd2d5'), 1)
+        # without the second rook the first is lost
+        self.assertEqual(self.see('3rk3/8/8/3p4/8/8/3R4/4K3 w - - 0 1', 'd2d5'), 1 - 8)
+
+    def test_king(self):
+        # the king takes back the rook when nothing else attacks the square
+        self.assertEqual(self.see('8/8/4k3/3p4/8/8/8/3RK3 w - - 0 1', 'd1d5'), 1 - 8)
+        # but not when the bishop would take the king
+        self.assertEqual(self.see('8/8/4k3/3p4/8/1B6/8/3RK3 w - - 0 1', 'd1d5'), 1)
+
+    def test_quiet_and_board(self):
+        # a queen moving where a pawn attacks it
+        self.assertEqual(self.see('4k3/8/8/2p5/8/8/8/3QK3 w - - 0 1', 'd1d4'), -20)
+        board = Board.from_fen('4k3/8/2p5/3p4/8/8/8/3RK3 w - - 0 1')
+        self.assertEqual(board.see(((7, 3), (3, 3))), 1 - 8)
+
+    def test_ordering(self):
+        # the rook taking the defended pawn goes after the quiet moves, or is left out
+        position = BitBoard.from_fen('4k3/8/2p5/3p4/8/8/8/3RK3 w - - 0 1')
+        losing = parse_uci_move(position, 'd1d5')
+        orderer = MoveOrderer()
+        moves = position.legal_moves()
+        self.assertEqual(list(orderer.order(position, moves))[-1], losing)
+        self.assertNotIn(losing, list(orderer.order(position, moves, prune_losing=True)))
+        self.assertEqual(orderer.losing_captures_pruned, 1)
+
+
+class TestOpeningBook(unittest.TestCase):
+    """
+    Testing AI/OpeningBook.py:
+     - a book built from a PGN has the games' moves, found by binary search of the mapped file
+     - weights follow the results, and moves never played by a winner are left out
+     - Board.choose_AI_move plays a book move without searching
+    """
+
+    PGN = ('[Result "1-0"]\n\n1. e4 e5 2. Nf3 Nc6 3. Bc4 Bc5 1-0\n\n'
+           '[Result "1/2-1/2"]\n\n1. e4 c5 1/2-1/2\n\n'
+           '[Result "0-1"]\n\n1. d4 d5 0-1\n')
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.bin')
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_build_and_probe(self):
+        entries = build_from_pgn(io.StringIO(self.PGN), self.path)
+        self.assertEqual(os.path.getsize(self.path), entries * 16)
+        start = BitBoard.from_fen(START_FEN)
+        with OpeningBook(self.path) as book:
+            self.assertEqual(len(book), entries)
+            moves = {move_to_uci(move): weight for move, weight in book.moves(start)}
+            # e4 won once and drew once, d4 lost
+            self.assertEqual(moves, {'e2e4': 3})
+            start.make_move(parse_uci_move(start, 'e2e4'))
+            # e5 only lost
+            self.assertEqual({move_to_uci(move) for move, _ in book.moves(start)}, {'c7c5'})
+            self.assertEqual(book.lookup(12345), [])
+
+    def test_board_uses_book(self):
+        build_from_pgn(io.StringIO(self.PGN), self.path)
+        board = Board()
+        board.opening_book = OpeningBook(self.path)
+        try:
+            move, depth, nodes = board.choose_AI_move()
+            self.assertEqual((move, depth, nodes), (((6, 4), (4, 4)), 0, 0))
+        finally:
+            board.opening_book.close()
+
+
+class TestBitbases(unittest.TestCase):
+    """
+    Testing AI/Bitbases.py:
+     - a KQvK table built by retrograde analysis in a process pool has the known results, for either
+       team being the one with the queen
+     - every result agrees with the results of the position's moves
+     - the search scores a capture into a won ending as a known win, and keeps the win once in it
+     - so do LazySMP and ParallelSearch, whose processes load the bitbases from the same directory
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        generate_all(['KQvK'], cls.directory, workers=2)
+        cls.bitbases = Bitbases(cls.directory)
+
+    @classmethod
+    def tearDownClass(cls):
+        for file in os.listdir(cls.directory):
+            os.remove(os.path.join(cls.directory, file))
+        os.rmdir(cls.directory)
+
+    def probe(self, fen):
+        return self.bitbases.probe(BitBoard.from_fen(fen))
+
+    def test_known_results(self):
+        self.assertEqual(os.path.getsize(os.path.join(self.directory, 'KQvK.bb')), 64 ** 3 * 2 // 4)
+        self.assertEqual(self.probe('k7/8/8/8/8/8/8/KQ6 w - - 0 1'), WIN)
+        self.assertEqual(self.probe('k7/8/8/8/8/8/8/KQ6 b - - 0 1'), LOSS)
+        # the queen can be taken
+        self.assertEqual(self.probe('k7/1Q6/8/8/8/8/8/K7 b - - 0 1'), DRAW)
+        # stalemate
+        self.assertEqual(self.probe('k7/8/1Q6/8/8/8/8/K7 b - - 0 1'), DRAW)
+        # black with the queen is looked up in the same table
+        self.assertEqual(self.probe('kq6/8/8/8/8/8/8/K7 w - - 0 1'), LOSS)
+        self.assertEqual(self.probe('kq6/8/8/8/8/8/8/K7 b - - 0 1'), WIN)
+        self.assertEqual(self.probe('k7/8/8/8/8/8/8/K7 w - - 0 1'), DRAW)
+        # no KRvK table, too many pieces
+        self.assertIsNone(self.probe('k7/8/8/8/8/8/8/KR6 w - - 0 1'))
+        self.assertIsNone(self.probe('kr6/8/8/8/8/8/8/KQQ5 w - - 0 1'))
+
+    def test_results_agree_with_moves(self):
+        codes = piece_codes('KQvK')
+        checked = 0
+        for index in range(0, table_size('KQvK'), 997):
+            sqs, turn = decode(index, len(codes))
+            if len(set(sqs)) < 3 or max(abs(sqs[0] // 8 - sqs[1] // 8), abs(sqs[0] % 8 - sqs[1] % 8)) < 2:
+                continue
+            position = BitBoard()
+            for code, sq in zip(codes, sqs):
+                position.put_piece(code, sq)
+            position.turn = turn
+            if position.is_square_attacked(position.king_square(turn ^ 1), turn):
+                continue
+            results = []
+            for move in position.legal_moves():
+                undo = position.make_move(move)
+                results.append(self.bitbases.probe(position))
+                position.unmake_move(undo)
+            if not results:
+                expected = LOSS if position.in_check() else DRAW
+            else:
+                expected = WIN if LOSS in results else LOSS if all(r == WIN for r in results) else DRAW
+            self.assertEqual(self.bitbases.probe(position), expected, position.to_fen())
+            checked += 1
+        self.assertGreater(checked, 300)
+
+    def test_search(self):
+        # taking the rook leaves a won KQvK
+        search = Search(BitBoard.from_fen('k7/8/8/8/8/8/1r6/KQ6 w - - 0 1'), bitbases=self.bitbases)
+        move, value, _ = search.iterative_deepening(2)
+        self.assertEqual(move_to_uci(move)[2:], 'b2')
+        self.assertGreaterEqual(value, KNOWN_WIN)
+        self.assertGreater(search.bitbase_hits, 0)
+
+        # in the ending the search keeps to winning moves and doesn't cut the won lines short
+        position = BitBoard.from_fen('8/8/8/4k3/8/8/8/KQ6 w - - 0 1')
+        search = Search(position, bitbases=self.bitbases)
+        move, value, _ = search.iterative_deepening(3)
+        self.assertLess(value, KNOWN_WIN)
+        position.make_move(move)
+        self.assertEqual(self.bitbases.probe(position), LOSS)
+
+    def test_parallel_search(self):
+        position = BitBoard.from_fen('k7/8/8/8/8/8/1r6/KQ6 w - - 0 1')
+        with LazySMP(position, helpers=1, bitbases=self.bitbases) as search:
+            move, value, _ = search.iterative_deepening(2)
+        self.assertEqual(move_to_uci(move)[2:], 'b2')
+        self.assertGreaterEqual(value, KNOWN_WIN)
+        with ParallelSearch(position, workers=2, bitbases=self.bitbases) as search:
+            move, value, _ = search.iterative_deepening(2)
+        self.assertEqual(move_to_uci(move)[2:], 'b2')
+        self.assertGreaterEqual(value, KNOWN_WIN)
+
+
 if __name__ == '__main__':
     unittest.main()